@@ -1,3 +1,13 @@
-from .db import engine, Base  # Expose database engine and Base
-from .models import tbLPLookup, tbLPFund, tbPCAP, tbLedger  # Expose models
-from .routes import lp_routes  # Expose routes
\ No newline at end of file
+# The engine, Base and models are imported on first use, so processes that only need a helper
+# module (such as the IRR worker processes) don't connect to the database
+_EXPORTS = {
+    "engine": "backend.db", "Base": "backend.db",
+    "tbLPLookup": "backend.models", "tbLPFund": "backend.models", "tbPCAP": "backend.models",
+    "tbLedger": "backend.models", "tbDataVersion": "backend.models",
+}
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'backend' has no attribute {name!r}")
+    import importlib
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
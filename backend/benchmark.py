@@ -0,0 +1,409 @@
+"""
+Benchmark app startup and the metrics, IRR, import, export and API hot paths on generated data.
+
+Each data-size tier runs in its own process against its own SQLite database, so results don't depend
+on the application database. Every benchmark reports its run times, SQL query count and peak traced
+memory. Results are written as JSON and can be compared against a stored baseline.
+
+Usage:
+    python -m backend.benchmark                                   # small and medium tiers
+    python -m backend.benchmark --tiers small,medium,large --repeats 5
+    python -m backend.benchmark --save-baseline backend/artifacts/benchmarks/baseline.json
+    python -m backend.benchmark --baseline backend/artifacts/benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# Get the absolute path of the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Number of generated LPs in each data-size tier
+TIERS = {"small": 50, "medium": 250, "large": 1000}
+DEFAULT_TIERS = ["small", "medium"]
+RESULTS_DIR = os.path.join(project_root, "backend", "artifacts", "benchmarks")
+
+# Slowdowns smaller than this many seconds are treated as noise when comparing against a baseline
+MIN_REGRESSION_SECONDS = 0.01
+
+class QueryCounter:
+    """Count the SQL statements an engine executes"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+def measure(func, repeats, setup=None, counter=None):
+    """
+    Time func over the given number of runs (calling setup untimed before each), then run it once
+    more under tracemalloc for its peak memory. Returns the timings, the query count of one run and
+    the peak.
+    """
+    times = []
+    queries = None
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start_count = counter.count if counter else 0
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+        queries = counter.count - start_count if counter else None
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": repeats,
+        "seconds": {
+            "min": round(min(times), 6),
+            "median": round(statistics.median(times), 6),
+            "mean": round(statistics.fmean(times), 6),
+        },
+        "queries": queries,
+        "peak_memory_bytes": peak_memory,
+    }
+
+def run_tier(tier, lps, repeats, sample_size, seed, work_dir):
+    """
+    Generate and benchmark one tier. Runs in a worker process whose DATABASE_URL points at a fresh
+    SQLite file, which is why the backend modules are only imported here.
+    """
+    from backend.generate_data import generate
+    data_dir = os.path.join(work_dir, "data")
+    generate(data_dir, lps=lps, seed=seed)
+
+    from fastapi.testclient import TestClient
+    from backend.db import engine, Base, SessionLocal
+    from backend.export_csv import export_db_to_csv
+    from backend.import_csv import load_csv_to_db
+    from backend.main import app
+    from backend.models import tbLPFund, tbPCAP
+    from backend.services.irr_calculator import xirr, run_xirr, start_irr_pool
+    from backend.services import analytics_snapshot
+    from backend.services.ledger_engine import get_ledger_columns
+    from backend.services.performance import performance_report
+    from backend.services.reconciliation import reconcile
+    from backend.services.lp_details import lp_details_cache
+    from backend.services.metrics_calculator import (
+        calculate_fund_metrics, calculate_lp_totals, calculate_lp_irr, load_metrics_dataset
+    )
+
+    counter = QueryCounter(engine)
+    results = {}
+
+    def reset_database():
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+    results["load_csv_to_db"] = measure(
+        lambda: load_csv_to_db(data_dir), min(repeats, 2), reset_database, counter
+    )
+
+    export_dir = os.path.join(work_dir, "export")
+    os.makedirs(export_dir, exist_ok=True)
+    results["export_db_to_csv"] = measure(
+        lambda: export_db_to_csv(export_dir), repeats, counter=counter
+    )
+
+    db = SessionLocal()
+    latest_pcap = db.query(tbPCAP.pcap_date).order_by(tbPCAP.pcap_date.desc()).first().pcap_date
+    report_date = latest_pcap.strftime('%Y-%m-%d')
+    funds = (
+        db.query(tbLPFund.lp_short_name, tbLPFund.fund_name).order_by(tbLPFund.lp_short_name).all()
+    )
+    sample_lps = sorted({lp for lp, _ in funds})[:sample_size]
+    sample_funds = [(lp, fund) for lp, fund in funds if lp in sample_lps]
+
+    # Loading every LP's data, as the warm-up does, from the tables and from the snapshot the
+    # import wrote
+    results["build_snapshot"] = measure(
+        lambda: analytics_snapshot.build_snapshot(db), repeats, counter=counter
+    )
+    analytics_snapshot.ANALYTICS_SNAPSHOT_ENABLED = False
+    results["load_metrics_dataset (SQL)"] = measure(
+        lambda: load_metrics_dataset(db), repeats, counter=counter
+    )
+    analytics_snapshot.ANALYTICS_SNAPSHOT_ENABLED = True
+    results["load_metrics_dataset (snapshot)"] = measure(
+        lambda: load_metrics_dataset(db), repeats, counter=counter
+    )
+    # Ledger sums for every LP and fund over the in-memory ledger columns
+    ledger_columns = get_ledger_columns(db)
+    results["ledger_totals (all LPs)"] = measure(
+        lambda: ledger_columns.ledger_totals(latest_pcap), repeats
+    )
+    # Ledger against PCAP for every LP and quarter
+    results["reconcile (all LPs)"] = measure(lambda: reconcile(db), repeats, counter=counter)
+    # XIRR and multiples for every LP fund, fund and fund group, solved together
+    results["performance_report (all LPs)"] = measure(
+        lambda: performance_report(db, latest_pcap.isoformat()), repeats, counter=counter
+    )
+
+    # Start the IRR worker processes before timing anything that calculates an IRR
+    start_irr_pool()
+    run_xirr([(latest_pcap.replace(year=latest_pcap.year - 1), -100.0), (latest_pcap, 110.0)])
+
+    results["calculate_fund_metrics"] = measure(
+        lambda: [calculate_fund_metrics(db, lp, fund, report_date) for lp, fund in sample_funds],
+        repeats, counter=counter
+    )
+    results["calculate_lp_totals"] = measure(
+        lambda: [calculate_lp_totals(db, lp, report_date) for lp in sample_lps],
+        repeats, counter=counter
+    )
+    results["calculate_lp_irr"] = measure(
+        lambda: [calculate_lp_irr(db, lp, report_date) for lp in sample_lps],
+        repeats, counter=counter
+    )
+    db.close()
+
+    client = TestClient(app)
+    cash_flows = []
+    for lp in sample_lps:
+        response = client.get(
+            f"/api/lp/{lp}/irr-cash-flows", params={"report_date": report_date}
+        ).json()
+        flows = [
+            (datetime.strptime(cf["effective_date"], '%Y-%m-%d').date(), cf["amount"])
+            for cf in response["cash_flows"]
+        ]
+        if flows:
+            cash_flows.append(flows)
+    # scipy is imported on the first xirr call; leave that out of the steady state timings
+    xirr(cash_flows[0])
+    results["xirr"] = measure(lambda: [xirr(flows) for flows in cash_flows], repeats)
+
+    def get_all(path_template, **params):
+        def run():
+            for lp in sample_lps:
+                response = client.get(path_template.format(lp=lp), params=params)
+                response.raise_for_status()
+        return run
+
+    results["GET /api/lps"] = measure(
+        lambda: client.get("/api/lps").raise_for_status(), repeats, counter=counter
+    )
+    results["GET /api/lp/{short_name}"] = measure(
+        get_all("/api/lp/{lp}", report_date=report_date), repeats, lp_details_cache.clear, counter
+    )
+    results["GET /api/lp/{short_name}?include=transactions"] = measure(
+        get_all("/api/lp/{lp}", report_date=report_date, include="transactions"), repeats,
+        lp_details_cache.clear, counter
+    )
+    results["GET /api/lp/{short_name}/irr-cash-flows"] = measure(
+        get_all("/api/lp/{lp}/irr-cash-flows", report_date=report_date), repeats, counter=counter
+    )
+    results["POST /api/lps/details"] = measure(
+        lambda: client.post(
+            "/api/lps/details", json={"short_names": sample_lps, "report_dates": [report_date]}
+        ).raise_for_status(),
+        repeats, counter=counter
+    )
+    results["GET /api/data/ledger"] = measure(
+        lambda: client.get("/api/data/ledger", params={"limit": 1000}).raise_for_status(), repeats,
+        counter=counter
+    )
+
+    return {
+        "lps": lps,
+        "sample_lps": len(sample_lps),
+        "report_date": report_date,
+        "benchmarks": results,
+    }
+
+# Imports the app in a fresh interpreter and prints the seconds taken and the peak traced memory
+IMPORT_SCRIPT = """
+import sys, time, tracemalloc
+if sys.argv[1] == "memory":
+    tracemalloc.start()
+start = time.perf_counter()
+import backend.main
+peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+print(time.perf_counter() - start, peak)
+"""
+
+def measure_import(repeats):
+    """Time importing backend.main (the cold start of a worker or a --reload) in fresh processes"""
+    def run(mode):
+        with tempfile.TemporaryDirectory(prefix="lp_benchmark_import_") as work_dir:
+            env = dict(
+                os.environ, DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}"
+            )
+            output = subprocess.run(
+                [sys.executable, "-c", IMPORT_SCRIPT, mode], cwd=project_root, env=env,
+                capture_output=True, text=True, check=True
+            ).stdout.split()
+        return float(output[-2]), int(output[-1])
+
+    times = [run("time")[0] for _ in range(repeats)]
+    return {
+        "runs": repeats,
+        "seconds": {
+            "min": round(min(times), 6),
+            "median": round(statistics.median(times), 6),
+            "mean": round(statistics.fmean(times), 6),
+        },
+        "queries": None,
+        "peak_memory_bytes": run("memory")[1],
+    }
+
+def run_tier_process(tier, args):
+    """Run one tier in a worker process with its own database and return its results"""
+    with tempfile.TemporaryDirectory(prefix=f"lp_benchmark_{tier}_") as work_dir:
+        output = os.path.join(work_dir, "results.json")
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}",
+            ANALYTICS_SNAPSHOT_DIR=os.path.join(work_dir, "analytics_snapshots"),
+        )
+        command = [
+            sys.executable, "-m", "backend.benchmark", "--worker", tier,
+            "--repeats", str(args.repeats), "--sample-size", str(args.sample_size),
+            "--seed", str(args.seed), "--work-dir", work_dir, "--output", output,
+        ]
+        # Application code (including the IRR worker processes) prints debugging output;
+        # keep the report readable
+        subprocess.run(command, cwd=project_root, env=env, stdout=subprocess.DEVNULL, check=True)
+        with open(output) as f:
+            return json.load(f)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, capture_output=True,
+            text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current, baseline, threshold):
+    """Compare median run times and query counts against a baseline and return the regressions"""
+    regressions = []
+    print(f"\n{'tier':<8} {'benchmark':<50} {'baseline':>10} {'current':>10} {'change':>8}")
+    for tier, tier_results in current["results"].items():
+        baseline_tier = baseline.get("results", {}).get(tier, {}).get("benchmarks", {})
+        for name, result in tier_results["benchmarks"].items():
+            base = baseline_tier.get(name)
+            if base is None:
+                continue
+            current_seconds, base_seconds = result["seconds"]["median"], base["seconds"]["median"]
+            change = (current_seconds - base_seconds) / base_seconds if base_seconds else 0.0
+            print(f"{tier:<8} {name:<50} {base_seconds:>10.4f} {current_seconds:>10.4f} "
+                  f"{change:>+8.1%}")
+            if change > threshold and current_seconds - base_seconds > MIN_REGRESSION_SECONDS:
+                regressions.append(
+                    f"{tier} {name}: {base_seconds:.4f}s -> {current_seconds:.4f}s ({change:+.1%})"
+                )
+            queries, base_queries = result.get("queries"), base.get("queries")
+            if queries is not None and base_queries is not None and queries > base_queries:
+                regressions.append(f"{tier} {name}: {base_queries} -> {queries} queries")
+    return regressions
+
+def print_results(results):
+    print(f"\n{'tier':<8} {'benchmark':<50} {'median s':>10} {'queries':>8} {'peak MB':>8}")
+    for tier, tier_results in results["results"].items():
+        for name, result in tier_results["benchmarks"].items():
+            queries = result["queries"] if result["queries"] is not None else "-"
+            print(f"{tier:<8} {name:<50} {result['seconds']['median']:>10.4f} {queries:>8} "
+                  f"{result['peak_memory_bytes'] / 1e6:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LP Management System hot paths")
+    parser.add_argument(
+        "--tiers", default=",".join(DEFAULT_TIERS), help=f"comma separated tiers from {list(TIERS)}"
+    )
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument(
+        "--sample-size", type=int, default=20, help="LPs used by the per-LP benchmarks"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="seed for the generated data")
+    parser.add_argument(
+        "--output",
+        help="results JSON path (default backend/artifacts/benchmarks/benchmark_<time>.json)",
+    )
+    parser.add_argument("--baseline", help="baseline results JSON to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="allowed slowdown before a regression, e.g. 0.2 = 20%%"
+    )
+    parser.add_argument("--save-baseline", help="also write the results to this baseline path")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_tier(
+            args.worker, TIERS[args.worker], args.repeats, args.sample_size, args.seed,
+            args.work_dir
+        )
+        with open(args.output, "w") as f:
+            json.dump(result, f)
+        return
+
+    tiers = [tier.strip() for tier in args.tiers.split(",") if tier.strip()]
+    unknown = [tier for tier in tiers if tier not in TIERS]
+    if unknown:
+        parser.error(f"unknown tiers {unknown}, choose from {list(TIERS)}")
+
+    results = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": args.repeats,
+            "sample_size": args.sample_size,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    print("Measuring startup...", file=sys.stderr)
+    results["results"]["startup"] = {
+        "benchmarks": {"import backend.main": measure_import(args.repeats)}
+    }
+    for tier in tiers:
+        print(f"Running {tier} tier ({TIERS[tier]} LPs)...", file=sys.stderr)
+        results["results"][tier] = run_tier_process(tier, args)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    for path in [output] + ([args.save_baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+    print_results(results)
+    print(f"\nWrote results to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -14,19 +14,31 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres")
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_NAME = os.getenv("DB_NAME", "lpmanagement")
 DB_TYPE = os.getenv("DB_TYPE", "postgresql")
+# Seconds to wait for PostgreSQL before falling back to SQLite
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "3"))
 
-# Fallback to SQLite if PostgreSQL connection fails
-try:
-    DATABASE_URL = f"{DB_TYPE}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
-    engine = create_engine(DATABASE_URL)
-    # Test connection
-    with engine.connect():
-        print("Connected to PostgreSQL database!")
-except Exception as e:
-    print(f"Could not connect to PostgreSQL database: {e}")
-    print("Falling back to SQLite database...")
-    DATABASE_URL = "sqlite:///./backend/lpmanagement.db"
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# A full DATABASE_URL (e.g. a separate SQLite file for benchmarks) overrides the settings above
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if DATABASE_URL:
+    connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+    engine = create_engine(DATABASE_URL, connect_args=connect_args)
+else:
+    # Fallback to SQLite if PostgreSQL connection fails
+    try:
+        DATABASE_URL = f"{DB_TYPE}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+        connect_args = (
+            {"connect_timeout": DB_CONNECT_TIMEOUT} if DB_TYPE.startswith("postgresql") else {}
+        )
+        engine = create_engine(DATABASE_URL, connect_args=connect_args)
+        # Test connection
+        with engine.connect():
+            print("Connected to PostgreSQL database!")
+    except Exception as e:
+        print(f"Could not connect to PostgreSQL database: {e}")
+        print("Falling back to SQLite database...")
+        DATABASE_URL = "sqlite:///./backend/lpmanagement.db"
+        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
\ No newline at end of file
@@ -1,8 +1,10 @@
-import pandas as pd
+import csv
 import os
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from backend.db import engine
 from backend.models import tbLPLookup, tbLPFund, tbPCAP, tbLedger
+from backend.services.profiling import profiled
 from datetime import datetime
 
 # Define file paths - using relative paths for portability
@@ -18,6 +20,14 @@ csv_files = {
     "tbLedger": os.path.join(project_root, "data", "tbLedger.csv"),
 }
 
+# Map the short table names used by the API to database table names
+table_names = {
+    "lplookup": "tbLPLookup",
+    "lpfund": "tbLPFund",
+    "pcap": "tbPCAP",
+    "ledger": "tbLedger",
+}
+
 # Define reverse column mappings (database column name to CSV column name)
 reverse_column_mappings = {
     "tbLPLookup": {
@@ -81,174 +91,93 @@ def format_percentage(value):
         return None
     return f"{value * 100:.2f}%"
 
-def export_db_to_csv():
+def csv_output_path(table_name, output_dir=None):
+    """Get the CSV path for a table, inside output_dir if one is given."""
+    if output_dir is None:
+        return csv_files[table_name]
+    return os.path.join(output_dir, os.path.basename(csv_files[table_name]))
+
+# Rows are fetched from the database in batches of this size while exporting
+EXPORT_BATCH_SIZE = 1000
+
+def table_rows(session, model):
+    """Read every row of a table as plain tuples (no ORM objects), fetched in batches"""
+    query = select(*model.__table__.columns).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    return session.execute(query)
+
+def lplookup_row(record):
+    return (
+        record.short_name, record.active, record.source, format_date(record.effective_date),
+        format_date(record.inactive_date), record.fund_list, record.beneficial_owner_change,
+        record.new_lp_short_name, record.sei_id_abf, record.sei_id_sf2,
+    )
+
+def lpfund_row(record):
+    return (
+        record.lp_short_name, record.fund_group, record.fund_name, record.blocker, record.term,
+        record.current_are, format_date(record.term_end), format_date(record.are_start),
+        format_date(record.reinvest_start), format_date(record.harvest_start),
+        format_date(record.inactive_date), format_percentage(record.management_fee),
+        format_percentage(record.incentive), record.status,
+    )
+
+def pcap_row(record):
+    return (
+        record.lp_short_name, format_date(record.pcap_date), record.field_num, record.field,
+        record.amount,
+    )
+
+def ledger_row(record):
+    return (
+        format_date(record.entry_date), format_date(record.activity_date),
+        format_date(record.effective_date), record.activity, record.sub_activity, record.amount,
+        record.entity_from, record.entity_to, record.related_entity, record.related_fund,
+    )
+
+# The model, CSV header and row formatter of each exported table
+table_exports = {
+    "tbLPLookup": (tbLPLookup, [
+        "LP Short Name", "Active", "Source", "Effective Date", "Inactive Date", "Fund List",
+        "Beneficial Owner Change", "New LP Short Name", "SEI_ID_ABF", "SEI_ID_SF2",
+    ], lplookup_row),
+    "tbLPFund": (tbLPFund, [
+        "LP Short Name", "Fund Group", "Fund", "Blocker", "Term", "Current ARE", "Term End",
+        "ARE Start", "Reinvest Start", "Harvest Start", "Inactive Date", "Management Fee",
+        "Incentive", "Status",
+    ], lpfund_row),
+    "tbPCAP": (tbPCAP, ["LP Short Name", "PCAP Date", "Field Num", "Field", "Amount"], pcap_row),
+    "tbLedger": (tbLedger, [
+        "Entry Date", "Activity Date", "Effective Date", "Activity", "Sub Activity", "Amount",
+        "Entity From", "Entity To", "Related Entity", "Related Fund",
+    ], ledger_row),
+}
+
+def write_table_csv(session, table_name, output_dir=None):
+    """Write a table to its CSV file, streaming the batches of rows to the file as they are read"""
+    model, header, format_row = table_exports[table_name]
+    path = csv_output_path(table_name, output_dir)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(format_row(record) for record in table_rows(session, model))
+    print(f"Exported data to {path}")
+
+@profiled("export")
+def export_db_to_csv(output_dir=None):
     """Export data from the database to CSV files."""
     with Session(engine) as session:
-        # Export tbLPLookup
-        lplookup_records = session.query(tbLPLookup).all()
-        lplookup_data = []
-        for record in lplookup_records:
-            row = {
-                "LP Short Name": record.short_name,
-                "Active": record.active,
-                "Source": record.source,
-                "Effective Date": format_date(record.effective_date),
-                "Inactive Date": format_date(record.inactive_date),
-                "Fund List": record.fund_list,
-                "Beneficial Owner Change": record.beneficial_owner_change,
-                "New LP Short Name": record.new_lp_short_name,
-                "SEI_ID_ABF": record.sei_id_abf,
-                "SEI_ID_SF2": record.sei_id_sf2,
-            }
-            lplookup_data.append(row)
-        
-        lplookup_df = pd.DataFrame(lplookup_data)
-        lplookup_df.to_csv(csv_files["tbLPLookup"], index=False)
-        print(f"Exported data to {csv_files['tbLPLookup']}")
-        
-        # Export tbLPFund
-        lpfund_records = session.query(tbLPFund).all()
-        lpfund_data = []
-        for record in lpfund_records:
-            row = {
-                "LP Short Name": record.lp_short_name,
-                "Fund Group": record.fund_group,
-                "Fund": record.fund_name,
-                "Blocker": record.blocker,
-                "Term": record.term,
-                "Current ARE": record.current_are,
-                "Term End": format_date(record.term_end),
-                "ARE Start": format_date(record.are_start),
-                "Reinvest Start": format_date(record.reinvest_start),
-                "Harvest Start": format_date(record.harvest_start),
-                "Inactive Date": format_date(record.inactive_date),
-                "Management Fee": format_percentage(record.management_fee),
-                "Incentive": format_percentage(record.incentive),
-                "Status": record.status,
-            }
-            lpfund_data.append(row)
-        
-        lpfund_df = pd.DataFrame(lpfund_data)
-        lpfund_df.to_csv(csv_files["tbLPFund"], index=False)
-        print(f"Exported data to {csv_files['tbLPFund']}")
-        
-        # Export tbPCAP
-        pcap_records = session.query(tbPCAP).all()
-        pcap_data = []
-        for record in pcap_records:
-            row = {
-                "LP Short Name": record.lp_short_name,
-                "PCAP Date": format_date(record.pcap_date),
-                "Field Num": record.field_num,
-                "Field": record.field,
-                "Amount": record.amount,
-            }
-            pcap_data.append(row)
-        
-        pcap_df = pd.DataFrame(pcap_data)
-        pcap_df.to_csv(csv_files["tbPCAP"], index=False)
-        print(f"Exported data to {csv_files['tbPCAP']}")
-        
-        # Export tbLedger
-        ledger_records = session.query(tbLedger).all()
-        ledger_data = []
-        for record in ledger_records:
-            row = {
-                "Entry Date": format_date(record.entry_date),
-                "Activity Date": format_date(record.activity_date),
-                "Effective Date": format_date(record.effective_date),
-                "Activity": record.activity,
-                "Sub Activity": record.sub_activity,
-                "Amount": record.amount,
-                "Entity From": record.entity_from,
-                "Entity To": record.entity_to,
-                "Related Entity": record.related_entity,
-                "Related Fund": record.related_fund,
-            }
-            ledger_data.append(row)
-        
-        ledger_df = pd.DataFrame(ledger_data)
-        ledger_df.to_csv(csv_files["tbLedger"], index=False)
-        print(f"Exported data to {csv_files['tbLedger']}")
-
-def export_table_to_csv(table_name):
+        for table_name in table_exports:
+            write_table_csv(session, table_name, output_dir)
+
+@profiled("export")
+def export_table_to_csv(table_name, output_dir=None):
     """Export a specific table from the database to CSV."""
     if table_name not in csv_files:
         print(f"Error: Table {table_name} not found.")
         return False
-    
+
     with Session(engine) as session:
-        if table_name == "tbLPLookup":
-            records = session.query(tbLPLookup).all()
-            data = []
-            for record in records:
-                row = {
-                    "LP Short Name": record.short_name,
-                    "Active": record.active,
-                    "Source": record.source,
-                    "Effective Date": format_date(record.effective_date),
-                    "Inactive Date": format_date(record.inactive_date),
-                    "Fund List": record.fund_list,
-                    "Beneficial Owner Change": record.beneficial_owner_change,
-                    "New LP Short Name": record.new_lp_short_name,
-                    "SEI_ID_ABF": record.sei_id_abf,
-                    "SEI_ID_SF2": record.sei_id_sf2,
-                }
-                data.append(row)
-        elif table_name == "tbLPFund":
-            records = session.query(tbLPFund).all()
-            data = []
-            for record in records:
-                row = {
-                    "LP Short Name": record.lp_short_name,
-                    "Fund Group": record.fund_group,
-                    "Fund": record.fund_name,
-                    "Blocker": record.blocker,
-                    "Term": record.term,
-                    "Current ARE": record.current_are,
-                    "Term End": format_date(record.term_end),
-                    "ARE Start": format_date(record.are_start),
-                    "Reinvest Start": format_date(record.reinvest_start),
-                    "Harvest Start": format_date(record.harvest_start),
-                    "Inactive Date": format_date(record.inactive_date),
-                    "Management Fee": format_percentage(record.management_fee),
-                    "Incentive": format_percentage(record.incentive),
-                    "Status": record.status,
-                }
-                data.append(row)
-        elif table_name == "tbPCAP":
-            records = session.query(tbPCAP).all()
-            data = []
-            for record in records:
-                row = {
-                    "LP Short Name": record.lp_short_name,
-                    "PCAP Date": format_date(record.pcap_date),
-                    "Field Num": record.field_num,
-                    "Field": record.field,
-                    "Amount": record.amount,
-                }
-                data.append(row)
-        elif table_name == "tbLedger":
-            records = session.query(tbLedger).all()
-            data = []
-            for record in records:
-                row = {
-                    "Entry Date": format_date(record.entry_date),
-                    "Activity Date": format_date(record.activity_date),
-                    "Effective Date": format_date(record.effective_date),
-                    "Activity": record.activity,
-                    "Sub Activity": record.sub_activity,
-                    "Amount": record.amount,
-                    "Entity From": record.entity_from,
-                    "Entity To": record.entity_to,
-                    "Related Entity": record.related_entity,
-                    "Related Fund": record.related_fund,
-                }
-                data.append(row)
-        
-        df = pd.DataFrame(data)
-        df.to_csv(csv_files[table_name], index=False)
-        print(f"Exported data to {csv_files[table_name]}")
+        write_table_csv(session, table_name, output_dir)
         return True
 
 if __name__ == "__main__":
@@ -0,0 +1,344 @@
+"""
+Generate a large synthetic portfolio in the same CSV schema as data/*.csv, for benchmarking.
+
+The output is deterministic for a given seed and set of options. It includes the cases the metrics
+and xirr code handle specially: LPs that transferred in (PCAP Transfers and no ledger capital calls)
+with distributions before the PCAP snapshot, LPs with a distribution dated before their first
+capital call, funds in their reinvestment phase and "NA" fund lifecycle dates.
+
+Usage:
+    python -m backend.generate_data --lps 2000 --seed 42 --output-dir data/synthetic
+"""
+import argparse
+import csv
+import os
+import random
+from datetime import date, timedelta
+
+# Get the absolute path of the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FUND_GROUPS = ["ABF", "SF2"]
+SOURCES = ["Cat", "Rain", "Tiger", "Cane"]
+NAME_WORDS = [
+    "Amber", "Aspen", "Berry", "Birch", "Blue", "Breeze", "Canyon", "Cedar", "Coral", "Crimson",
+    "Dolce", "Falcon", "Fern", "Gabbana", "Golden", "Granite", "Harbor", "Indigo", "Iris",
+    "Juniper", "Lark", "Magic", "Maple", "Meadow", "Onyx", "Orchid", "Peter", "Piper", "Quartz",
+    "Raven", "Red", "Ridge", "Rose", "Sage", "Silver", "Spruce", "Summit", "Tiger", "Willow",
+    "Zephyr",
+]
+
+LOOKUP_COLUMNS = [
+    "LP Short Name", "Active", "Fund List", "Source", "Effective Date", "Inactive Date",
+    "Beneficial Owner Change", "New LP Short Name", "SEI_ID_ABF", "SEI_ID_SF2"
+]
+FUND_COLUMNS = [
+    "LP Short Name", "Fund Group", "Fund", "Blocker", "Term", "Current ARE", "Term End",
+    "ARE Start", "Reinvest Start", "Harvest Start", "Inactive Date", "Management Fee", "Incentive",
+    "Status"
+]
+LEDGER_COLUMNS = [
+    "Entry Date", "Activity Date", "Effective Date", "Activity", "Sub Activity", "Amount",
+    "Entity From", "Entity To", "Related Entity", "Related Fund"
+]
+PCAP_COLUMNS = ["PCAP Date", "LP Short Name", "Field Num", "Field", " Amount "]
+
+# PCAP statement lines in field number order; the Ending Capital Balance is the sum of the others
+PCAP_FIELDS = [
+    (1, "Beginning Capital Balance"),
+    (2, "Capital Calls"),
+    (3, "Transfers"),
+    (5, "Distributions (Principal)"),
+    (6, "Distributions (Income)"),
+    (7, "Interest Income"),
+    (8, "Realized Gain / (Loss)"),
+    (9, "Unrealized Gain / (Loss)"),
+    (10, "Investment Expenses"),
+    (11, "Management Fees"),
+    (13, "Realized Carried Interest"),
+    (14, "Unrealized Carried Interest"),
+    (15, "Fund Expenses"),
+    (16, "Ending Capital Balance"),
+]
+
+def format_date(value):
+    """Format a date like the source CSVs (m/d/yyyy without leading zeros)"""
+    return f"{value.month}/{value.day}/{value.year}" if value else ""
+
+def format_ledger_amount(value):
+    return f"{value:,.2f}"
+
+def format_pcap_amount(value):
+    return "0" if value == 0 else f"{value:,.0f}"
+
+def quarter_ends(start_year, end_year):
+    """
+    Get every quarter end date from the first quarter of start_year to the last quarter of end_year
+    """
+    ends = []
+    for year in range(start_year, end_year + 1):
+        ends += [date(year, 3, 31), date(year, 6, 30), date(year, 9, 30), date(year, 12, 31)]
+    return ends
+
+def quarter_start(quarter_end):
+    return date(quarter_end.year, quarter_end.month - 2, 1)
+
+def random_day(rng, start, end):
+    return start + timedelta(days=rng.randint(0, (end - start).days))
+
+def lp_names(count):
+    """Unique, deterministic LP short names"""
+    names = []
+    pairs = [(a, b) for a in NAME_WORDS for b in NAME_WORDS if a != b]
+    for index in range(count):
+        first, second = pairs[index % len(pairs)]
+        suffix = f" {index // len(pairs) + 1}" if index >= len(pairs) else ""
+        names.append(f"{first} {second}{suffix}")
+    return names
+
+def build_funds(rng, start_year, end_year, funds_per_group):
+    """Create fund definitions with vintages spread over the date range"""
+    funds = []
+    vintages = list(range(start_year, end_year))
+    for group in FUND_GROUPS:
+        for index in range(funds_per_group):
+            vintage = vintages[index % len(vintages)]
+            name = f"{group}{str(vintage)[2:]}" + (
+                chr(ord("A") + index // len(vintages)) if index >= len(vintages) else ""
+            )
+            reinvesting = rng.random() < 0.3
+            funds.append({
+                "group": group,
+                "name": name,
+                "vintage": vintage,
+                "term_end": date(vintage, 12, 31),
+                # Reinvesting funds reinvest for two years before harvest, the others harvest
+                # straight away
+                "are_start": date(vintage + 1, 1, 1) if reinvesting else None,
+                "reinvest_start": date(vintage + 1, 1, 1) if reinvesting else None,
+                "harvest_start": (
+                    date(vintage + 3, 1, 1) if reinvesting else date(vintage + 1, 1, 1)
+                ),
+                "management_fee": rng.choice([0.015, 0.02]),
+                "incentive": rng.choice([0.15, 0.2]),
+            })
+    return funds
+
+class Investment:
+    """One LP's commitment to one fund, simulated quarter by quarter"""
+
+    def __init__(self, lp, fund, commitment, first_close, transferred_in):
+        self.lp = lp
+        self.fund = fund
+        self.commitment = commitment
+        self.first_close = first_close
+        self.transferred_in = transferred_in
+        self.called = 0.0
+        self.balance = 0.0
+
+def simulate_investment(rng, investment, quarters, ledger, pcap_lines, chronology_issue):
+    """Add the investment's ledger rows and accumulate its PCAP lines per quarter"""
+    lp, fund = investment.lp, investment.fund
+    group = fund["group"]
+
+    def add_ledger(effective_date, activity, sub_activity, amount, entity_from, entity_to):
+        ledger.append((effective_date, [
+            format_date(effective_date), format_date(effective_date), format_date(effective_date),
+            activity, sub_activity, format_ledger_amount(amount), entity_from, entity_to, lp,
+            fund["name"]
+        ]))
+
+    if not investment.transferred_in:
+        add_ledger(
+            investment.first_close, "LP Commitment", "New Commitment", investment.commitment,
+            lp, group
+        )
+
+    target_called = investment.commitment * rng.uniform(0.6, 1.0)
+    pending_income = 0.0
+    transfer_quarter = None
+    if investment.transferred_in:
+        # The transferred position shows up in the first PCAP, dated at its quarter end,
+        # after distributions paid earlier in that quarter (a PCAP snapshot data issue)
+        transfer_quarter = next(q for q in quarters if q >= investment.first_close)
+
+    for quarter_end in quarters:
+        if quarter_end < investment.first_close:
+            continue
+        start = max(quarter_start(quarter_end), investment.first_close)
+        lines = pcap_lines.setdefault((lp, quarter_end), {field: 0.0 for _, field in PCAP_FIELDS})
+        lines["Beginning Capital Balance"] += investment.balance
+
+        # Capital calls in the first two years until the target is reached
+        calls = 0.0
+        if (
+            transfer_quarter is None
+            and investment.called < target_called
+            and quarter_end.year < fund["vintage"] + 2
+        ):
+            if rng.random() < 0.7 or investment.called == 0:
+                calls = min(
+                    target_called - investment.called,
+                    investment.commitment * rng.uniform(0.1, 0.35),
+                )
+                call_date = random_day(rng, start, quarter_end)
+                if chronology_issue and investment.called == 0:
+                    # A distribution recorded before the first capital call
+                    add_ledger(
+                        call_date - timedelta(days=30), "LP Distribution", "Income Distribution",
+                        round(calls * 0.004, 2), group, lp
+                    )
+                add_ledger(call_date, "Capital Call", "", round(calls, 2), lp, group)
+                investment.called += calls
+
+        transfers = 0.0
+        if quarter_end == transfer_quarter:
+            transfers = round(investment.commitment * rng.uniform(0.5, 0.9))
+            investment.called += transfers
+            pending_income = transfers * rng.uniform(0.005, 0.01)
+
+        # Income is distributed the quarter after it is earned
+        income_distribution = round(pending_income * rng.uniform(0.7, 0.95), 2)
+        if income_distribution > 0:
+            add_ledger(
+                random_day(rng, start, quarter_end), "LP Distribution", "Income Distribution",
+                income_distribution, group, lp
+            )
+
+        capital_distribution = 0.0
+        if quarter_end >= fund["harvest_start"] and investment.balance > 0 and rng.random() < 0.6:
+            capital_distribution = round(investment.balance * rng.uniform(0.05, 0.2), 2)
+            add_ledger(
+                random_day(rng, start, quarter_end), "LP Distribution", "Capital Distribution",
+                capital_distribution, group, lp
+            )
+
+        base = investment.balance + calls + transfers
+        interest = round(base * rng.uniform(0.015, 0.03))
+        pending_income = interest
+        realized = round(base * rng.uniform(-0.002, 0.002)) if rng.random() < 0.2 else 0
+        unrealized = round(base * rng.uniform(-0.005, 0.005)) if rng.random() < 0.3 else 0
+        investment_expenses = -round(base * rng.uniform(0.0001, 0.0005))
+        management_fees = -round(investment.called * fund["management_fee"] / 4)
+        realized_carry = -round(interest * fund["incentive"] * 0.5) if rng.random() < 0.3 else 0
+        unrealized_carry = -round(unrealized * fund["incentive"])
+        fund_expenses = -round(base * rng.uniform(0.0002, 0.0006))
+
+        movements = {
+            "Capital Calls": round(calls),
+            "Transfers": transfers,
+            "Distributions (Principal)": -round(capital_distribution),
+            "Distributions (Income)": -round(income_distribution),
+            "Interest Income": interest,
+            "Realized Gain / (Loss)": realized,
+            "Unrealized Gain / (Loss)": unrealized,
+            "Investment Expenses": investment_expenses,
+            "Management Fees": management_fees,
+            "Realized Carried Interest": realized_carry,
+            "Unrealized Carried Interest": unrealized_carry,
+            "Fund Expenses": fund_expenses,
+        }
+        ending = investment.balance + sum(movements.values())
+        for field, amount in movements.items():
+            lines[field] += amount
+        lines["Ending Capital Balance"] += ending
+        investment.balance = ending
+
+def generate(output_dir, lps=2000, funds_per_group=6, start_year=2019, end_year=2024, seed=42):
+    """
+    Write tbLPLookup.csv, tbLPFund.csv, tbLedger.csv and tbPCAP.csv to output_dir and return the
+    row counts
+    """
+    rng = random.Random(seed)
+    quarters = quarter_ends(start_year, end_year)
+    funds = build_funds(rng, start_year, end_year, funds_per_group)
+
+    lookup_rows, fund_rows, ledger_rows, pcap_lines = [], [], [], {}
+    for index, lp in enumerate(lp_names(lps)):
+        lp_funds = rng.sample(funds, k=min(len(funds), rng.choice([1, 1, 1, 2, 2, 3])))
+        lp_funds.sort(key=lambda f: (f["vintage"], f["name"]))
+        transferred_in = rng.random() < 0.03
+        chronology_issue = not transferred_in and rng.random() < 0.01
+        inactive = rng.random() < 0.03
+
+        investments = []
+        for fund in lp_funds:
+            first_close = random_day(rng, date(fund["vintage"], 1, 1), date(fund["vintage"], 9, 30))
+            if transferred_in:
+                # Positions transferred in during the latest quarter, so the transfer is in
+                # the latest PCAP
+                first_close = random_day(
+                    rng, quarter_start(quarters[-1]), quarters[-1] - timedelta(days=45)
+                )
+            commitment = round(rng.lognormvariate(16, 1.2), -3)
+            investments.append(Investment(lp, fund, commitment, first_close, transferred_in))
+            simulate_investment(
+                rng, investments[-1], quarters, ledger_rows, pcap_lines, chronology_issue
+            )
+
+            fund_rows.append([
+                lp, fund["group"], fund["name"], 0, 1, 1 if fund["are_start"] else 0,
+                format_date(fund["term_end"]),
+                format_date(fund["are_start"]) if fund["are_start"] else "NA",
+                format_date(fund["reinvest_start"]) if fund["reinvest_start"] else "NA",
+                format_date(fund["harvest_start"]), "",
+                f"{fund['management_fee']:.2%}", f"{fund['incentive']:.2%}", "Active"
+            ])
+
+        effective_date = min(i.first_close for i in investments)
+        inactive_date = random_day(rng, effective_date, quarters[-1]) if inactive else None
+        groups = {f["group"] for f in lp_funds}
+        lookup_rows.append([
+            lp, 0 if inactive else 1, ", ".join(f["name"] for f in lp_funds), rng.choice(SOURCES),
+            format_date(effective_date), format_date(inactive_date), "", "",
+            10000 + index if "ABF" in groups else "", 50000 + index if "SF2" in groups else ""
+        ])
+
+    ledger_rows = [row for _, row in sorted(ledger_rows, key=lambda item: item[0])]
+
+    pcap_rows = []
+    ordered_lines = sorted(pcap_lines.items(), key=lambda item: (item[0][1], item[0][0]))
+    for (lp, quarter_end), lines in ordered_lines:
+        for field_num, field in PCAP_FIELDS:
+            if field == "Transfers" and lines[field] == 0:
+                continue
+            pcap_rows.append(
+                [format_date(quarter_end), lp, field_num, field, format_pcap_amount(lines[field])]
+            )
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = [
+        ("tbLPLookup.csv", LOOKUP_COLUMNS, lookup_rows),
+        ("tbLPFund.csv", FUND_COLUMNS, fund_rows),
+        ("tbLedger.csv", LEDGER_COLUMNS, ledger_rows),
+        ("tbPCAP.csv", PCAP_COLUMNS, pcap_rows),
+    ]
+    counts = {}
+    for file_name, columns, rows in outputs:
+        with open(os.path.join(output_dir, file_name), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        counts[file_name] = len(rows)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic LP portfolio in the data/*.csv schema"
+    )
+    parser.add_argument("--lps", type=int, default=2000, help="number of LPs")
+    parser.add_argument("--funds-per-group", type=int, default=6, help="funds in each fund group")
+    parser.add_argument("--start-year", type=int, default=2019)
+    parser.add_argument("--end-year", type=int, default=2024)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default=os.path.join(project_root, "data", "synthetic"))
+    args = parser.parse_args()
+
+    counts = generate(
+        args.output_dir, args.lps, args.funds_per_group, args.start_year, args.end_year, args.seed
+    )
+    for file_name, count in counts.items():
+        print(f"Wrote {count} rows to {os.path.join(args.output_dir, file_name)}")
+
+if __name__ == "__main__":
+    main()
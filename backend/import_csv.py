@@ -2,6 +2,10 @@ import pandas as pd
 from sqlalchemy.orm import Session
 from backend.db import engine
 from backend.models import tbLPLookup, tbLPFund, tbPCAP, tbLedger
+from backend.services.data_version import bump_data_version
+from backend.services.analytics_snapshot import refresh_snapshot
+from backend.services.pcap_validation import validate_pcap, print_breaks
+from backend.services.profiling import profiled
 from datetime import datetime
 
 
@@ -18,6 +22,17 @@ csv_files = {
     "tbLedger": os.path.join(project_root, "data", "tbLedger.csv"),
 }
 
+def csv_paths(data_dir=None):
+    """
+    Get the CSV file for each table, from data_dir if given (e.g. generated data) instead of data/
+    """
+    if data_dir is None:
+        return csv_files
+    return {
+        table_name: os.path.join(data_dir, os.path.basename(path))
+        for table_name, path in csv_files.items()
+    }
+
 # Define column mappings
 column_mappings = {
     "tbLPLookup": {
@@ -69,12 +84,29 @@ column_mappings = {
         },
 }
 
+# Values the CSV files use for a missing date, compared case-insensitively
+MISSING_DATE_VALUES = {"", "NA", "N/A", "NAN", "NONE", "NULL", "-"}
+
+# Date formats accepted in the CSV files, tried in order
+DATE_FORMATS = ["%m/%d/%Y", "%Y-%m-%d"]
+
 def clean_date(value):
-    """Convert a value to a valid date or None."""
-    try:
-        return datetime.strptime(value, "%m/%d/%Y").date() if pd.notna(value) else None
-    except ValueError:
+    """
+    Convert a value to a valid date or None. Missing-value markers such as 'NA' become None,
+    and anything else that can't be parsed is reported and stored as None.
+    """
+    if pd.isna(value):
+        return None
+    text = str(value).strip()
+    if text.upper() in MISSING_DATE_VALUES:
         return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    print(f"Warning: could not parse date '{value}', storing it as empty")
+    return None
 
 def clean_percentage_to_fraction(value):
     """Convert a percentage string to a fraction (e.g., '2.00%' -> 0.02) or None."""
@@ -109,9 +141,13 @@ def clean_column(df, column_name, cleaning_type):
         df[column_name] = df[column_name].apply(clean_date)
     return df
 
-def load_csv_to_db():
+@profiled("import")
+def load_csv_to_db(data_dir=None):
+    """
+    Load the CSV files into the database and return the roll-forward check of the imported PCAP
+    """
     with Session(engine) as session:
-        for table_name, file_path in csv_files.items():
+        for table_name, file_path in csv_paths(data_dir).items():
             df = pd.read_csv(file_path)
 
             # Strip leading/trailing spaces from column names
@@ -123,11 +159,12 @@ def load_csv_to_db():
 
             # Clean date columns for tbLPLookup
             if table_name == "tbLPLookup":
-                date_columns = ["inactive_date"]  # Removed 'first_close_date'
+                date_columns = ["effective_date", "inactive_date"]
                 for col in date_columns:
                     df = clean_column(df, col, 'clean_date')
 
-            # Clean date and percentage columns for tbLPFund
+            # Clean date and percentage columns for tbLPFund; the lifecycle dates are stored as
+            # typed dates ("NA" becomes NULL), so readers never parse them again
             if table_name == "tbLPFund":
                 date_columns = ["term_end", "are_start", "reinvest_start", "harvest_start", "inactive_date"]
                 percentage_columns = ["management_fee", "incentive"]
@@ -140,6 +177,7 @@ def load_csv_to_db():
 
             # Clean the 'amount' column for tbPCAP
             if table_name == "tbPCAP":
+                df = clean_column(df, "pcap_date", 'clean_date')
                 df = clean_column(df, "amount", 'remove_commas')
                 df = clean_column(df, "amount", 'to_numeric')
                 df = clean_column(df, "amount", 'drop_na')
@@ -212,5 +250,21 @@ def load_csv_to_db():
             session.commit()
             print(f"Loaded data into {table_name}.")
 
+        # Invalidate cached API responses now that the data has changed
+        bump_data_version(session)
+        session.commit()
+
+        # Write the analytics snapshot for the new data version so servers can map it straight away
+        try:
+            refresh_snapshot(session)
+        except Exception as e:
+            print(f"Could not build the analytics snapshot: {str(e)}")
+
+        # Check that the imported PCAP statements roll forward; the ending balances feed NAV and IRR
+        report = validate_pcap(session)
+        print_breaks(report)
+        return report
+
 if __name__ == "__main__":
-    load_csv_to_db()
\ No newline at end of file
+    import sys
+    load_csv_to_db(sys.argv[1] if len(sys.argv) > 1 else None)
\ No newline at end of file
@@ -1,8 +1,9 @@
 from backend.db import engine, Base
-from backend.models import tbLPLookup, tbLPFund, tbPCAP, tbLedger  # Import models to register them with Base
+# Import models to register them with Base
+from backend.models import tbLPLookup, tbLPFund, tbPCAP, tbLedger, tbDataVersion, create_schema
 
 # Create all tables in the database
 if __name__ == "__main__":
     print("Creating tables...")
-    Base.metadata.create_all(bind=engine)
+    create_schema(engine)
     print("Tables created successfully!")
\ No newline at end of file
@@ -0,0 +1,415 @@
+"""
+Load test the API over HTTP with realistic request mixes at increasing concurrency.
+
+By default this generates a portfolio, loads it into a temporary SQLite database and starts
+backend.main:app under uvicorn on localhost. Each concurrency level then runs for a fixed duration
+with that many simulated analysts, each sending a request, waiting for the response (and
+--think-time) and sending the next. Latency percentiles, throughput and error rates are reported per
+level and per request type.
+
+Usage:
+    python -m backend.load_test                                   # analyst mix, standard profile
+    python -m backend.load_test --mix mixed --profile stress --lps 1000 --workers 2
+    python -m backend.load_test --concurrency 1,8,32 --duration 20 --think-time 1
+    python -m backend.load_test --url http://127.0.0.1:8000       # an already running server
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+from backend.generate_data import generate
+
+# Get the absolute path of the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESULTS_DIR = os.path.join(project_root, "backend", "artifacts", "load_tests")
+
+# Concurrency levels and seconds per level for each profile
+PROFILES = {
+    "smoke": {"concurrency": [1, 2], "duration": 10},
+    "standard": {"concurrency": [1, 4, 8, 16, 32], "duration": 30},
+    "stress": {"concurrency": [16, 32, 64, 128], "duration": 30},
+    "soak": {"concurrency": [16], "duration": 600},
+}
+
+# Relative weights of the actions an analyst performs in each mix
+MIXES = {
+    # Browsing LP pages and checking IRRs
+    "analyst": {"lp_page": 55, "irr_drill_down": 20, "table_listing": 20, "lp_list": 5},
+    # Analysts plus operations staff editing data and running exports
+    "mixed": {
+        "lp_page": 40, "irr_drill_down": 15, "table_listing": 25, "lp_list": 5, "crud_write": 12,
+        "export": 3
+    },
+    # Data maintenance
+    "operations": {"table_listing": 45, "crud_write": 40, "export": 15},
+}
+
+# Generated data ends in this year, so these quarter ends all have PCAP statements
+DATA_END_YEAR = 2024
+REPORT_DATES = [
+    f"{DATA_END_YEAR}-03-31", f"{DATA_END_YEAR}-06-30", f"{DATA_END_YEAR}-09-30",
+    f"{DATA_END_YEAR}-12-31"
+]
+
+SERVER_START_TIMEOUT = 120
+
+class Portfolio:
+    """LPs and funds the simulated analysts pick from"""
+
+    def __init__(self, lps, funds, report_dates):
+        self.lps = lps
+        self.funds = funds
+        self.report_dates = report_dates
+
+async def load_portfolio(client, report_dates):
+    lps = (await client.get("/api/lps")).json()
+    funds = (await client.get(
+        "/api/data/lpfund",
+        params={"limit": 1000, "fields": "lp_short_name,fund_name", "include_total": "false"}
+    )).json()["items"]
+    if not lps or not funds:
+        raise RuntimeError("The server has no LP data to load test against")
+    return Portfolio(
+        [lp["short_name"] for lp in lps],
+        [(fund["lp_short_name"], fund["fund_name"]) for fund in funds],
+        report_dates
+    )
+
+# Actions return the (name, method, path, kwargs) requests to send in order
+
+def lp_page(rng, portfolio):
+    lp = rng.choice(portfolio.lps)
+    params = {"report_date": rng.choice(portfolio.report_dates), "include": "transactions"}
+    return [("GET /api/lp/{short_name}", "GET", f"/api/lp/{lp}", {"params": params})]
+
+def irr_drill_down(rng, portfolio):
+    lp = rng.choice(portfolio.lps)
+    params = {"report_date": rng.choice(portfolio.report_dates)}
+    return [
+        ("GET /api/lp/{short_name}/irr-cash-flows", "GET", f"/api/lp/{lp}/irr-cash-flows",
+         {"params": params})
+    ]
+
+def table_listing(rng, portfolio):
+    table = rng.choice(["ledger", "ledger", "pcap", "lpfund", "lplookup"])
+    params = {"limit": 50}
+    if table in ("ledger", "pcap") and rng.random() < 0.7:
+        params["lp"] = rng.choice(portfolio.lps)
+    return [(f"GET /api/data/{table}", "GET", f"/api/data/{table}", {"params": params})]
+
+def lp_list(rng, portfolio):
+    return [("GET /api/lps", "GET", "/api/lps", {})]
+
+def crud_write(rng, portfolio):
+    # Create, edit and remove a small ledger entry, leaving the data as it was
+    lp, fund = rng.choice(portfolio.funds)
+    effective_date = rng.choice(portfolio.report_dates)
+    entry = {
+        "entry_date": effective_date, "activity_date": effective_date,
+        "effective_date": effective_date, "activity": "Capital Call", "sub_activity": "Load Test",
+        "amount": 1.0, "entity_from": lp, "entity_to": fund, "related_entity": lp,
+        "related_fund": fund,
+    }
+    return [
+        ("POST /api/data/ledger", "POST", "/api/data/ledger", {"json": entry}),
+        ("PUT /api/data/ledger/{id}", "PUT", "/api/data/ledger/{id}",
+         {"json": dict(entry, amount=2.0)}),
+        ("DELETE /api/data/ledger/{id}", "DELETE", "/api/data/ledger/{id}", {}),
+    ]
+
+def export(rng, portfolio):
+    table = rng.choice(["ledger", "pcap", "lpfund", "lplookup"])
+    return [(f"POST /api/jobs/export/{table}", "POST", f"/api/jobs/export/{table}", {})]
+
+ACTIONS = {
+    "lp_page": lp_page,
+    "irr_drill_down": irr_drill_down,
+    "table_listing": table_listing,
+    "lp_list": lp_list,
+    "crud_write": crud_write,
+    "export": export,
+}
+
+class LevelStats:
+    """Latencies and status codes collected at one concurrency level"""
+
+    def __init__(self):
+        self.latencies = {}     # request name -> list of seconds
+        self.statuses = {}      # request name -> {status: count}
+
+    def record(self, name, seconds, status):
+        self.latencies.setdefault(name, []).append(seconds)
+        statuses = self.statuses.setdefault(name, {})
+        statuses[status] = statuses.get(status, 0) + 1
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(
+        0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1)
+    )
+    return sorted_values[index]
+
+def summarize(latencies, statuses, seconds):
+    values = sorted(latencies)
+    errors = sum(
+        count for status, count in statuses.items() if status == "error" or int(status) >= 400
+    )
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "error_rate": round(errors / len(values), 4) if values else 0.0,
+        "throughput_rps": round(len(values) / seconds, 2),
+        "latency_seconds": {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": values[-1] if values else None,
+        },
+        "statuses": {
+            str(status): count
+            for status, count in sorted(statuses.items(), key=lambda item: str(item[0]))
+        },
+    }
+
+async def send(client, stats, name, method, path, kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError:
+        response, status = None, "error"
+    stats.record(name, time.perf_counter() - start, status)
+    return response
+
+async def analyst(client, stats, portfolio, mix, think_time, deadline, seed):
+    """Simulate one analyst sending requests from the mix until the deadline"""
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        requests = ACTIONS[rng.choices(names, weights)[0]](rng, portfolio)
+        entry_id = None
+        for name, method, path, kwargs in requests:
+            if "{id}" in path:
+                if entry_id is None:
+                    break
+                path = path.format(id=entry_id)
+            response = await send(client, stats, name, method, path, kwargs)
+            if response is not None and method == "POST" and response.status_code == 200:
+                entry_id = response.json().get("id")
+        if think_time:
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+
+async def run_level(base_url, portfolio, mix, concurrency, duration, think_time, seed):
+    stats = LevelStats()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*[
+            analyst(client, stats, portfolio, mix, think_time, deadline, seed * 1000 + i)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+    all_latencies = [seconds for latencies in stats.latencies.values() for seconds in latencies]
+    all_statuses = {}
+    for statuses in stats.statuses.values():
+        for status, count in statuses.items():
+            all_statuses[status] = all_statuses.get(status, 0) + count
+    return {
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 2),
+        "total": summarize(all_latencies, all_statuses, elapsed),
+        "requests": {
+            name: summarize(stats.latencies[name], stats.statuses[name], elapsed)
+            for name in sorted(stats.latencies)
+        },
+    }
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def prepare_database(data_dir, lps, seed):
+    """Generate data and load it into the database in DATABASE_URL (runs in its own process)"""
+    generate(data_dir, lps=lps, seed=seed, end_year=DATA_END_YEAR)
+    from backend.db import engine, Base
+    from backend.import_csv import load_csv_to_db
+    import backend.models  # noqa: F401 register the tables
+    Base.metadata.create_all(bind=engine)
+    load_csv_to_db(data_dir)
+
+def start_server(work_dir, env, port, workers):
+    """Start uvicorn on localhost and wait until it answers"""
+    log_path = os.path.join(work_dir, "server.log")
+    log = open(log_path, "w")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port",
+         str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=project_root, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited during startup, see {log_path}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"The server did not start within {SERVER_START_TIMEOUT}s, see {log_path}")
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+def format_ms(seconds):
+    return f"{seconds * 1000:.1f}" if seconds is not None else "-"
+
+def print_level(level):
+    total = level["total"]
+    print(
+        f"\nConcurrency {level['concurrency']}: {total['requests']} requests, "
+        f"{total['throughput_rps']} req/s, {total['error_rate']:.2%} errors"
+    )
+    print(
+        f"  {'request':<42} {'count':>7} {'req/s':>8} {'errors':>7} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for name, result in list(level["requests"].items()) + [("all", total)]:
+        latency = result["latency_seconds"]
+        print(
+            f"  {name:<42} {result['requests']:>7} {result['throughput_rps']:>8} "
+            f"{result['errors']:>7} {format_ms(latency['p50']):>8} "
+            f"{format_ms(latency['p95']):>8} {format_ms(latency['p99']):>8}"
+        )
+
+async def run_load_test(base_url, args, concurrency_levels, duration):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        portfolio = await load_portfolio(client, args.report_dates)
+    levels = []
+    for concurrency in concurrency_levels:
+        print(f"Running {concurrency} concurrent analysts for {duration}s...", file=sys.stderr)
+        level = await run_level(
+            base_url, portfolio, MIXES[args.mix], concurrency, duration, args.think_time, args.seed
+        )
+        print_level(level)
+        levels.append(level)
+    return levels
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the LP Management System API on localhost"
+    )
+    parser.add_argument(
+        "--mix", choices=list(MIXES), default="analyst", help="request mix to replay"
+    )
+    parser.add_argument(
+        "--profile", choices=list(PROFILES), default="standard", help="concurrency profile"
+    )
+    parser.add_argument(
+        "--concurrency", help="comma separated concurrency levels, overrides the profile"
+    )
+    parser.add_argument(
+        "--duration", type=float, help="seconds per concurrency level, overrides the profile"
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=0.0,
+        help="mean seconds an analyst waits between actions"
+    )
+    parser.add_argument("--lps", type=int, default=250, help="LPs in the generated portfolio")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--url", help="load test a running server instead of starting one")
+    parser.add_argument(
+        "--report-dates", default=",".join(REPORT_DATES),
+        help="comma separated report dates to request"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=42, help="seed for the generated data and request choices"
+    )
+    parser.add_argument(
+        "--output",
+        help="results JSON path (default backend/artifacts/load_tests/load_test_<time>.json)",
+    )
+    parser.add_argument("--prepare", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare_database(args.prepare, args.lps, args.seed)
+        return
+
+    args.report_dates = [d.strip() for d in args.report_dates.split(",") if d.strip()]
+    profile = PROFILES[args.profile]
+    concurrency_levels = profile["concurrency"]
+    if args.concurrency:
+        concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+    duration = args.duration or profile["duration"]
+
+    results = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "mix": args.mix,
+            "weights": MIXES[args.mix],
+            "think_time_seconds": args.think_time,
+            "workers": args.workers if not args.url else None,
+            "lps": args.lps if not args.url else None,
+            "url": args.url,
+            "report_dates": args.report_dates,
+        },
+        "levels": [],
+    }
+
+    if args.url:
+        results["levels"] = asyncio.run(run_load_test(args.url, args, concurrency_levels, duration))
+    else:
+        with tempfile.TemporaryDirectory(prefix="lp_load_test_") as work_dir:
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'load_test.db')}",
+                JOB_ARTIFACT_DIR=os.path.join(work_dir, "jobs"),
+                ANALYTICS_SNAPSHOT_DIR=os.path.join(work_dir, "analytics_snapshots"),
+            )
+            print(f"Generating and loading {args.lps} LPs...", file=sys.stderr)
+            subprocess.run(
+                [sys.executable, "-m", "backend.load_test", "--prepare",
+                 os.path.join(work_dir, "data"), "--lps", str(args.lps), "--seed", str(args.seed)],
+                cwd=project_root, env=env, stdout=subprocess.DEVNULL, check=True
+            )
+            port = free_port()
+            server = start_server(work_dir, env, port, args.workers)
+            try:
+                results["levels"] = asyncio.run(
+                    run_load_test(f"http://127.0.0.1:{port}", args, concurrency_levels, duration)
+                )
+            finally:
+                stop_server(server)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote results to {output}")
+
+if __name__ == "__main__":
+    main()
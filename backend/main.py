@@ -1,9 +1,46 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .db import engine, Base
-from .routes import lp_routes, data_routes
+from .db import engine
+from .models import create_schema
+from .middleware import (
+    CompressionMiddleware, ActiveRequestMiddleware, TimingMiddleware, ProfilingMiddleware
+)
+from .responses import FastJSONResponse
+from .routes import (
+    lp_routes, data_routes, job_routes, warmup_routes, metrics_routes, health_routes,
+    reconciliation_routes, performance_routes
+)
+from .services.irr_calculator import start_irr_pool, shutdown_irr_pool
+from .services.job_manager import fail_stale_jobs
+from .services.request_metrics import instrument_engine
+from .services.warmup import start_warmup_scheduler, stop_warmup_scheduler
+
+# Create missing tables at startup; set to false when the schema is managed by
+# running backend.init_db
+CREATE_SCHEMA_ON_STARTUP = os.getenv("CREATE_SCHEMA_ON_STARTUP", "true").lower() == "true"
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if CREATE_SCHEMA_ON_STARTUP:
+        create_schema(engine)
+    # Start the IRR worker processes, then precompute LP details in the background
+    # at startup and whenever the data changes
+    start_irr_pool()
+    # Fail jobs that a stopped or restarted process left queued or running
+    fail_stale_jobs()
+    # Map the analytics snapshot if one was already written for the current data
+    from .services.analytics_snapshot import open_current_snapshot
+    open_current_snapshot()
+    start_warmup_scheduler()
+    app.state.startup_complete = True
+    yield
+    app.state.startup_complete = False
+    stop_warmup_scheduler()
+    shutdown_irr_pool()
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -14,12 +51,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database
-Base.metadata.create_all(bind=engine)
+# Compress larger responses with Brotli or gzip
+app.add_middleware(
+    CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+)
+
+# Track interactive requests so the cache warm-up can pause while they are in progress
+app.add_middleware(ActiveRequestMiddleware, exclude_prefixes=["/api/warmup", "/api/ready"])
+
+# Record per-route latency, SQL and IRR time for /api/metrics, optionally as a
+# Server-Timing header too
+app.add_middleware(
+    TimingMiddleware, server_timing=os.getenv("SERVER_TIMING", "false").lower() == "true"
+)
+instrument_engine(engine)
+
+# Profile requests that send the admin token in an X-Profile header
+app.add_middleware(ProfilingMiddleware)
 
 # Include routes
 app.include_router(lp_routes.router)
 app.include_router(data_routes.router)
+app.include_router(job_routes.router)
+app.include_router(warmup_routes.router)
+app.include_router(metrics_routes.router)
+app.include_router(health_routes.router)
+app.include_router(reconciliation_routes.router)
+app.include_router(performance_routes.router)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,150 @@
+import time
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from backend.services.profiling import request_profiling
+from backend.services.request_metrics import start_request, record_request, server_timing_header
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, fall back to gzip without it
+    brotli = None
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        compressed = self.compressor.process(body)
+        if more_body:
+            return compressed + self.compressor.flush()
+        return compressed + self.compressor.finish()
+
+class CompressionMiddleware:
+    """
+    Compress responses larger than minimum_size bytes.
+    Uses Brotli when the client accepts it and the brotli package is installed, otherwise gzip.
+    """
+
+    def __init__(
+        self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("Accept-Encoding", "")
+        if brotli is not None and "br" in accept_encoding:
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif "gzip" in accept_encoding:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        await responder(scope, receive, send)
+
+class ActiveRequestMiddleware:
+    """
+    Count the HTTP requests currently being handled, so background work can back off under
+    interactive load. Requests whose path starts with one of exclude_prefixes are not counted.
+    """
+
+    def __init__(self, app: ASGIApp, exclude_prefixes=()) -> None:
+        self.app = app
+        self.exclude_prefixes = tuple(exclude_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        global _active_requests
+        _active_requests += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _active_requests -= 1
+
+# Requests in progress, updated on the event loop thread by ActiveRequestMiddleware
+_active_requests = 0
+
+def active_request_count():
+    """Get the number of HTTP requests currently in progress"""
+    return _active_requests
+
+class TimingMiddleware:
+    """
+    Record the latency, SQL query count and time, and IRR time of every request by route.
+    With server_timing, also report them to the client in a Server-Timing header.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = False) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = start_request()
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing", server_timing_header(time.perf_counter() - start, stats)
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # FastAPI stores the matched route in the scope, so label by its path template rather
+            # than the URL
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            record_request(scope["method"], route_path, status, time.perf_counter() - start, stats)
+
+class ProfilingMiddleware:
+    """
+    Let admins profile a single request by sending the PROFILE_ADMIN_TOKEN in an X-Profile header.
+    Profiled endpoints then run under cProfile, and the profile files written are listed in the
+    X-Profile-Files response header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile_request = request_profiling(Headers(scope=scope))
+        if profile_request is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_profile(message: Message) -> None:
+            if message["type"] == "http.response.start" and profile_request.files:
+                MutableHeaders(scope=message).append(
+                    "X-Profile-Files", ",".join(profile_request.files)
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_profile)
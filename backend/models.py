@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Date, Float, Integer, ForeignKey
+from sqlalchemy import Column, String, Date, DateTime, Float, Integer, ForeignKey, Index, event
 from backend.db import Base  # Use absolute import
 
 class tbLPLookup(Base):
@@ -34,6 +34,12 @@ class tbLPFund(Base):
     incentive = Column(Float)  # Matches 'Incentive' in tbLPFund.csv
     status = Column(String)  # Matches 'Status' in tbLPFund.csv
 
+    # Indexes for the LP and fund filters of the data API and the per-LP metric queries
+    __table_args__ = (
+        Index("ix_tbLPFund_lp_short_name", "lp_short_name"),
+        Index("ix_tbLPFund_fund_name", "fund_name"),
+    )
+
 class tbPCAP(Base):
     __tablename__ = "tbPCAP"
 
@@ -44,6 +50,12 @@ class tbPCAP(Base):
     field = Column(String)  # Matches 'Field' in tbPCAP.csv
     amount = Column(Float)  # Matches 'Amount' in tbPCAP.csv
 
+    # Indexes for the LP and PCAP date filters and sorts of the data API and the metric queries
+    __table_args__ = (
+        Index("ix_tbPCAP_lp_short_name_pcap_date", "lp_short_name", "pcap_date"),
+        Index("ix_tbPCAP_pcap_date", "pcap_date"),
+    )
+
 class tbLedger(Base):
     __tablename__ = "tbLedger"
 
@@ -57,4 +69,35 @@ class tbLedger(Base):
     entity_from = Column(String)  # Matches 'Entity From' in tbLedger.csv
     entity_to = Column(String)  # Matches 'Entity To' in tbLedger.csv
     related_entity = Column(String)  # Matches 'Related Entity' in tbLedger.csv
-    related_fund = Column(String)  # Matches 'Related Fund' in tbLedger.csv
\ No newline at end of file
+    related_fund = Column(String)  # Matches 'Related Fund' in tbLedger.csv
+
+    # Indexes for the LP, fund and effective date filters and sorts of the data API, and for
+    # the per-LP metric and drill-down queries (which also match capital calls on entity_from)
+    __table_args__ = (
+        Index("ix_tbLedger_related_entity_effective_date", "related_entity", "effective_date"),
+        Index("ix_tbLedger_entity_from", "entity_from"),
+        Index("ix_tbLedger_related_fund", "related_fund"),
+        Index("ix_tbLedger_effective_date", "effective_date"),
+    )
+
+class tbDataVersion(Base):
+    __tablename__ = "tbDataVersion"
+
+    id = Column(Integer, primary_key=True)  # Single row with id 1
+    version = Column(Integer, nullable=False, default=0)  # Incremented on every data change
+    updated_at = Column(DateTime)  # When the version was last incremented
+
+@event.listens_for(tbDataVersion.__table__, "after_create")
+def seed_data_version(table, connection, **kwargs):
+    # Seed the single row when the table is created, so bumping it is always a plain UPDATE
+    connection.execute(table.insert().values(id=1, version=0))
+
+def create_schema(bind):
+    """
+    Create missing tables and indexes. create_all only creates the indexes of the tables it
+    creates, so indexes added to a model later are created here on existing databases too.
+    """
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
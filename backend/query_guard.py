@@ -0,0 +1,466 @@
+"""
+Guard the number of SQL statements the metrics functions and API routes issue, and their query
+plans.
+
+Each check runs a metrics function or an API request against generated data while SQLAlchemy engine
+events record every statement. Per-LP checks run for the LP with the fewest funds and the LP with
+the most, and batch checks run with one item and with many, and the same budget has to hold for
+both. That is how a budget of "N queries per LP whatever its fund count" is expressed; a new
+per-fund or per-row query breaks it.
+
+For every SELECT a check issues the guard also records the database's query plan (EXPLAIN QUERY PLAN
+on SQLite, EXPLAIN on PostgreSQL) and flags full table scans. A full scan fails the check unless the
+check reads whole tables by design (FULL_SCAN_CHECKS). Comparing with a saved report shows plans
+that changed, such as a query that stopped using an index.
+
+tests/test_query_guard.py runs the same checks against the test database.
+
+Usage:
+    python -m backend.query_guard
+    python -m backend.query_guard --save backend/query_guard_baseline.json
+    python -m backend.query_guard --baseline backend/query_guard_baseline.json
+    python -m backend.query_guard --plans                          # print every captured plan
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+# Get the absolute path of the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Shape of the generated dataset; LPs have between one and three funds
+GUARD_LPS = 40
+GUARD_SEED = 7
+# LPs in the "many" run of batch checks
+BATCH_SIZE = 10
+
+# Maximum statements for one call of each check, whatever the LP's fund count or the batch size.
+# A (fixed, per_item) budget allows per_item more statements for each item in a batch.
+# Lower a budget when a change removes queries, so that they can't come back unnoticed.
+QUERY_BUDGETS = {
+    "calculate_fund_metrics": 5,
+    "calculate_lp_totals": 5,
+    "calculate_lp_irr": 5,
+    "GET /api/lps": 2,
+    "GET /api/lp/{short_name}": 6,
+    "GET /api/lp/{short_name}?include=transactions": 6,
+    "GET /api/lp/{short_name}/irr-cash-flows": 8,
+    "GET /api/lp/{short_name}/transactions": 5,
+    "POST /api/lps/details": 5,
+    # Whole portfolio: the ledger, PCAP ending balances and funds are each read once,
+    # whatever the LP count
+    "GET /api/performance": 6,
+    "GET /api/data/lplookup": 3,
+    "GET /api/data/lpfund": 3,
+    "GET /api/data/pcap": 3,
+    "GET /api/data/ledger": 3,
+    "GET /api/data/ledger/{id}": 2,
+    "POST /api/data/ledger": 3,
+    "PUT /api/data/ledger/{id}": 4,
+    "DELETE /api/data/ledger/{id}": 3,
+    # The data version update, then one INSERT per created row
+    "POST /api/data/ledger/batch": (1, 1),
+}
+
+# Checks that read whole tables by design; a full table scan in any other check fails it
+FULL_SCAN_CHECKS = {
+    "GET /api/lps",
+    # The fund phases are loaded for every LP once per data version
+    "GET /api/lp/{short_name}/irr-cash-flows",
+    "GET /api/performance",
+    "GET /api/data/lplookup",
+}
+
+def query_budget(name, items=1):
+    """Get the statement budget of a check for a call covering the given number of batch items"""
+    budget = QUERY_BUDGETS[name]
+    if isinstance(budget, tuple):
+        fixed, per_item = budget
+        return fixed + per_item * items
+    return budget
+
+class QueryRecorder:
+    """Record the statements an engine executes while the recorder is active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+def normalize_statement(statement):
+    return re.sub(r"\s+", " ", statement).strip()
+
+def explain(engine, statement, parameters):
+    """Get the query plan of a statement as a list of lines, and whether it scans a whole table"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            lines = [row[-1] for row in rows]
+            full_scan = any(re.match(r"SCAN \w+$", line) for line in lines)
+        else:
+            rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).fetchall()
+            lines = [row[0] for row in rows]
+            full_scan = any("Seq Scan" in line for line in lines)
+    return lines, full_scan
+
+class GuardContext:
+    """Data and clients shared by the checks"""
+
+    def __init__(self, client, db, report_date, few_funds_lp, many_funds_lp, batch_lps,
+                 ledger_entry):
+        self.client = client
+        self.db = db
+        self.report_date = report_date
+        self.few_funds_lp = few_funds_lp
+        self.many_funds_lp = many_funds_lp
+        self.batch_lps = batch_lps
+        self.ledger_entry = ledger_entry
+
+def ok(response):
+    response.raise_for_status()
+    return response
+
+def build_checks(ctx):
+    """
+    Get the checks as (name, [(shape, items, run), ...]); each run makes one call covering the given
+    number of batch items and is recorded separately. Imports happen here because DATABASE_URL has
+    to be set before backend.db is imported.
+    """
+    from backend.models import tbLPFund
+    from backend.services.metrics_calculator import (
+        calculate_fund_metrics, calculate_lp_totals, calculate_lp_irr
+    )
+
+    client, report_date = ctx.client, ctx.report_date
+    per_lp = [("fewest funds", ctx.few_funds_lp), ("most funds", ctx.many_funds_lp)]
+    first_fund = {
+        lp: ctx.db.query(tbLPFund.fund_name).filter(tbLPFund.lp_short_name == lp).first().fund_name
+        for _, lp in per_lp
+    }
+    entry = ctx.ledger_entry
+
+    def lp_runs(func):
+        return [(f"{shape} ({lp})", 1, lambda lp=lp: func(lp)) for shape, lp in per_lp]
+
+    created = {}
+
+    def create_entry():
+        created["id"] = ok(client.post("/api/data/ledger", json=entry)).json()["id"]
+
+    def batch(size):
+        operations = [{"op": "create", "data": entry} for _ in range(size)]
+        return lambda: ok(client.post("/api/data/ledger/batch", json={"operations": operations}))
+
+    def lp_details(size):
+        body = {"short_names": ctx.batch_lps[:size], "report_dates": [report_date]}
+        return lambda: ok(client.post("/api/lps/details", json=body))
+
+    return [
+        ("calculate_fund_metrics", lp_runs(
+            lambda lp: calculate_fund_metrics(ctx.db, lp, first_fund[lp], report_date)
+        )),
+        ("calculate_lp_totals", lp_runs(lambda lp: calculate_lp_totals(ctx.db, lp, report_date))),
+        ("calculate_lp_irr", lp_runs(lambda lp: calculate_lp_irr(ctx.db, lp, report_date))),
+        ("GET /api/lps", [("all LPs", 1, lambda: ok(client.get("/api/lps")))]),
+        ("GET /api/lp/{short_name}", lp_runs(
+            lambda lp: ok(client.get(f"/api/lp/{lp}", params={"report_date": report_date}))
+        )),
+        ("GET /api/lp/{short_name}?include=transactions", lp_runs(
+            lambda lp: ok(client.get(
+                f"/api/lp/{lp}", params={"report_date": report_date, "include": "transactions"}
+            ))
+        )),
+        ("GET /api/lp/{short_name}/irr-cash-flows", lp_runs(
+            lambda lp: ok(client.get(
+                f"/api/lp/{lp}/irr-cash-flows", params={"report_date": report_date}
+            ))
+        )),
+        ("GET /api/lp/{short_name}/transactions", lp_runs(
+            lambda lp: ok(client.get(
+                f"/api/lp/{lp}/transactions",
+                params={"report_date": report_date, "metric": "total_capital_called"}
+            ))
+        )),
+        ("POST /api/lps/details", [
+            ("1 LP", 1, lp_details(1)), (f"{BATCH_SIZE} LPs", BATCH_SIZE, lp_details(BATCH_SIZE))
+        ]),
+        ("GET /api/performance", [
+            ("all LPs", 1,
+             lambda: ok(client.get("/api/performance", params={"report_date": report_date})))
+        ]),
+        ("GET /api/data/lplookup", [
+            ("first page", 1, lambda: ok(client.get("/api/data/lplookup")))
+        ]),
+        ("GET /api/data/lpfund", lp_runs(
+            lambda lp: ok(client.get("/api/data/lpfund", params={"lp": lp}))
+        ) + [
+            ("by fund", 1, lambda: ok(client.get(
+                "/api/data/lpfund", params={"fund": first_fund[ctx.few_funds_lp]}
+            )))
+        ]),
+        ("GET /api/data/pcap", lp_runs(
+            lambda lp: ok(client.get("/api/data/pcap", params={"lp": lp}))
+        ) + [
+            ("one LP, newest first", 1, lambda: ok(client.get("/api/data/pcap", params={
+                "lp": ctx.many_funds_lp, "sort": "-pcap_date"
+            }))),
+            ("one quarter", 1, lambda: ok(client.get("/api/data/pcap", params={
+                "date_from": report_date, "date_to": report_date, "sort": "pcap_date"
+            }))),
+        ]),
+        ("GET /api/data/ledger", lp_runs(
+            lambda lp: ok(client.get("/api/data/ledger", params={"lp": lp}))
+        ) + [
+            ("by fund", 1, lambda: ok(client.get(
+                "/api/data/ledger", params={"fund": first_fund[ctx.few_funds_lp]}
+            ))),
+            ("one LP and year, newest first", 1, lambda: ok(client.get("/api/data/ledger", params={
+                "lp": ctx.many_funds_lp, "date_from": f"{report_date[:4]}-01-01",
+                "date_to": report_date, "sort": "-effective_date"
+            }))),
+            ("one year, newest first", 1, lambda: ok(client.get("/api/data/ledger", params={
+                "date_from": f"{report_date[:4]}-01-01", "date_to": report_date,
+                "sort": "-effective_date"
+            }))),
+        ]),
+        ("POST /api/data/ledger", [("one entry", 1, create_entry)]),
+        ("GET /api/data/ledger/{id}", [
+            ("one entry", 1, lambda: ok(client.get(f"/api/data/ledger/{created['id']}")))
+        ]),
+        ("PUT /api/data/ledger/{id}", [
+            ("one entry", 1, lambda: ok(client.put(
+                f"/api/data/ledger/{created['id']}", json=dict(entry, amount=2.0)
+            )))
+        ]),
+        ("DELETE /api/data/ledger/{id}", [
+            ("one entry", 1, lambda: ok(client.delete(f"/api/data/ledger/{created['id']}")))
+        ]),
+        ("POST /api/data/ledger/batch", [
+            ("1 operation", 1, batch(1)),
+            (f"{BATCH_SIZE} operations", BATCH_SIZE, batch(BATCH_SIZE))
+        ]),
+    ]
+
+def guard_context(client, db):
+    """
+    Pick the report date, the LPs with the fewest and the most funds, the batch LPs and a ledger
+    entry to create from the loaded data
+    """
+    from sqlalchemy import func
+    from backend.models import tbLPFund, tbPCAP
+
+    report_date = db.query(func.max(tbPCAP.pcap_date)).scalar().strftime('%Y-%m-%d')
+    fund_counts = db.query(tbLPFund.lp_short_name, func.count(tbLPFund.id))\
+        .group_by(tbLPFund.lp_short_name)\
+        .order_by(func.count(tbLPFund.id), tbLPFund.lp_short_name).all()
+    lp, fund = db.query(tbLPFund.lp_short_name, tbLPFund.fund_name).first()
+    ledger_entry = {
+        "entry_date": report_date, "activity_date": report_date, "effective_date": report_date,
+        "activity": "Capital Call", "sub_activity": "Query Guard", "amount": 1.0,
+        "entity_from": lp, "entity_to": fund, "related_entity": lp, "related_fund": fund,
+    }
+    return GuardContext(
+        client, db, report_date, fund_counts[0][0], fund_counts[-1][0],
+        [lp for lp, _ in fund_counts[-BATCH_SIZE:]], ledger_entry
+    )
+
+def measure_checks(ctx, engine):
+    """Run every check, recording its statement counts and the plans of its SELECT statements"""
+    from backend.services.lp_details import lp_details_cache
+
+    results = {}
+    plans = {}
+    for name, runs in build_checks(ctx):
+        shapes = {}
+        statements = set()
+        for shape, items, run in runs:
+            # Measure uncached work; the LP details cache would otherwise answer repeat requests
+            lp_details_cache.clear()
+            ctx.db.expire_all()
+            with QueryRecorder(engine) as recorder:
+                run()
+            shapes[shape] = {"queries": recorder.count, "budget": query_budget(name, items)}
+            for statement, parameters in recorder.statements:
+                key = normalize_statement(statement)
+                if key.upper().startswith("SELECT") and key not in plans:
+                    lines, full_scan = explain(engine, statement, parameters)
+                    plans[key] = {"plan": lines, "full_scan": full_scan, "checks": []}
+                if key in plans:
+                    statements.add(key)
+                    if name not in plans[key]["checks"]:
+                        plans[key]["checks"].append(name)
+        full_scans = sum(1 for key in statements if plans[key]["full_scan"])
+        results[name] = {
+            "shapes": shapes,
+            "full_scans": full_scans,
+            "passed": (all(shape["queries"] <= shape["budget"] for shape in shapes.values())
+                       and (full_scans == 0 or name in FULL_SCAN_CHECKS)),
+        }
+    return {"database": engine.dialect.name, "checks": results, "plans": plans}
+
+def run_checks(seed, work_dir):
+    """
+    Generate data and run every check against it. Runs in a worker process whose DATABASE_URL points
+    at a SQLite file in work_dir, which is why the backend modules are only imported here.
+    """
+    from backend.generate_data import generate
+    data_dir = os.path.join(work_dir, "data")
+    generate(data_dir, lps=GUARD_LPS, seed=seed)
+
+    from fastapi.testclient import TestClient
+    from backend.db import engine, SessionLocal
+    from backend.import_csv import load_csv_to_db
+    from backend.main import app
+    from backend.models import create_schema
+
+    create_schema(engine)
+    load_csv_to_db(data_dir)
+
+    db = SessionLocal()
+    ctx = guard_context(TestClient(app), db)
+    report = measure_checks(ctx, engine)
+    report["report_date"] = ctx.report_date
+    db.close()
+    engine.dispose()
+    return report
+
+def compare_plans(report, baseline):
+    """
+    Find statements whose plan changed since the baseline, and whether they now scan a whole table
+    """
+    changes = []
+    baseline_plans = baseline.get("plans", {})
+    for statement, plan in report["plans"].items():
+        previous = baseline_plans.get(statement)
+        if previous is not None and previous["plan"] != plan["plan"]:
+            changes.append({
+                "statement": statement,
+                "checks": plan["checks"],
+                "before": previous["plan"],
+                "after": plan["plan"],
+                "new_full_scan": plan["full_scan"] and not previous["full_scan"],
+            })
+    return changes
+
+def print_report(report, show_plans):
+    print(f"{'check':<48} queries / budget")
+    for name, result in report["checks"].items():
+        if result["passed"]:
+            status = "ok"
+        elif all(counts["queries"] <= counts["budget"] for counts in result["shapes"].values()):
+            status = "FULL SCAN"
+        else:
+            status = "OVER BUDGET"
+        queries = ", ".join(
+            f"{shape}: {counts['queries']}/{counts['budget']}"
+            for shape, counts in result["shapes"].items()
+        )
+        print(f"{name:<48} {queries}  {status}")
+
+    full_scans = [
+        (statement, plan) for statement, plan in report["plans"].items() if plan["full_scan"]
+    ]
+    print(f"\n{len(report['plans'])} distinct SELECT statements, "
+          f"{len(full_scans)} with a full table scan")
+    for statement, plan in report["plans"].items():
+        if show_plans or plan["full_scan"]:
+            full_scan = " FULL SCAN" if plan["full_scan"] else ""
+            print(f"\n[{', '.join(plan['checks'])}]{full_scan}\n  {statement[:300]}")
+            for line in plan["plan"]:
+                print(f"    {line}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check SQL statement budgets and query plans of the hot paths"
+    )
+    parser.add_argument("--seed", type=int, default=GUARD_SEED, help="seed for the generated data")
+    parser.add_argument("--save", help="write the report (counts and plans) to this JSON file")
+    parser.add_argument("--baseline", help="report JSON to compare query plans against")
+    parser.add_argument("--plans", action="store_true", help="print every captured query plan")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        report = run_checks(args.seed, args.work_dir)
+        with open(os.path.join(args.work_dir, "report.json"), "w") as f:
+            json.dump(report, f)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="lp_query_guard_") as work_dir:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'query_guard.db')}",
+            # Solve IRRs in the worker itself; statement counts don't depend on where the
+            # solver runs
+            IRR_PROCESS_WORKERS="0",
+            # Budget the SQL read paths; with a current analytics snapshot the metrics would not
+            # query the tables
+            ANALYTICS_SNAPSHOT_ENABLED="false",
+        )
+        # Application code prints debugging output; keep the report readable
+        subprocess.run(
+            [sys.executable, "-m", "backend.query_guard", "--worker", "--seed", str(args.seed),
+             "--work-dir", work_dir],
+            cwd=project_root, env=env, stdout=subprocess.DEVNULL, check=True
+        )
+        with open(os.path.join(work_dir, "report.json")) as f:
+            report = json.load(f)
+    report["created_at"] = datetime.now().isoformat()
+
+    print_report(report, args.plans)
+    failures = [name for name, result in report["checks"].items() if not result["passed"]]
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for name, result in report["checks"].items():
+            previous = baseline.get("checks", {}).get(name, {}).get("shapes", {})
+            for shape, counts in result["shapes"].items():
+                if shape in previous and counts["queries"] > previous[shape]["queries"]:
+                    print(f"\n{name} [{shape}]: {previous[shape]['queries']} -> "
+                          f"{counts['queries']} queries")
+        changes = compare_plans(report, baseline)
+        for change in changes:
+            print(f"\nPlan changed{' to a FULL SCAN' if change['new_full_scan'] else ''} "
+                  f"[{', '.join(change['checks'])}]\n  {change['statement'][:300]}")
+            print("  before:\n" + "\n".join(f"    {line}" for line in change["before"]))
+            print("  after:\n" + "\n".join(f"    {line}" for line in change["after"]))
+        failures += [
+            f"new full scan in {', '.join(change['checks'])}"
+            for change in changes if change["new_full_scan"]
+        ]
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote report to {args.save}")
+
+    if failures:
+        print(f"\nFailed: {'; '.join(failures)}")
+        sys.exit(1)
+    print("\nAll query budgets met")
+
+if __name__ == "__main__":
+    main()
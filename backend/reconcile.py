@@ -0,0 +1,111 @@
+"""
+Reconcile the ledger with the PCAP statements for every LP and quarter, from the command line.
+
+Prints a summary per check and the discrepancies, and exits with status 1 when there are any, so it
+can run after an import or on a schedule. The report can also be written as JSON, or as CSV with one
+row per check.
+--pcap-rollforward checks the roll-forward of the PCAP statements instead.
+
+Usage:
+    python -m backend.reconcile
+    python -m backend.reconcile --lp "Berry Blues" --lp Breeze --tolerance 5
+    python -m backend.reconcile --output reconciliation.csv --include-matched
+    python -m backend.reconcile --pcap-rollforward
+"""
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+from backend.db import SessionLocal
+from backend.services.pcap_validation import validate_pcap, print_breaks
+from backend.services.reconciliation import reconcile, STATUSES
+
+def print_report(report, limit):
+    summary = report["summary"]
+    print(
+        f"Reconciled {summary['lps']} LPs over {summary['lp_quarters']} LP quarters "
+        f"({summary['first_quarter']} to {summary['last_quarter']}), "
+        f"tolerance {report['tolerance']} plus {report['rounding']} per rounded PCAP value"
+    )
+    print(f"\n{'check':<22}" + "".join(f"{status:>14}" for status in STATUSES))
+    for check, counts in summary["by_check"].items():
+        print(f"{check:<22}" + "".join(f"{counts[status]:>14}" for status in STATUSES))
+
+    discrepancies = [row for row in report["discrepancies"] if row["status"] != "matched"]
+    if not discrepancies:
+        return
+    print(f"\n{'LP':<24}{'quarter':<12}{'check':<22}"
+          f"{'ledger':>16}{'pcap':>16}{'difference':>16}  status")
+    for row in discrepancies[:limit]:
+        pcap = "-" if row["pcap"] is None else f"{row['pcap']:,.2f}"
+        print(f"{row['lp_short_name']:<24}{row['quarter']:<12}{row['check']:<22}"
+              f"{row['ledger']:>16,.2f}{pcap:>16}{row['difference']:>16,.2f}  {row['status']}")
+    if len(discrepancies) > limit:
+        print(f"... and {len(discrepancies) - limit} more")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Reconcile the ledger with the PCAP for every LP and quarter"
+    )
+    parser.add_argument(
+        "--lp", action="append", help="LP short name to reconcile, repeat for several (default all)"
+    )
+    parser.add_argument(
+        "--tolerance", type=float,
+        help="largest difference that still matches (default RECONCILIATION_TOLERANCE)"
+    )
+    parser.add_argument(
+        "--include-matched", action="store_true", help="also list the checks that matched"
+    )
+    parser.add_argument("--limit", type=int, default=50, help="discrepancies to print")
+    parser.add_argument("--output", help="write the report to this .json or .csv file")
+    parser.add_argument(
+        "--pcap-rollforward", action="store_true", help="check the PCAP roll-forward instead"
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.pcap_rollforward:
+            report = validate_pcap(db, args.lp, args.tolerance)
+        else:
+            report = reconcile(db, args.lp, args.tolerance, args.include_matched)
+    finally:
+        db.close()
+
+    if args.pcap_rollforward:
+        print_breaks(report, args.limit)
+        rows, columns = report["breaks"], [
+            "lp_short_name", "pcap_date", "check", "expected", "actual", "difference", "detail"
+        ]
+    else:
+        print_report(report, args.limit)
+        rows, columns = report["discrepancies"], [
+            "lp_short_name", "quarter", "check", "ledger", "pcap", "difference", "status"
+        ]
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        if args.output.endswith(".csv"):
+            pd.DataFrame(rows, columns=columns).to_csv(args.output, index=False)
+        else:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+        print(f"\nWrote report to {args.output}")
+
+    if args.pcap_rollforward:
+        if report["summary"]["breaks"]:
+            print(f"\n{report['summary']['breaks']} roll-forward breaks found")
+            sys.exit(1)
+        print("\nPCAP statements roll forward")
+    else:
+        if report["summary"]["discrepancies"]:
+            print(f"\n{report['summary']['discrepancies']} discrepancies found")
+            sys.exit(1)
+        print("\nLedger and PCAP reconcile")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson.
+    Dates, datetimes and NumPy values are serialized natively, and NaN becomes null.
+    Routes can return this directly to skip FastAPI's jsonable_encoder pass over large payloads.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
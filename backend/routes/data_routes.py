@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
 from sqlalchemy.orm import Session
 from backend.db import SessionLocal
 from backend.models import tbLPLookup, tbLPFund, tbPCAP, tbLedger
 from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from datetime import date, datetime
+from types import SimpleNamespace
 from sqlalchemy.exc import IntegrityError
-from backend.export_csv import export_table_to_csv, export_db_to_csv
+from backend.services.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from backend.responses import FastJSONResponse
+from backend.services.data_version import (
+    get_data_version, bump_data_version, check_not_modified, add_version_headers
+)
 
 router = APIRouter()
 
@@ -65,33 +70,255 @@ class LedgerBase(BaseModel):
     related_entity: str
     related_fund: str
 
+# Maximum number of operations accepted by a batch endpoint
+MAX_BATCH_SIZE = 5000
+
+class BatchOperation(BaseModel):
+    op: str  # 'create', 'update' or 'delete'
+    key: Optional[Union[int, str]] = None  # id, or short_name for LP Lookup; not needed for create
+    data: Optional[Dict[str, Any]] = None  # full row for create and update
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
 # Helper function to convert SQLAlchemy model instance to dict
+# Dates are left as date objects, the response class serializes them natively
 def to_dict(model_instance):
     if model_instance is None:
         return None
-    result = {}
-    for column in model_instance.__table__.columns:
-        value = getattr(model_instance, column.name)
-        # Convert date to string format for JSON serialization
-        if isinstance(value, (date, datetime)):
-            value = value.isoformat()
-        result[column.name] = value
-    return result
+    return {key: getattr(model_instance, key) for key in model_instance.__table__.columns.keys()}
+
+# Query parameters shared by the paginated list endpoints
+class ListParams:
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        sort: Optional[str] = Query(
+            None, description="Column to sort by, prefix with '-' for descending"
+        ),
+        fields: Optional[str] = Query(None, description="Comma separated columns to return"),
+        include_total: bool = True,
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.sort = sort
+        self.fields = fields
+        self.include_total = include_total
+
+def date_range_filters(column, date_from, date_to):
+    """Build filters restricting a date column to an inclusive range"""
+    filters = []
+    if date_from:
+        filters.append(column >= date_from)
+    if date_to:
+        filters.append(column <= date_to)
+    return filters
+
+def list_page(request: Request, db, model, filters, params: ListParams, default_sort=None):
+    """Get one page of a table with the shared list parameters"""
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+
+    page = paginate(
+        db, model, [f for f in filters if f is not None],
+        sort=params.sort, default_sort=default_sort, limit=params.limit, cursor=params.cursor,
+        fields=params.fields, include_total=params.include_total
+    )
+    return add_version_headers(FastJSONResponse(page), data_version)
+
+def copy_ledger_rows(items):
+    """Copy the values of ledger ORM rows, so they can be read after a commit expires the rows"""
+    return [
+        SimpleNamespace(
+            **{column.name: getattr(item, column.name) for column in tbLedger.__table__.columns}
+        )
+        for item in items
+    ]
+
+def apply_ledger_changes(version, rows=(), deleted_ids=()):
+    """
+    Move this process's in-memory ledger columns forward by a committed ledger change. Called after
+    the commit and outside its error handling: the change has been made, so a failure here only
+    drops the columns.
+    """
+    # Imported here so NumPy is not loaded at startup
+    from backend.services.ledger_engine import apply_ledger_changes as apply
+    apply(version, rows, deleted_ids)
+
+def format_validation_error(error: ValidationError):
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+def apply_batch(db: Session, model, schema, operations: List[BatchOperation], label: str):
+    """
+    Validate and apply a list of create/update/delete operations in a single transaction.
+    Existing rows and referenced LPs are looked up with one query each. If any operation
+    is invalid nothing is applied and the per-item errors are returned with a 400.
+    """
+    if len(operations) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"A batch can contain at most {MAX_BATCH_SIZE} operations"
+        )
+
+    key_column = list(model.__table__.primary_key.columns)[0]
+    key_type = key_column.type.python_type
+    references_lp = "lp_short_name" in model.__table__.columns
+    results = []
+    items = []
+    seen_keys = set()
+
+    # Validate each operation on its own first
+    for index, operation in enumerate(operations):
+        result = {
+            "index": index, "op": operation.op, "key": operation.key, "status": "ok", "error": None
+        }
+        item = None
+        if operation.op not in ("create", "update", "delete"):
+            result["error"] = f"Unknown operation '{operation.op}'"
+        elif operation.op != "create" and operation.key is None:
+            result["error"] = f"'key' is required to {operation.op}"
+        elif operation.op != "create" and not isinstance(operation.key, key_type):
+            # Keys arrive as int or str, convert them to the primary key's type so they
+            # match the rows
+            try:
+                operation.key = result["key"] = key_type(operation.key)
+            except ValueError:
+                result["error"] = f"'key' must be of type {key_type.__name__}"
+        if not result["error"] and operation.op in ("create", "update"):
+            try:
+                item = schema(**(operation.data or {}))
+            except ValidationError as e:
+                result["error"] = format_validation_error(e)
+        if not result["error"] and operation.op != "create":
+            # A row can only be changed once per batch, or the result would depend on the order
+            if operation.key in seen_keys:
+                result["error"] = f"key {operation.key!r} is used by more than one operation"
+            seen_keys.add(operation.key)
+        results.append(result)
+        items.append(item)
+
+    # Look up the rows being changed and the LPs being referenced with one query each
+    keys = {
+        op.key for op, result in zip(operations, results)
+        if op.op != "create" and not result["error"]
+    }
+    existing = {}
+    if keys:
+        existing = {
+            getattr(row, key_column.name): row
+            for row in db.query(model).filter(key_column.in_(keys)).all()
+        }
+
+    lp_names = set()
+    if references_lp:
+        lp_names = {item.lp_short_name for item in items if item is not None}
+    elif model is tbLPLookup:
+        lp_names = {item.short_name for item in items if item is not None}
+    known_lps = set()
+    if lp_names:
+        lp_rows = db.query(tbLPLookup.short_name).filter(tbLPLookup.short_name.in_(lp_names)).all()
+        known_lps = {row.short_name for row in lp_rows}
+
+    created_lps = set()
+    for operation, result, item in zip(operations, results, items):
+        if result["error"]:
+            continue
+        if operation.op != "create" and operation.key not in existing:
+            result["error"] = f"{label} not found"
+        elif references_lp and item is not None and item.lp_short_name not in known_lps:
+            result["error"] = f"LP with short_name '{item.lp_short_name}' does not exist"
+        elif model is tbLPLookup and operation.op == "create":
+            if item.short_name in known_lps or item.short_name in created_lps:
+                result["error"] = "LP with this short_name already exists"
+            created_lps.add(item.short_name)
+
+    if any(result["error"] for result in results):
+        for result in results:
+            result["status"] = "error" if result["error"] else "skipped"
+        raise HTTPException(
+            status_code=400, detail={"message": "Batch not applied", "results": results}
+        )
+
+    # Apply everything and commit once
+    try:
+        created = []
+        changed = []
+        deleted = []
+        for operation, result, item in zip(operations, results, items):
+            if operation.op == "create":
+                db_item = model(**item.model_dump())
+                db.add(db_item)
+                created.append((result, db_item))
+                changed.append(db_item)
+                result["status"] = "created"
+            elif operation.op == "update":
+                db_item = existing[operation.key]
+                for key, value in item.model_dump().items():
+                    setattr(db_item, key, value)
+                changed.append(db_item)
+                result["status"] = "updated"
+            else:
+                db.delete(existing[operation.key])
+                deleted.append(operation.key)
+                result["status"] = "deleted"
+        db.flush()
+        for result, db_item in created:
+            result["key"] = getattr(db_item, key_column.name)
+        version = bump_data_version(db)
+        changed = copy_ledger_rows(changed) if model is tbLedger else []
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=400, detail=f"Batch violates a database constraint: {str(e.orig)}"
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to apply batch: {str(e)}")
+    if model is tbLedger:
+        apply_ledger_changes(version, rows=changed, deleted_ids=deleted)
+
+    return {
+        "results": results,
+        "created": sum(1 for result in results if result["status"] == "created"),
+        "updated": sum(1 for result in results if result["status"] == "updated"),
+        "deleted": sum(1 for result in results if result["status"] == "deleted"),
+    }
 
 # LP Lookup table endpoints
 @router.get("/api/data/lplookup")
-def get_lplookup(db: Session = Depends(get_db)):
-    """Get all LP Lookup entries"""
-    items = db.query(tbLPLookup).all()
-    return [to_dict(item) for item in items]
+def get_lplookup(
+    request: Request,
+    lp: Optional[str] = None,
+    active: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    params: ListParams = Depends(),
+    db: Session = Depends(get_db)
+):
+    """Get a page of LP Lookup entries, filtered by LP, active flag and effective date range"""
+    filters = [
+        tbLPLookup.short_name == lp if lp else None,
+        tbLPLookup.active == active if active else None,
+        *date_range_filters(tbLPLookup.effective_date, date_from, date_to)
+    ]
+    return list_page(request, db, tbLPLookup, filters, params)
 
 @router.get("/api/data/lplookup/{short_name}")
-def get_lplookup_by_id(short_name: str, db: Session = Depends(get_db)):
+def get_lplookup_by_id(short_name: str, request: Request, db: Session = Depends(get_db)):
     """Get a specific LP Lookup entry by short_name"""
     item = db.query(tbLPLookup).filter(tbLPLookup.short_name == short_name).first()
     if item is None:
         raise HTTPException(status_code=404, detail="LP not found")
-    return to_dict(item)
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+    return add_version_headers(FastJSONResponse(to_dict(item)), data_version)
 
 @router.post("/api/data/lplookup")
 def create_lplookup(item: LPLookupBase, db: Session = Depends(get_db)):
@@ -99,6 +326,7 @@ def create_lplookup(item: LPLookupBase, db: Session = Depends(get_db)):
     try:
         db_item = tbLPLookup(**item.dict())
         db.add(db_item)
+        bump_data_version(db)
         db.commit()
         db.refresh(db_item)
         return to_dict(db_item)
@@ -121,6 +349,7 @@ def update_lplookup(short_name: str, item: LPLookupBase, db: Session = Depends(g
         for key, value in item.dict().items():
             setattr(db_item, key, value)
         
+        bump_data_version(db)
         db.commit()
         db.refresh(db_item)
         return to_dict(db_item)
@@ -137,26 +366,52 @@ def delete_lplookup(short_name: str, db: Session = Depends(get_db)):
     
     try:
         db.delete(db_item)
+        bump_data_version(db)
         db.commit()
         return Response(status_code=204)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete LP: {str(e)}")
 
+@router.post("/api/data/lplookup/batch")
+def batch_lplookup(batch: BatchRequest, db: Session = Depends(get_db)):
+    """Create, update and delete LP entries in a single transaction"""
+    return apply_batch(db, tbLPLookup, LPLookupBase, batch.operations, "LP")
+
 # LP Fund table endpoints
 @router.get("/api/data/lpfund")
-def get_lpfund(db: Session = Depends(get_db)):
-    """Get all LP Fund entries"""
-    items = db.query(tbLPFund).all()
-    return [to_dict(item) for item in items]
+def get_lpfund(
+    request: Request,
+    lp: Optional[str] = None,
+    fund: Optional[str] = None,
+    fund_group: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    params: ListParams = Depends(),
+    db: Session = Depends(get_db)
+):
+    """Get a page of LP Fund entries, filtered by LP, fund, fund group, status and term end range"""
+    filters = [
+        tbLPFund.lp_short_name == lp if lp else None,
+        tbLPFund.fund_name == fund if fund else None,
+        tbLPFund.fund_group == fund_group if fund_group else None,
+        tbLPFund.status == status if status else None,
+        *date_range_filters(tbLPFund.term_end, date_from, date_to)
+    ]
+    return list_page(request, db, tbLPFund, filters, params)
 
 @router.get("/api/data/lpfund/{id}")
-def get_lpfund_by_id(id: int, db: Session = Depends(get_db)):
+def get_lpfund_by_id(id: int, request: Request, db: Session = Depends(get_db)):
     """Get a specific LP Fund entry by ID"""
     item = db.query(tbLPFund).filter(tbLPFund.id == id).first()
     if item is None:
         raise HTTPException(status_code=404, detail="LP Fund not found")
-    return to_dict(item)
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+    return add_version_headers(FastJSONResponse(to_dict(item)), data_version)
 
 @router.post("/api/data/lpfund")
 def create_lpfund(item: LPFundBase, db: Session = Depends(get_db)):
@@ -169,6 +424,7 @@ def create_lpfund(item: LPFundBase, db: Session = Depends(get_db)):
             
         db_item = tbLPFund(**item.dict())
         db.add(db_item)
+        bump_data_version(db)
         db.commit()
         db.refresh(db_item)
         return to_dict(db_item)
@@ -197,6 +453,7 @@ def update_lpfund(id: int, item: LPFundBase, db: Session = Depends(get_db)):
         for key, value in item.dict().items():
             setattr(db_item, key, value)
         
+        bump_data_version(db)
         db.commit()
         db.refresh(db_item)
         return to_dict(db_item)
@@ -216,26 +473,48 @@ def delete_lpfund(id: int, db: Session = Depends(get_db)):
     
     try:
         db.delete(db_item)
+        bump_data_version(db)
         db.commit()
         return Response(status_code=204)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete LP Fund: {str(e)}")
 
+@router.post("/api/data/lpfund/batch")
+def batch_lpfund(batch: BatchRequest, db: Session = Depends(get_db)):
+    """Create, update and delete LP Fund entries in a single transaction"""
+    return apply_batch(db, tbLPFund, LPFundBase, batch.operations, "LP Fund")
+
 # PCAP table endpoints
 @router.get("/api/data/pcap")
-def get_pcap(db: Session = Depends(get_db)):
-    """Get all PCAP entries"""
-    items = db.query(tbPCAP).all()
-    return [to_dict(item) for item in items]
+def get_pcap(
+    request: Request,
+    lp: Optional[str] = None,
+    field: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    params: ListParams = Depends(),
+    db: Session = Depends(get_db)
+):
+    """Get a page of PCAP entries, filtered by LP, field and PCAP date range"""
+    filters = [
+        tbPCAP.lp_short_name == lp if lp else None,
+        tbPCAP.field == field if field else None,
+        *date_range_filters(tbPCAP.pcap_date, date_from, date_to)
+    ]
+    return list_page(request, db, tbPCAP, filters, params)
 
 @router.get("/api/data/pcap/{id}")
-def get_pcap_by_id(id: int, db: Session = Depends(get_db)):
+def get_pcap_by_id(id: int, request: Request, db: Session = Depends(get_db)):
     """Get a specific PCAP entry by ID"""
     item = db.query(tbPCAP).filter(tbPCAP.id == id).first()
     if item is None:
         raise HTTPException(status_code=404, detail="PCAP entry not found")
-    return to_dict(item)
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+    return add_version_headers(FastJSONResponse(to_dict(item)), data_version)
 
 @router.post("/api/data/pcap")
 def create_pcap(item: PCAPBase, db: Session = Depends(get_db)):
@@ -248,6 +527,7 @@ def create_pcap(item: PCAPBase, db: Session = Depends(get_db)):
             
         db_item = tbPCAP(**item.dict())
         db.add(db_item)
+        bump_data_version(db)
         db.commit()
         db.refresh(db_item)
         return to_dict(db_item)
@@ -276,6 +556,7 @@ def update_pcap(id: int, item: PCAPBase, db: Session = Depends(get_db)):
         for key, value in item.dict().items():
             setattr(db_item, key, value)
         
+        bump_data_version(db)
         db.commit()
         db.refresh(db_item)
         return to_dict(db_item)
@@ -295,26 +576,52 @@ def delete_pcap(id: int, db: Session = Depends(get_db)):
     
     try:
         db.delete(db_item)
+        bump_data_version(db)
         db.commit()
         return Response(status_code=204)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete PCAP entry: {str(e)}")
 
+@router.post("/api/data/pcap/batch")
+def batch_pcap(batch: BatchRequest, db: Session = Depends(get_db)):
+    """Create, update and delete PCAP entries in a single transaction"""
+    return apply_batch(db, tbPCAP, PCAPBase, batch.operations, "PCAP entry")
+
 # Ledger table endpoints
 @router.get("/api/data/ledger")
-def get_ledger(db: Session = Depends(get_db)):
-    """Get all Ledger entries"""
-    items = db.query(tbLedger).all()
-    return [to_dict(item) for item in items]
+def get_ledger(
+    request: Request,
+    lp: Optional[str] = None,
+    fund: Optional[str] = None,
+    activity: Optional[str] = None,
+    sub_activity: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    params: ListParams = Depends(),
+    db: Session = Depends(get_db)
+):
+    """Get a page of Ledger entries, filtered by LP, fund, activity and effective date range"""
+    filters = [
+        tbLedger.related_entity == lp if lp else None,
+        tbLedger.related_fund == fund if fund else None,
+        tbLedger.activity == activity if activity else None,
+        tbLedger.sub_activity == sub_activity if sub_activity else None,
+        *date_range_filters(tbLedger.effective_date, date_from, date_to)
+    ]
+    return list_page(request, db, tbLedger, filters, params)
 
 @router.get("/api/data/ledger/{id}")
-def get_ledger_by_id(id: int, db: Session = Depends(get_db)):
+def get_ledger_by_id(id: int, request: Request, db: Session = Depends(get_db)):
     """Get a specific Ledger entry by ID"""
     item = db.query(tbLedger).filter(tbLedger.id == id).first()
     if item is None:
         raise HTTPException(status_code=404, detail="Ledger entry not found")
-    return to_dict(item)
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+    return add_version_headers(FastJSONResponse(to_dict(item)), data_version)
 
 @router.post("/api/data/ledger")
 def create_ledger(item: LedgerBase, db: Session = Depends(get_db)):
@@ -322,12 +629,14 @@ def create_ledger(item: LedgerBase, db: Session = Depends(get_db)):
     try:
         db_item = tbLedger(**item.dict())
         db.add(db_item)
+        version = bump_data_version(db)
         db.commit()
         db.refresh(db_item)
-        return to_dict(db_item)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create Ledger entry: {str(e)}")
+    apply_ledger_changes(version, rows=copy_ledger_rows([db_item]))
+    return to_dict(db_item)
 
 @router.put("/api/data/ledger/{id}")
 def update_ledger(id: int, item: LedgerBase, db: Session = Depends(get_db)):
@@ -341,12 +650,14 @@ def update_ledger(id: int, item: LedgerBase, db: Session = Depends(get_db)):
         for key, value in item.dict().items():
             setattr(db_item, key, value)
         
+        version = bump_data_version(db)
         db.commit()
         db.refresh(db_item)
-        return to_dict(db_item)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to update Ledger entry: {str(e)}")
+    apply_ledger_changes(version, rows=copy_ledger_rows([db_item]))
+    return to_dict(db_item)
 
 @router.delete("/api/data/ledger/{id}")
 def delete_ledger(id: int, db: Session = Depends(get_db)):
@@ -357,37 +668,15 @@ def delete_ledger(id: int, db: Session = Depends(get_db)):
     
     try:
         db.delete(db_item)
+        version = bump_data_version(db)
         db.commit()
-        return Response(status_code=204)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete Ledger entry: {str(e)}")
+    apply_ledger_changes(version, deleted_ids=[id])
+    return Response(status_code=204)
 
-# Export endpoints
-@router.post("/api/data/export/{table_name}")
-def export_table(table_name: str):
-    """Export a specific table to CSV"""
-    if table_name not in ["lplookup", "lpfund", "pcap", "ledger"]:
-        raise HTTPException(status_code=400, detail="Invalid table name")
-    
-    table_map = {
-        "lplookup": "tbLPLookup",
-        "lpfund": "tbLPFund",
-        "pcap": "tbPCAP",
-        "ledger": "tbLedger"
-    }
-    
-    try:
-        export_table_to_csv(table_map[table_name])
-        return {"message": f"Successfully exported {table_name} to CSV"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to export table: {str(e)}")
-
-@router.post("/api/data/export-all")
-def export_all_tables():
-    """Export all tables to CSV"""
-    try:
-        export_db_to_csv()
-        return {"message": "Successfully exported all tables to CSV"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to export tables: {str(e)}")
\ No newline at end of file
+@router.post("/api/data/ledger/batch")
+def batch_ledger(batch: BatchRequest, db: Session = Depends(get_db)):
+    """Create, update and delete Ledger entries in a single transaction"""
+    return apply_batch(db, tbLedger, LedgerBase, batch.operations, "Ledger entry")
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Request
+from backend.responses import FastJSONResponse
+from backend.services.warmup import get_warmup_progress, warmup_ready
+
+router = APIRouter()
+
+@router.get("/api/ready")
+def get_ready(request: Request):
+    """
+    Readiness check: 200 once startup has finished (schema, IRR workers) and the first LP details
+    warm-up has completed, 503 before that
+    """
+    started = getattr(request.app.state, "startup_complete", False)
+    warmed = warmup_ready()
+    ready = started and warmed
+    return FastJSONResponse({
+        "ready": ready,
+        "startup_complete": started,
+        "warmup_complete": warmed,
+        "warmup": get_warmup_progress()["run"],
+    }, status_code=200 if ready else 503)
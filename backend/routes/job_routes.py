@@ -0,0 +1,123 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from backend.db import SessionLocal
+from backend.export_csv import export_table_to_csv, csv_output_path, table_names
+from backend.services.metrics_calculator import (
+    export_irr_cash_flows_to_csv, export_portfolio_report_to_csv
+)
+from backend.services.job_manager import (
+    submit_job, get_job, list_jobs, JobQueueFull, JOB_STATUS_SUCCEEDED
+)
+from datetime import datetime
+import os
+import zipfile
+
+router = APIRouter()
+
+def _submit(kind, func, params=None):
+    try:
+        return submit_job(kind, func, params).to_dict()
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+def _export_table_job(table_name):
+    def run(job):
+        job.set_progress(0, 1, f"Exporting {table_name}")
+        export_table_to_csv(table_name, job.directory)
+        return os.path.basename(csv_output_path(table_name, job.directory))
+    return run
+
+def _export_all_job(job):
+    artifact_name = "lp_management_export.zip"
+    tables = list(table_names.values())
+    with zipfile.ZipFile(
+        os.path.join(job.directory, artifact_name), "w", zipfile.ZIP_DEFLATED
+    ) as archive:
+        for index, table_name in enumerate(tables):
+            job.set_progress(index, len(tables), f"Exporting {table_name}")
+            export_table_to_csv(table_name, job.directory)
+            file_path = csv_output_path(table_name, job.directory)
+            archive.write(file_path, os.path.basename(file_path))
+            os.remove(file_path)
+    return artifact_name
+
+def _irr_cash_flows_job(job):
+    artifact_name = f"irr_cash_flows_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    db = SessionLocal()
+    try:
+        export_irr_cash_flows_to_csv(
+            db, os.path.join(job.directory, artifact_name),
+            progress_callback=lambda completed, total: job.set_progress(completed, total)
+        )
+    finally:
+        db.close()
+    return artifact_name
+
+def _portfolio_report_job(report_date):
+    def run(job):
+        artifact_name = f"portfolio_report_{report_date}.csv"
+        db = SessionLocal()
+        try:
+            export_portfolio_report_to_csv(
+                db, report_date, os.path.join(job.directory, artifact_name),
+                progress_callback=lambda completed, total: job.set_progress(completed, total)
+            )
+        finally:
+            db.close()
+        return artifact_name
+    return run
+
+@router.post("/api/jobs/export/{table_name}", status_code=202)
+def submit_export_table(table_name: str):
+    """Start a background export of a specific table to CSV"""
+    if table_name not in table_names:
+        raise HTTPException(status_code=400, detail="Invalid table name")
+    return _submit("export", _export_table_job(table_names[table_name]), {"table_name": table_name})
+
+@router.post("/api/jobs/export-all", status_code=202)
+def submit_export_all():
+    """Start a background export of all tables to a zip of CSV files"""
+    return _submit("export-all", _export_all_job)
+
+@router.post("/api/jobs/irr-cash-flows", status_code=202)
+def submit_irr_cash_flows_export():
+    """Start a background export of all LP cash flows used for IRR calculations"""
+    return _submit("irr-cash-flows", _irr_cash_flows_job)
+
+@router.post("/api/jobs/portfolio-report", status_code=202)
+def submit_portfolio_report(report_date: str):
+    """Start a background portfolio report of fund totals and IRR for every LP"""
+    try:
+        datetime.strptime(report_date, '%Y-%m-%d')
+    except ValueError:
+        raise HTTPException(status_code=400, detail="report_date must be in YYYY-MM-DD format")
+    return _submit(
+        "portfolio-report", _portfolio_report_job(report_date), {"report_date": report_date}
+    )
+
+@router.get("/api/jobs")
+def get_jobs():
+    """Get all retained jobs, newest first"""
+    return [job.to_dict() for job in list_jobs()]
+
+@router.get("/api/jobs/{job_id}")
+def get_job_status(job_id: str):
+    """Get the status and progress of a job"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.get("/api/jobs/{job_id}/download")
+def download_job_artifact(job_id: str):
+    """Download the artifact produced by a finished job"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != JOB_STATUS_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if not os.path.exists(job.artifact_path):
+        raise HTTPException(status_code=410, detail="Job artifact has expired")
+
+    media_type = "application/zip" if job.artifact_name.endswith(".zip") else "text/csv"
+    return FileResponse(path=job.artifact_path, filename=job.artifact_name, media_type=media_type)
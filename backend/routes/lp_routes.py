@@ -1,20 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import and_, func
 from backend.db import SessionLocal
 from backend.models import tbLPLookup, tbLPFund, tbLedger, tbPCAP
 from backend.services.metrics_calculator import (
-    calculate_fund_metrics, calculate_lp_totals, 
-    calculate_lp_irr, get_pcap_report_date, 
-    export_irr_cash_flows_to_csv
+    load_metrics_dataset, get_pcap_report_date,
+    parse_report_date, metric_transactions_filter, METRIC_NAMES
 )
+from backend.services.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from datetime import datetime
-from backend.services.irr_calculator import xirr  # Import xirr from our custom implementation
-from fastapi.responses import FileResponse
+from backend.services.profiling import profiled
+from backend.services.irr_calculator import run_xirr  # Runs our custom xirr on the IRR process pool
+from pydantic import BaseModel
+from typing import List, Optional
+from backend.responses import FastJSONResponse
+from backend.services.data_version import get_data_version, check_not_modified, add_version_headers
+from backend.services.lp_details import (
+    build_lp_details, cached_lp_details, lp_details_key, lp_details_cache, lp_details_flight
+)
 import os
 
 router = APIRouter()
 
+# Ledger columns read for the IRR cash flows; rows are loaded as plain tuples, not ORM objects
+CASH_FLOW_LEDGER_COLUMNS = [
+    tbLedger.effective_date, tbLedger.sub_activity, tbLedger.amount,
+    tbLedger.entity_from, tbLedger.entity_to, tbLedger.related_fund
+]
+
+# Maximum number of LP and report date combinations in one batch request
+MAX_BATCH_COMBINATIONS = 500
+
+class LPDetailsBatchRequest(BaseModel):
+    short_names: List[str]
+    report_dates: List[str]  # YYYY-MM-DD
+    include: List[str] = []  # 'transactions' to embed the transactions behind each metric
+
 def get_db():
     db = SessionLocal()
     try:
@@ -23,102 +44,189 @@ def get_db():
         db.close()
 
 @router.get("/api/lps")
-def get_lps(db: Session = Depends(get_db)):
+def get_lps(request: Request, db: Session = Depends(get_db)):
     """Get all LPs"""
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+
     lps = db.query(tbLPLookup).all()
-    return [{"short_name": lp.short_name} for lp in lps]
+    return add_version_headers(
+        FastJSONResponse([{"short_name": lp.short_name} for lp in lps]), data_version
+    )
 
 @router.get("/api/lp/{short_name}")
-def get_lp_details(short_name: str, report_date: str, db: Session = Depends(get_db)):
-    """Get LP details including fund investments and metrics"""
-    lp = db.query(tbLPLookup).filter(tbLPLookup.short_name == short_name).first()
-    if not lp:
-        raise HTTPException(status_code=404, detail="LP not found")
-    
-    funds = db.query(tbLPFund).filter(tbLPFund.lp_short_name == short_name).all()
-    
-    # Calculate metrics for each fund
-    funds_with_metrics = []
-    for fund in funds:
-        metrics = calculate_fund_metrics(db, short_name, fund.fund_name, report_date)
-        funds_with_metrics.append({
-            "fund_name": fund.fund_name,
-            "fund_group": fund.fund_group,
-            "status": fund.status,
-            "management_fee": fund.management_fee,
-            "incentive": fund.incentive,
-            "term_end": fund.term_end,
-            "reinvest_start": fund.reinvest_start,
-            "harvest_start": fund.harvest_start,
-            "metrics": metrics
-        })
-    
-    # Calculate LP totals and IRR
-    totals = calculate_lp_totals(db, short_name, report_date)
-    
-    # Special debug for Magic LP
-    if short_name == "Magic":
-        print(f"\n------- DETAILED DEBUG FOR MAGIC LP IRR -------")
-        print(f"Report date: {report_date}")
-    
-    irr_data = calculate_lp_irr(db, short_name, report_date)
-    
-    if short_name == "Magic":
-        print(f"Magic LP IRR Result: {irr_data['irr']}")
-        if irr_data['irr'] is None:
-            print("IRR calculation returned None - this explains the N/A in the UI")
-        print(f"Snapshot data issue: {irr_data['snapshot_data_issue']}")
-        print(f"Chronology issue: {irr_data['chronology_issue']}")
-        print(f"------- END DEBUG FOR MAGIC LP IRR -------\n")
-    
-    pcap_report_date = get_pcap_report_date(db, report_date)
-    
-    return {
-        "lp_details": {
-            "short_name": lp.short_name,
-            "active": lp.active,
-            "source": lp.source,
-            "effective_date": lp.effective_date,
-            "inactive_date": lp.inactive_date
-        },
-        "funds": funds_with_metrics,
-        "totals": totals,
-        "irr": irr_data['irr'],
-        "irr_snapshot_data_issue": irr_data['snapshot_data_issue'],
-        "irr_chronology_issue": irr_data['chronology_issue'],
-        "pcap_report_date": pcap_report_date
-    }
+@profiled("lp_details")
+def get_lp_details(
+    short_name: str,
+    report_date: str,
+    request: Request,
+    include: Optional[str] = Query(
+        None, description="Use 'transactions' to embed the transactions behind each metric"
+    ),
+    db: Session = Depends(get_db)
+):
+    """
+    Get LP details including fund investments and metrics.
+    Only metric values are returned unless include=transactions is given;
+    use /api/lp/{short_name}/transactions to page through the transactions behind a metric.
+    """
+    # Skip all metric computation if the client already has this version of the data. The ETag is
+    # the same for every LP, so check that this one exists before answering 304.
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        if db.get(tbLPLookup, short_name) is None:
+            raise HTTPException(status_code=404, detail="LP not found")
+        return not_modified
+
+    include_transactions = "transactions" in parse_include(include)
+
+    def compute_details():
+        dataset = load_metrics_dataset(db, [short_name], [report_date])
+        if short_name not in dataset.lps:
+            raise HTTPException(status_code=404, detail="LP not found")
+        return build_lp_details(dataset, short_name, report_date, include_transactions)
 
-@router.get("/api/export-irr-cash-flows")
-def export_irr_data(db: Session = Depends(get_db)):
+    # Cached per data version; identical requests arriving while this one is computed
+    # share its result
+    key = lp_details_key(short_name, report_date, data_version.version, include_transactions)
+    details = cached_lp_details(key, compute_details)
+    return add_version_headers(FastJSONResponse(details), data_version)
+
+@router.get("/api/lps/coalescing")
+def get_lp_details_coalescing():
+    """Get how many LP details computations ran (leaders) and how many requests shared one (hits)"""
+    return {**lp_details_flight.stats(), "cache": lp_details_cache.stats()}
+
+def parse_include(include: Optional[str]):
+    """Parse a comma separated include parameter"""
+    return {part.strip() for part in include.split(",")} if include else set()
+
+@router.post("/api/lps/details")
+def get_lp_details_batch(batch: LPDetailsBatchRequest, db: Session = Depends(get_db)):
     """
-    Export all LP cash flows used for IRR calculations to a CSV file.
-    This helps diagnose issues with IRR calculations.
+    Get LP details for every combination of the requested LPs and report dates.
+    Ledger and PCAP rows are loaded once for all of them; results are keyed by LP, then report date.
     """
+    short_names = list(dict.fromkeys(batch.short_names))
+    report_dates = list(dict.fromkeys(batch.report_dates))
+    if not short_names or not report_dates:
+        raise HTTPException(
+            status_code=400, detail="short_names and report_dates must not be empty"
+        )
+    if len(short_names) * len(report_dates) > MAX_BATCH_COMBINATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can contain at most {MAX_BATCH_COMBINATIONS} LP and report date "
+                   f"combinations",
+        )
+    for report_date in report_dates:
+        try:
+            parse_report_date(report_date)
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid report_date '{report_date}', expected YYYY-MM-DD"
+            )
+
+    dataset = load_metrics_dataset(db, short_names, report_dates)
+
+    results = {}
+    for short_name in short_names:
+        if short_name not in dataset.lps:
+            continue
+        results[short_name] = {
+            report_date: build_lp_details(
+                dataset, short_name, report_date, "transactions" in batch.include
+            )
+            for report_date in report_dates
+        }
+
+    return FastJSONResponse({
+        "results": results,
+        "not_found": [short_name for short_name in short_names if short_name not in dataset.lps]
+    })
+
+@router.get("/api/funds/phases")
+def get_fund_phases_on(date: str, request: Request, db: Session = Depends(get_db)):
+    """Get the lifecycle phase (investment, reinvest or harvest) of every LP's funds on a date"""
     try:
-        # Create a timestamped filename to avoid overwriting previous exports
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = f"irr_cash_flows_{timestamp}.csv"
-        
-        # Generate the CSV file
-        file_path = export_irr_cash_flows_to_csv(db, output_file)
-        
-        # Return the file as a downloadable response
-        return FileResponse(
-            path=file_path,
-            filename=output_file,
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={output_file}"}
+        day = parse_report_date(date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be in YYYY-MM-DD format")
+
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+
+    from backend.services.fund_phases import get_fund_phases
+    return add_version_headers(FastJSONResponse({
+        "date": date,
+        "funds": get_fund_phases(db).all_phases(day)
+    }), data_version)
+
+@router.get("/api/lp/{short_name}/transactions")
+def get_metric_transactions(
+    short_name: str,
+    report_date: str,
+    metric: str,
+    request: Request,
+    fund: Optional[str] = Query(
+        None, description="Fund name, or leave out for the LP totals across all funds"
+    ),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get a page of the ledger transactions behind one of an LP's metrics, in effective date order
+    """
+    if metric not in METRIC_NAMES:
+        raise HTTPException(
+            status_code=400, detail=f"metric must be one of: {', '.join(METRIC_NAMES)}"
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to export IRR data: {str(e)}")
+    try:
+        parse_report_date(report_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="report_date must be in YYYY-MM-DD format")
+
+    if db.query(tbLPLookup.short_name).filter(tbLPLookup.short_name == short_name).first() is None:
+        raise HTTPException(status_code=404, detail="LP not found")
+
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+
+    if fund:
+        fund_names = [fund]
+    else:
+        fund_rows = db.query(tbLPFund.fund_name).filter(tbLPFund.lp_short_name == short_name).all()
+        fund_names = [row.fund_name for row in fund_rows]
+
+    page = paginate(
+        db, tbLedger, [metric_transactions_filter(metric, short_name, fund_names, report_date)],
+        sort="effective_date", limit=limit, cursor=cursor,
+        fields="effective_date,activity,sub_activity,amount,entity_from,entity_to,related_fund"
+    )
+    return add_version_headers(FastJSONResponse(page), data_version)
 
 @router.get("/api/lp/{short_name}/irr-cash-flows")
-def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(get_db)):
+@profiled("irr_cash_flows")
+def get_irr_cash_flows(
+    short_name: str, report_date: str, request: Request, db: Session = Depends(get_db)
+):
     """
     Get IRR calculation cash flows for a specific LP.
     This helps users understand and validate IRR calculations.
     """
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+
     try:
         # Get PCAP report date
         pcap_date = get_pcap_report_date(db, report_date)
@@ -130,7 +238,7 @@ def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(
         chronology_adjusted = False
         
         # Add Capital Calls (negative cash flows)
-        calls = db.query(tbLedger)\
+        calls = db.query(*CASH_FLOW_LEDGER_COLUMNS)\
             .filter(
                 and_(
                     tbLedger.related_entity == short_name,
@@ -151,7 +259,7 @@ def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(
             })
             
         # Always check for transfers - include transfers even if there are capital calls
-        transfers_record = db.query(tbPCAP)\
+        transfers_record = db.query(tbPCAP.pcap_date, tbPCAP.amount)\
             .filter(
                 and_(
                     tbPCAP.lp_short_name == short_name,
@@ -175,7 +283,7 @@ def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(
         # If no capital calls and no transfers, try Capital Calls from tbPCAP
         if len(cash_flows) == 0:
             # If no transfers, try Capital Calls from tbPCAP
-            pcap_capital_calls = db.query(tbPCAP)\
+            pcap_capital_calls = db.query(tbPCAP.pcap_date, tbPCAP.amount)\
                 .filter(
                     and_(
                         tbPCAP.lp_short_name == short_name,
@@ -196,7 +304,7 @@ def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(
                 })
         
         # Add Distributions (positive cash flows)
-        distributions = db.query(tbLedger)\
+        distributions = db.query(*CASH_FLOW_LEDGER_COLUMNS)\
             .filter(
                 and_(
                     tbLedger.related_entity == short_name,
@@ -218,7 +326,7 @@ def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(
         
         # Add ending balance from PCAP - Get the LAST/most recent Ending Capital Balance
         # First try exact date match
-        ending_balance_record = db.query(tbPCAP)\
+        ending_balance_record = db.query(tbPCAP.pcap_date, tbPCAP.amount)\
             .filter(
                 and_(
                     tbPCAP.lp_short_name == short_name,
@@ -235,7 +343,7 @@ def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(
         # If no exact match, try to find the closest date that's not after pcap_date
         if not ending_balance_record:
             print(f"No exact date match found for Ending Capital Balance. Looking for closest date...")
-            ending_balance_record = db.query(tbPCAP)\
+            ending_balance_record = db.query(tbPCAP.pcap_date, tbPCAP.amount)\
                 .filter(
                     and_(
                         tbPCAP.lp_short_name == short_name,
@@ -266,7 +374,7 @@ def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(
             print("No Ending Balance found in tbPCAP.")
 
         # Check tbLedger for Ending Capital Balance
-        ledger_ending_balance = db.query(tbLedger)\
+        ledger_ending_balance = db.query(*CASH_FLOW_LEDGER_COLUMNS)\
             .filter(
                 and_(
                     tbLedger.related_entity == short_name,
@@ -293,14 +401,8 @@ def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(
         
         # Special handling for reinvest-active funds
         # Get fund status to check if this LP has active funds in reinvestment phase
-        funds = db.query(tbLPFund).filter(tbLPFund.lp_short_name == short_name).all()
-        is_reinvest_active = any(
-            fund.reinvest_start and 
-            (datetime.strptime(fund.reinvest_start, '%m/%d/%Y').date() if isinstance(fund.reinvest_start, str) else fund.reinvest_start) <= pcap_date and
-            (not fund.harvest_start or 
-             (datetime.strptime(fund.harvest_start, '%m/%d/%Y').date() if isinstance(fund.harvest_start, str) else fund.harvest_start) > pcap_date)
-            for fund in funds
-        )
+        from backend.services.fund_phases import get_fund_phases
+        is_reinvest_active = get_fund_phases(db).lp_reinvest_active(short_name, pcap_date)
         
         if is_reinvest_active:
             print(f"LP {short_name} has funds in reinvestment phase - applying special handling")
@@ -309,7 +411,7 @@ def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(
             # If we didn't find an ending balance already, try with a date range instead of exact match
             if not any(cf["activity"] in ["PCAP Ending Balance", "Ending Capital Balance"] for cf in cash_flows):
                 # Try tbPCAP with the closest date
-                closest_pcap_balance = db.query(tbPCAP)\
+                closest_pcap_balance = db.query(tbPCAP.pcap_date, tbPCAP.amount)\
                     .filter(
                         and_(
                             tbPCAP.lp_short_name == short_name,
@@ -364,17 +466,17 @@ def get_irr_cash_flows(short_name: str, report_date: str, db: Session = Depends(
             xirr_cashflows = [(datetime.strptime(cf["effective_date"], '%Y-%m-%d').date(), cf["amount"]) 
                              for cf in cash_flows]
             if xirr_cashflows:
-                irr_value = xirr(xirr_cashflows)
+                irr_value = run_xirr(xirr_cashflows)
         except Exception as e:
             print(f"IRR calculation failed for {short_name}: {str(e)}")
             print(f"Cash flows: {xirr_cashflows}")
             irr_value = None
         
-        return {
+        return add_version_headers(FastJSONResponse({
             "cash_flows": cash_flows,
             "irr": irr_value,
             "pcap_date": pcap_date.strftime('%Y-%m-%d') if pcap_date else None,
             "chronology_adjusted": chronology_adjusted
-        }
+        }), data_version)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get IRR cash flows: {str(e)}")
\ No newline at end of file
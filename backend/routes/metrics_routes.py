@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from backend.middleware import active_request_count
+from backend.services.lp_details import lp_details_cache, lp_details_flight
+from backend.services.request_metrics import render_prometheus
+
+router = APIRouter()
+
+@router.get("/api/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Get request latency, SQL, IRR and cache metrics in the Prometheus text format"""
+    flight = lp_details_flight.stats()
+    cache = lp_details_cache.stats()
+    extra_metrics = [
+        ("lp_details_coalesced_leaders_total", "counter",
+         "LP details computations run by a leader request.", flight["leaders"]),
+        ("lp_details_coalesced_hits_total", "counter",
+         "LP details requests that shared an in-flight computation.", flight["hits"]),
+        ("lp_details_cache_hits_total", "counter",
+         "LP details served from the cache.", cache["hits"]),
+        ("lp_details_cache_misses_total", "counter",
+         "LP details not found in the cache.", cache["misses"]),
+        ("lp_details_cache_entries", "gauge",
+         "LP details payloads currently cached.", cache["size"]),
+        ("lp_http_requests_in_progress", "gauge",
+         "HTTP requests currently being handled.", active_request_count()),
+    ]
+    return PlainTextResponse(
+        render_prometheus(extra_metrics),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from backend.db import SessionLocal
+from backend.responses import FastJSONResponse
+from backend.services.data_version import get_data_version, check_not_modified, add_version_headers
+from backend.services.metrics_calculator import parse_report_date
+
+router = APIRouter()
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@router.get("/api/performance")
+def get_performance(report_date: str, request: Request, db: Session = Depends(get_db)):
+    """Get XIRR, TVPI, DPI and RVPI per LP fund, per fund and per fund group as of a report date"""
+    try:
+        parse_report_date(report_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="report_date must be in YYYY-MM-DD format")
+
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+
+    from backend.services.performance import performance_report
+    return add_version_headers(FastJSONResponse(performance_report(db, report_date)), data_version)
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, Request, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from backend.db import SessionLocal
+from backend.responses import FastJSONResponse
+from backend.services.data_version import get_data_version, check_not_modified, add_version_headers
+
+router = APIRouter()
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@router.get("/api/reconciliation")
+def get_reconciliation(
+    request: Request,
+    lp: Optional[List[str]] = Query(
+        None, description="LP short names to reconcile, or leave out for all LPs"
+    ),
+    tolerance: Optional[float] = Query(
+        None, ge=0, description="Largest difference that still matches"
+    ),
+    include_matched: bool = Query(False, description="Also list the checks that matched"),
+    db: Session = Depends(get_db)
+):
+    """Compare the ledger with the PCAP capital calls and distributions for every LP and quarter"""
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+
+    from backend.services.reconciliation import reconcile
+    return add_version_headers(
+        FastJSONResponse(reconcile(db, lp, tolerance, include_matched)), data_version
+    )
+
+@router.get("/api/reconciliation/pcap-rollforward")
+def get_pcap_rollforward(
+    request: Request,
+    lp: Optional[List[str]] = Query(
+        None, description="LP short names to check, or leave out for all LPs"
+    ),
+    tolerance: Optional[float] = Query(
+        None, ge=0, description="Largest roll-forward difference that is accepted"
+    ),
+    db: Session = Depends(get_db)
+):
+    """
+    Check that every PCAP statement rolls forward and that each ending balance is the next beginning
+    """
+    data_version = get_data_version(db)
+    not_modified = check_not_modified(request, data_version)
+    if not_modified:
+        return not_modified
+
+    from backend.services.pcap_validation import validate_pcap
+    return add_version_headers(FastJSONResponse(validate_pcap(db, lp, tolerance)), data_version)
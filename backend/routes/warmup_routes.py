@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from backend.services.warmup import get_warmup_progress, trigger_warmup
+
+router = APIRouter()
+
+@router.get("/api/warmup")
+def get_warmup():
+    """Get the progress of the LP details cache warm-up"""
+    return get_warmup_progress()
+
+@router.post("/api/warmup")
+def start_warmup():
+    """Ask the warm-up scheduler to check for new data now instead of at its next poll"""
+    trigger_warmup()
+    return get_warmup_progress()
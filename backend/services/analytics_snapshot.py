@@ -0,0 +1,392 @@
+"""
+A persisted, memory-mapped snapshot of the read model used by the metrics calculations.
+
+The ledger and PCAP tables are written as typed NumPy columns (.npy files, with categorical codes
+for the string columns), together with the sorted distinct PCAP dates and the ledger aggregated per
+(LP, fund, quarter), which the fund metrics and the reconciliation read. Every uvicorn worker
+memory-maps the same files, so their pages are shared through the OS page cache, and a worker can
+serve metrics without loading the tables through SQLAlchemy. Each snapshot is stamped with the data
+version it was built from and is only used while that is still the current version.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import date, datetime
+
+import numpy as np
+from sqlalchemy import Date, select
+from sqlalchemy.orm import Session
+
+from backend.db import DATABASE_URL, SessionLocal
+from backend.models import tbLedger, tbLPFund, tbLPLookup, tbPCAP
+from backend.services.data_version import get_data_version
+from backend.services.ledger_engine import (
+    ENTITY_COLUMNS, LEDGER_METRICS, LedgerColumns, quarter_ends
+)
+
+# Get the absolute path of the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Snapshot settings can be overridden from the .env file
+ANALYTICS_SNAPSHOT_ENABLED = os.getenv("ANALYTICS_SNAPSHOT_ENABLED", "true").lower() == "true"
+ANALYTICS_SNAPSHOT_DIR = os.getenv(
+    "ANALYTICS_SNAPSHOT_DIR",
+    os.path.join(project_root, "backend", "artifacts", "analytics_snapshots")
+)
+# Number of snapshot versions kept on disk per database
+ANALYTICS_SNAPSHOT_KEEP = int(os.getenv("ANALYTICS_SNAPSHOT_KEEP", "2"))
+
+SNAPSHOT_FORMAT = 2
+
+LEDGER_CATEGORIES = [
+    "activity", "sub_activity", "entity_from", "entity_to", "related_entity", "related_fund"
+]
+LEDGER_DATES = ["entry_date", "activity_date", "effective_date"]
+PCAP_CATEGORIES = ["lp_short_name", "field"]
+
+# The columns read from each table
+LEDGER_COLUMNS = [
+    "id", "entry_date", "activity_date", "effective_date", "activity", "sub_activity", "amount",
+    "entity_from", "entity_to", "related_entity", "related_fund"
+]
+PCAP_COLUMNS = ["id", "lp_short_name", "pcap_date", "field_num", "field", "amount"]
+
+class TableRow:
+    """An LP Lookup or LP Fund row read from a snapshot"""
+
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+def database_key():
+    """Identify the database, so that snapshots of different databases never mix"""
+    return hashlib.sha1(DATABASE_URL.encode()).hexdigest()[:12]
+
+def data_stamp(data_version):
+    """The data version a snapshot is valid for: the version number and when it was last bumped"""
+    updated_at = data_version.updated_at.isoformat() if data_version.updated_at else None
+    return {
+        "database": database_key(), "data_version": data_version.version, "updated_at": updated_at
+    }
+
+def snapshot_name(stamp):
+    updated_at = (stamp["updated_at"] or "never").replace(":", "").replace("-", "").replace(".", "")
+    return f"v{stamp['data_version']}_{updated_at}_f{SNAPSHOT_FORMAT}"
+
+def database_dir():
+    return os.path.join(ANALYTICS_SNAPSHOT_DIR, database_key())
+
+def _dates_to_array(values):
+    return np.array([v if v is not None else "NaT" for v in values], dtype="datetime64[D]")
+
+def _encode(values, categories=None):
+    """
+    Encode strings as int32 codes into a list of categories, with -1 for None. Columns encoded with
+    the same categories dict share its codes.
+    """
+    categories = {} if categories is None else categories
+    codes = np.fromiter(
+        (-1 if v is None else categories.setdefault(v, len(categories)) for v in values),
+        dtype=np.int32, count=len(values)
+    )
+    return codes, list(categories)
+
+def _table_records(rows, model):
+    """Rows of a small table as JSON-friendly dicts"""
+    columns = [column.name for column in model.__table__.columns]
+    return [
+        {
+            name: value.isoformat() if isinstance(value, date) else value
+            for name, value in zip(columns, row)
+        }
+        for row in rows
+    ]
+
+def build_snapshot(db: Session):
+    """Read the tables once, write a snapshot stamped with the current data version and return it"""
+    stamp = data_stamp(get_data_version(db))
+
+    ledger_rows = db.execute(
+        select(*[getattr(tbLedger, name) for name in LEDGER_COLUMNS]).order_by(tbLedger.id)
+    ).all()
+    pcap_rows = db.execute(
+        select(*[getattr(tbPCAP, name) for name in PCAP_COLUMNS]).order_by(tbPCAP.id)
+    ).all()
+    lookup_rows = db.execute(select(*tbLPLookup.__table__.columns)).all()
+    fund_rows = db.execute(select(*tbLPFund.__table__.columns).order_by(tbLPFund.id)).all()
+
+    ledger_columns = list(zip(*ledger_rows)) if ledger_rows else [[] for _ in LEDGER_COLUMNS]
+    ledger_values = dict(zip(LEDGER_COLUMNS, ledger_columns))
+    categories = {}
+    arrays = {"ledger_id": np.array(ledger_values["id"], dtype=np.int64)}
+    for name in LEDGER_DATES:
+        arrays[f"ledger_{name}"] = _dates_to_array(ledger_values[name])
+    arrays["ledger_amount"] = np.array(
+        [v if v is not None else np.nan for v in ledger_values["amount"]], dtype=np.float64
+    )
+    # The entity columns share one set of codes, as in LedgerColumns
+    entities = {}
+    for name in LEDGER_CATEGORIES:
+        if name in ENTITY_COLUMNS:
+            arrays[f"ledger_{name}"], _ = _encode(ledger_values[name], entities)
+        else:
+            arrays[f"ledger_{name}"], categories[f"ledger_{name}"] = _encode(ledger_values[name])
+    categories["ledger_entity"] = list(entities)
+
+    # Ledger totals per (LP, fund, quarter), as LedgerColumns.quarter_aggregates gives them
+    aggregates = LedgerColumns.from_arrays(arrays, categories).quarter_aggregates()
+    for name, values in aggregates.items():
+        arrays[f"aggregate_{name}"] = values
+
+    pcap_columns = list(zip(*pcap_rows)) if pcap_rows else [[] for _ in PCAP_COLUMNS]
+    pcap_values = dict(zip(PCAP_COLUMNS, pcap_columns))
+    arrays["pcap_id"] = np.array(pcap_values["id"], dtype=np.int64)
+    arrays["pcap_pcap_date"] = _dates_to_array(pcap_values["pcap_date"])
+    arrays["pcap_field_num"] = np.array(
+        [v if v is not None else np.nan for v in pcap_values["field_num"]], dtype=np.float64
+    )
+    arrays["pcap_amount"] = np.array(
+        [v if v is not None else np.nan for v in pcap_values["amount"]], dtype=np.float64
+    )
+    for name in PCAP_CATEGORIES:
+        arrays[f"pcap_{name}"], categories[f"pcap_{name}"] = _encode(pcap_values[name])
+
+    # The PCAP date index: every distinct PCAP date, sorted
+    pcap_dates = arrays["pcap_pcap_date"]
+    arrays["pcap_dates"] = np.unique(pcap_dates[~np.isnat(pcap_dates)])
+
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "stamp": stamp,
+        "created_at": datetime.now().isoformat(),
+        "rows": {
+            "ledger": len(ledger_rows), "pcap": len(pcap_rows), "lplookup": len(lookup_rows),
+            "lpfund": len(fund_rows)
+        },
+        "categories": categories,
+        "lplookup": _table_records(lookup_rows, tbLPLookup),
+        "lpfund": _table_records(fund_rows, tbLPFund),
+    }
+
+    # Write to a temporary directory and rename it into place, so readers never see a
+    # partial snapshot
+    os.makedirs(database_dir(), exist_ok=True)
+    path = os.path.join(database_dir(), snapshot_name(stamp))
+    temp_path = os.path.join(database_dir(), f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(temp_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(temp_path, f"{name}.npy"), array)
+    with open(os.path.join(temp_path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    try:
+        os.rename(temp_path, path)
+    except OSError:
+        # Another worker wrote the same version first
+        shutil.rmtree(temp_path, ignore_errors=True)
+    _remove_old_snapshots()
+    print(f"Wrote analytics snapshot for data version {stamp['data_version']} to {path}")
+    return AnalyticsSnapshot(path)
+
+def _remove_old_snapshots():
+    """
+    Keep the newest ANALYTICS_SNAPSHOT_KEEP snapshots. Mapped files stay readable after removal
+    on POSIX.
+    """
+    directory = database_dir()
+    names = [name for name in os.listdir(directory) if name.startswith("v")]
+    names.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+    for name in names[ANALYTICS_SNAPSHOT_KEEP:]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+class AnalyticsSnapshot:
+    """A snapshot directory with its columns memory-mapped read-only"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["format"] != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported analytics snapshot format {meta['format']}")
+        self.stamp = meta["stamp"]
+        self.rows = meta["rows"]
+        self.created_at = meta["created_at"]
+        # A trailing None makes code -1 decode to None
+        self.categories = {name: values + [None] for name, values in meta["categories"].items()}
+        self.arrays = {
+            file_name[:-4]: np.load(os.path.join(path, file_name), mmap_mode="r")
+            for file_name in os.listdir(path) if file_name.endswith(".npy")
+        }
+        self.lplookup = [_table_row(record, tbLPLookup) for record in meta["lplookup"]]
+        self.lpfund = [_table_row(record, tbLPFund) for record in meta["lpfund"]]
+        # Every (LP, fund) has aggregates up to the last quarter, which its last row is for
+        quarters = self.arrays["aggregate_quarter"]
+        self.last_quarter = quarters[-1] if len(quarters) else None
+
+    def _codes(self, category, names):
+        index = {name: i for i, name in enumerate(self.categories[category][:-1])}
+        return np.array([index[name] for name in names if name in index], dtype=np.int32)
+
+    def pcap_columns(self, fields, lp_short_names=None, before_date=None):
+        """
+        PCAP columns, in id order, for the given fields and LPs with a PCAP date before before_date:
+        the LP and field codes with their names, PCAP dates, field numbers and amounts (NaN for
+        None)
+        """
+        a = self.arrays
+        mask = np.isin(a["pcap_field"], self._codes("pcap_field", fields))
+        if lp_short_names is not None:
+            mask &= np.isin(
+                a["pcap_lp_short_name"], self._codes("pcap_lp_short_name", lp_short_names)
+            )
+        if before_date is not None:
+            mask &= a["pcap_pcap_date"] < np.datetime64(before_date, "D")
+        rows = np.flatnonzero(mask)
+        return {
+            "lp_names": self.categories["pcap_lp_short_name"][:-1],
+            "lp": a["pcap_lp_short_name"][rows],
+            "pcap_date": a["pcap_pcap_date"][rows],
+            "field_names": self.categories["pcap_field"][:-1],
+            "field": a["pcap_field"][rows],
+            "field_num": a["pcap_field_num"][rows],
+            "amount": a["pcap_amount"][rows],
+        }
+
+    def ledger_aggregates(self):
+        """The per-(LP, fund, quarter) ledger aggregates, as LedgerColumns.quarter_aggregates"""
+        return {
+            name[len("aggregate_"):]: array
+            for name, array in self.arrays.items() if name.startswith("aggregate_")
+        }
+
+    def ledger_totals(self, report_date, lp_short_names=None):
+        """
+        The ledger totals per (LP, fund) as of the report date, read from the aggregates, in the
+        form LedgerColumns.ledger_totals returns. The aggregates are as of quarter ends, so for any
+        other report date within the ledger's quarters this returns None.
+        """
+        a = self.arrays
+        quarters = a["aggregate_quarter"]
+        day = np.datetime64(report_date, "D")
+        if self.last_quarter is not None and day >= self.last_quarter:
+            day = self.last_quarter
+        elif quarter_ends(np.array([day]))[0] != day:
+            return None
+        rows = np.flatnonzero(quarters == day)
+        if lp_short_names is not None:
+            lp_codes = self._codes("ledger_entity", lp_short_names)
+            rows = rows[np.isin(a["aggregate_lp"][rows], lp_codes)]
+
+        entities = self.categories["ledger_entity"]
+        fund_names = self.categories["ledger_related_fund"]
+        values = {metric: a[f"aggregate_{metric}"][rows].tolist() for metric in LEDGER_METRICS}
+        keys = zip(a["aggregate_lp"][rows].tolist(), a["aggregate_fund"][rows].tolist())
+        # A metric without any rows is 0, like an empty sum
+        return {
+            (entities[lp], fund_names[fund]): {
+                metric: values[metric][i] or 0 for metric in LEDGER_METRICS
+            }
+            for i, (lp, fund) in enumerate(keys)
+        }
+
+    def pcap_dates(self):
+        return self.arrays["pcap_dates"].tolist()
+
+    def lps(self, lp_short_names=None):
+        if lp_short_names is None:
+            return list(self.lplookup)
+        names = set(lp_short_names)
+        return [lp for lp in self.lplookup if lp.short_name in names]
+
+    def funds(self, lp_short_names=None):
+        if lp_short_names is None:
+            return list(self.lpfund)
+        names = set(lp_short_names)
+        return [fund for fund in self.lpfund if fund.lp_short_name in names]
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "data_version": self.stamp["data_version"],
+            "created_at": self.created_at,
+            "rows": self.rows,
+            "size_bytes": sum(array.nbytes for array in self.arrays.values()),
+        }
+
+def _table_row(record, model):
+    date_columns = {
+        column.name for column in model.__table__.columns if isinstance(column.type, Date)
+    }
+    return TableRow({
+        name: (
+            date.fromisoformat(value) if name in date_columns and isinstance(value, str) else value
+        )
+        for name, value in record.items()
+    })
+
+_snapshot = None
+_lock = threading.Lock()
+
+def current_snapshot(db: Session):
+    """
+    Get the snapshot for the current data version: the one already mapped, or one another process
+    wrote. Returns None when snapshots are disabled or none matches the current data version.
+    """
+    global _snapshot
+    if not ANALYTICS_SNAPSHOT_ENABLED:
+        return None
+    stamp = data_stamp(get_data_version(db))
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.stamp == stamp:
+        return snapshot
+
+    path = os.path.join(database_dir(), snapshot_name(stamp))
+    if not os.path.isdir(path):
+        return None
+    with _lock:
+        if _snapshot is None or _snapshot.stamp != stamp:
+            try:
+                _snapshot = AnalyticsSnapshot(path)
+            except (OSError, ValueError) as e:
+                print(f"Could not open analytics snapshot {path}: {str(e)}")
+                return None
+        return _snapshot if _snapshot.stamp == stamp else None
+
+def refresh_snapshot(db: Session = None):
+    """
+    Make sure a snapshot of the current data version exists and is mapped, building it if needed
+    """
+    global _snapshot
+    if not ANALYTICS_SNAPSHOT_ENABLED:
+        return None
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        snapshot = current_snapshot(db)
+        if snapshot is None:
+            snapshot = build_snapshot(db)
+            with _lock:
+                _snapshot = snapshot
+        return snapshot
+    finally:
+        if own_session:
+            db.close()
+
+def open_current_snapshot():
+    """Map the snapshot for the current data version, if one has been written"""
+    if not ANALYTICS_SNAPSHOT_ENABLED:
+        return None
+    db = SessionLocal()
+    try:
+        return current_snapshot(db)
+    finally:
+        db.close()
+
+def get_snapshot_stats():
+    """Describe the mapped snapshot, for the warm-up progress"""
+    snapshot = _snapshot
+    return {
+        "enabled": ANALYTICS_SNAPSHOT_ENABLED,
+        "snapshot": snapshot.stats() if snapshot is not None else None,
+    }
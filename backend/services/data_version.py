@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backend.models import tbDataVersion
+
+DATA_VERSION_ID = 1
+
+def get_data_version(db: Session):
+    """Get the current data version row, or an unsaved version 0 if nothing has been recorded yet"""
+    data_version = db.get(tbDataVersion, DATA_VERSION_ID)
+    if data_version is None:
+        return tbDataVersion(id=DATA_VERSION_ID, version=0, updated_at=None)
+    return data_version
+
+def bump_data_version(db: Session):
+    """
+    Increment the data version as part of the caller's transaction.
+    Call this before committing any change to tbLPLookup, tbLPFund, tbPCAP or tbLedger.
+    Returns the new version number.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    version = _increment(db, now)
+    if version is None:
+        # The row is seeded when the table is created; a table created before that gets it on the
+        # first bump, and if a concurrent request adds it first, increment that row instead
+        try:
+            with db.begin_nested():
+                db.add(tbDataVersion(id=DATA_VERSION_ID, version=1, updated_at=now))
+            version = 1
+        except IntegrityError:
+            version = _increment(db, now)
+    return version
+
+def _increment(db: Session, now):
+    return db.execute(
+        update(tbDataVersion)
+        .where(tbDataVersion.id == DATA_VERSION_ID)
+        .values(version=tbDataVersion.version + 1, updated_at=now)
+        .returning(tbDataVersion.version)
+    ).scalar()
+
+def make_etag(data_version):
+    return f'W/"{data_version.version}"'
+
+def check_not_modified(request: Request, data_version):
+    """
+    Return a 304 response if the client's cached copy matches the data version, otherwise None.
+    If-None-Match takes precedence over If-Modified-Since.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etag = make_etag(data_version)
+        # Weak comparison, so W/"3" and "3" both match
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or etag.removeprefix("W/") in tags:
+            return add_version_headers(Response(status_code=304), data_version)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and data_version.updated_at:
+        try:
+            since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return None
+        if data_version.updated_at.replace(microsecond=0) <= since:
+            return add_version_headers(Response(status_code=304), data_version)
+    return None
+
+def add_version_headers(response: Response, data_version):
+    """Add ETag and Last-Modified headers derived from the data version"""
+    response.headers["ETag"] = make_etag(data_version)
+    if data_version.updated_at:
+        response.headers["Last-Modified"] = format_datetime(
+            data_version.updated_at.replace(tzinfo=timezone.utc), usegmt=True
+        )
+    # Let clients cache but always revalidate against the current data version
+    response.headers["Cache-Control"] = "no-cache"
+    return response
@@ -0,0 +1,115 @@
+"""
+Fund lifecycle phases for every LP's funds.
+
+A fund is in its investment phase until reinvest_start, in its reinvestment phase from
+reinvest_start until harvest_start, and in its harvest phase from harvest_start. The start dates of
+every (LP, fund) are kept as datetime64 arrays, so the phases of all funds on a date come from two
+vectorized comparisons and are cached per date.
+"""
+import threading
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.models import tbLPFund
+from backend.services.data_version import get_data_version
+
+PHASE_INVESTMENT = "investment"
+PHASE_REINVEST = "reinvest"
+PHASE_HARVEST = "harvest"
+# Indexed by phase code
+PHASES = [PHASE_INVESTMENT, PHASE_REINVEST, PHASE_HARVEST]
+
+# Dates whose phases are kept before the cache is cleared
+MAX_CACHED_DATES = 256
+
+# Stands in for a missing start date: the phase never starts
+NEVER = np.datetime64("9999-12-31", "D")
+
+def _dates(values):
+    return np.array([v if v is not None else NEVER for v in values], dtype="datetime64[D]")
+
+class FundPhases:
+    """The lifecycle phase of each LP's funds on any date, from the tbLPFund rows"""
+
+    def __init__(self, funds, version=None):
+        funds = list(funds)
+        self.lp_short_names = [fund.lp_short_name for fund in funds]
+        self.fund_names = [fund.fund_name for fund in funds]
+        self.reinvest_starts = _dates([fund.reinvest_start for fund in funds])
+        self.harvest_starts = _dates([fund.harvest_start for fund in funds])
+        # A fund listed more than once for an LP is looked up by its first row, like dataset.funds
+        self.index = {}
+        self.lp_rows = {}
+        for i, key in enumerate(zip(self.lp_short_names, self.fund_names)):
+            self.index.setdefault(key, i)
+            self.lp_rows.setdefault(key[0], []).append(i)
+        self.version = version
+        self._phases = {}
+
+    def phase_codes(self, day):
+        """Get the phase code (an index into PHASES) of every fund row on a date"""
+        codes = self._phases.get(day)
+        if codes is None:
+            if len(self._phases) >= MAX_CACHED_DATES:
+                self._phases.clear()
+            day64 = np.datetime64(day, "D")
+            codes = np.where(
+                self.harvest_starts <= day64, 2, np.where(self.reinvest_starts <= day64, 1, 0)
+            ).astype(np.int8)
+            self._phases[day] = codes
+        return codes
+
+    def phase(self, lp_short_name, fund_name, day):
+        """Get the phase of an LP's fund on a date, or None if the LP has no such fund"""
+        i = self.index.get((lp_short_name, fund_name))
+        if i is None:
+            return None
+        return PHASES[self.phase_codes(day)[i]]
+
+    def is_reinvest_active(self, lp_short_name, fund_name, day):
+        """
+        Whether an LP's fund is in its reinvestment phase on a date: reinvest has started but
+        harvest hasn't
+        """
+        return self.phase(lp_short_name, fund_name, day) == PHASE_REINVEST
+
+    def lp_reinvest_active(self, lp_short_name, day):
+        """Whether any of an LP's funds is in its reinvestment phase on a date"""
+        rows = self.lp_rows.get(lp_short_name)
+        if not rows:
+            return False
+        return bool((self.phase_codes(day)[rows] == 1).any())
+
+    def all_phases(self, day):
+        """Get the phase of every LP's funds on a date, as a list of dicts in tbLPFund order"""
+        codes = self.phase_codes(day).tolist()
+        return [
+            {"lp_short_name": lp, "fund_name": fund, "phase": PHASES[code]}
+            for lp, fund, code in zip(self.lp_short_names, self.fund_names, codes)
+        ]
+
+_phases = None
+_lock = threading.Lock()
+
+def get_fund_phases(db: Session):
+    """
+    Get the phases of all funds at the current data version, loading the fund start dates if needed
+    """
+    global _phases
+    version = get_data_version(db).version
+    phases = _phases
+    if phases is not None and phases.version == version:
+        return phases
+    rows = db.execute(
+        select(
+            tbLPFund.lp_short_name, tbLPFund.fund_name, tbLPFund.reinvest_start,
+            tbLPFund.harvest_start
+        ).order_by(tbLPFund.id)
+    ).all()
+    phases = FundPhases(rows, version)
+    with _lock:
+        if _phases is None or _phases.version < version:
+            _phases = phases
+    return phases
@@ -1,7 +1,22 @@
-from scipy.optimize import newton
-import numpy as np
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import logging
+import os
+import threading
+import time
+from backend.services.request_metrics import record_irr
+
+# IRR process pool settings can be overridden from the .env file
+# With IRR_PROCESS_WORKERS=0, xirr runs in the calling thread as before
+IRR_PROCESS_WORKERS = int(os.getenv("IRR_PROCESS_WORKERS", "2"))
+IRR_TIMEOUT_SECONDS = float(os.getenv("IRR_TIMEOUT_SECONDS", "5"))
+IRR_PROCESS_START_METHOD = os.getenv("IRR_PROCESS_START_METHOD", "spawn")
+
+# Returned when the IRR cannot be computed in time, in the same shape as a failed xirr. Callers
+# check for this object (`result is IRR_FALLBACK_RESULT`) so they don't cache it.
+IRR_FALLBACK_RESULT = (None, False, False)
 
 def xirr(cashflows):
     """
@@ -120,6 +135,9 @@ def xirr(cashflows):
         print(f"IRR calculation not possible - need both positive and negative cash flows.")
         return None  # No solution possible if all cash flows are same sign
 
+    # scipy is imported on first use so that importing the app stays fast
+    from scipy.optimize import newton
+
     # Try multiple initial guesses
     initial_guesses = [0.1, 0.05, 0.01, 0.2, 0.3, -0.1, -0.2]
     
@@ -149,4 +167,101 @@ def xirr(cashflows):
     # If we're here, all guesses failed
     print(f"XIRR calculation failed after trying all initial guesses")
     print(f"Errors encountered: {error_messages}")
-    return None, snapshot_data_issue, chronology_issue
\ No newline at end of file
+    return None, snapshot_data_issue, chronology_issue
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=IRR_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context(IRR_PROCESS_START_METHOD)
+            )
+        return _pool
+
+def _reset_pool(broken_pool):
+    """Replace a pool whose worker died so later calls get a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken_pool:
+            _pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+
+def _retire_pool(pool):
+    """
+    Replace a pool with a worker stuck on a timed out calculation, so later calls don't queue behind
+    it. Work already submitted to the old pool still finishes, then its workers exit.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not pool:
+            return
+        _pool = None
+    pool.shutdown(wait=False)
+    start_irr_pool()
+
+def _ready():
+    # Load scipy in the worker now rather than in its first IRR calculation
+    import scipy.optimize  # noqa: F401
+    return True
+
+def start_irr_pool():
+    """
+    Start the IRR worker processes ahead of the first request, so it doesn't pay their startup time
+    """
+    if IRR_PROCESS_WORKERS <= 0:
+        return
+    pool = _get_pool()
+    for _ in range(IRR_PROCESS_WORKERS):
+        pool.submit(_ready)
+
+def shutdown_irr_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def run_xirr(cashflows, timeout=None):
+    """
+    Calculate xirr on the IRR process pool so the Newton iterations don't hold this process's GIL.
+    Returns IRR_FALLBACK_RESULT if the calculation takes longer than the timeout
+    (IRR_TIMEOUT_SECONDS by default) or its worker process dies. A timed out calculation is
+    cancelled if it hasn't started, otherwise its pool is replaced so it can't hold up later calls.
+    The time spent is recorded in the request metrics.
+    """
+    start = time.perf_counter()
+    timed_out = False
+    try:
+        if IRR_PROCESS_WORKERS <= 0:
+            return xirr(cashflows)
+
+        timeout = IRR_TIMEOUT_SECONDS if timeout is None else timeout
+        pool = _get_pool()
+        try:
+            future = pool.submit(xirr, cashflows)
+        except BrokenProcessPool:
+            _reset_pool(pool)
+            pool = _get_pool()
+            future = pool.submit(xirr, cashflows)
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            timed_out = True
+            print(f"IRR calculation timed out after {timeout}s for {len(cashflows)} cash flows, "
+                  "using fallback result")
+            # A calculation that is still queued is dropped; one that is running holds its worker,
+            # so move later calls to a fresh pool
+            if not future.cancel():
+                _retire_pool(pool)
+            return IRR_FALLBACK_RESULT
+        except BrokenProcessPool:
+            print("IRR worker process died, using fallback result")
+            _reset_pool(pool)
+            return IRR_FALLBACK_RESULT
+    finally:
+        record_irr(time.perf_counter() - start, timed_out)
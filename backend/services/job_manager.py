@@ -0,0 +1,246 @@
+import contextvars
+import json
+import os
+import shutil
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from backend.services.request_metrics import detach_request_stats
+
+# Get the absolute path of the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Job settings can be overridden from the .env file. JOB_MAX_PENDING applies to each worker process.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "20"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+JOB_ARTIFACT_DIR = os.getenv("JOB_ARTIFACT_DIR", os.path.join(project_root, "backend", "artifacts"))
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting for a worker"""
+
+class Job:
+    """A background job and the artifact it produces"""
+
+    def __init__(self, kind, params=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = JOB_STATUS_QUEUED
+        self.progress = 0.0
+        self.message = None
+        self.error = None
+        self.artifact_name = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.pid = os.getpid()
+
+    @property
+    def directory(self):
+        return os.path.join(JOB_ARTIFACT_DIR, self.id)
+
+    @property
+    def artifact_path(self):
+        if not self.artifact_name:
+            return None
+        return os.path.join(self.directory, self.artifact_name)
+
+    @property
+    def is_finished(self):
+        return self.status in (JOB_STATUS_SUCCEEDED, JOB_STATUS_FAILED)
+
+    def set_progress(self, completed, total, message=None):
+        """Record progress as a fraction of completed work items"""
+        self.progress = round(completed / total, 4) if total else 0.0
+        if message is not None:
+            self.message = message
+        _save_job(self)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+            "artifact_name": self.artifact_name,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "pid": self.pid,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data["kind"], data.get("params"))
+        job.id = data["id"]
+        job.status = data["status"]
+        job.progress = data.get("progress", 0.0)
+        job.message = data.get("message")
+        job.error = data.get("error")
+        job.artifact_name = data.get("artifact_name")
+        job.created_at = datetime.fromisoformat(data["created_at"])
+        job.started_at = (
+            datetime.fromisoformat(data["started_at"]) if data.get("started_at") else None
+        )
+        job.finished_at = (
+            datetime.fromisoformat(data["finished_at"]) if data.get("finished_at") else None
+        )
+        job.pid = data.get("pid")
+        return job
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="lp-job")
+_jobs = {}
+_lock = threading.Lock()
+
+def _save_job(job):
+    """Write the job state next to its artifact so other worker processes can see it"""
+    os.makedirs(job.directory, exist_ok=True)
+    temp_path = os.path.join(job.directory, "job.json.tmp")
+    with open(temp_path, "w") as f:
+        json.dump(job.to_dict(), f)
+    os.replace(temp_path, os.path.join(job.directory, "job.json"))
+
+def _load_job(job_id):
+    """Read a job saved by this or another worker process"""
+    path = os.path.join(JOB_ARTIFACT_DIR, os.path.basename(job_id), "job.json")
+    try:
+        with open(path) as f:
+            return Job.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _job_updated_at(job):
+    """Get the time a saved job's state was last written"""
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(os.path.join(job.directory, "job.json")))
+    except OSError:
+        return job.created_at
+
+def _process_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _is_stale(job, cutoff):
+    """
+    Check whether a saved job is queued or running but no longer has a process working on it: it
+    belonged to this process but isn't in its job table (so it was left by an earlier process with
+    the same ID), its process has exited, or its state hasn't been written since before the
+    retention cutoff
+    """
+    if job.is_finished:
+        return False
+    with _lock:
+        if job.id in _jobs:
+            return False
+    if job.pid == os.getpid() or not _process_alive(job.pid):
+        return True
+    return _job_updated_at(job) < cutoff
+
+def _fail_stale_job(job):
+    print(f"Job {job.id} ({job.kind}) was left {job.status} by a stopped process, "
+          f"marking it as failed")
+    job.status = JOB_STATUS_FAILED
+    job.error = "Job was interrupted before it finished"
+    job.finished_at = _job_updated_at(job)
+    _save_job(job)
+
+def _saved_jobs():
+    if not os.path.isdir(JOB_ARTIFACT_DIR):
+        return []
+    return [job for job in map(_load_job, os.listdir(JOB_ARTIFACT_DIR)) if job]
+
+def fail_stale_jobs():
+    """
+    Mark jobs that were left queued or running by a stopped or restarted process as failed; run at
+    startup
+    """
+    cutoff = datetime.now() - timedelta(hours=JOB_RETENTION_HOURS)
+    for job in _saved_jobs():
+        if _is_stale(job, cutoff):
+            _fail_stale_job(job)
+
+def _run_job(job, func):
+    job.status = JOB_STATUS_RUNNING
+    job.started_at = datetime.now()
+    _save_job(job)
+    try:
+        job.artifact_name = func(job)
+        job.status = JOB_STATUS_SUCCEEDED
+        job.progress = 1.0
+    except Exception as e:
+        print(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+        traceback.print_exc()
+        job.status = JOB_STATUS_FAILED
+        job.error = str(e)
+    job.finished_at = datetime.now()
+    _save_job(job)
+
+def submit_job(kind, func, params=None):
+    """
+    Queue func to run on the job worker pool and return the new Job. func receives the Job, writes
+    its artifact into job.directory and returns the artifact file name.
+    """
+    cleanup_expired_jobs()
+    with _lock:
+        pending = sum(1 for job in _jobs.values() if not job.is_finished)
+        if pending >= JOB_MAX_PENDING:
+            raise JobQueueFull(f"Too many jobs in progress ({pending}), try again later")
+        job = Job(kind, params)
+        _jobs[job.id] = job
+    _save_job(job)
+    # Run the job in a copy of the submitting request's context, so a request sent with X-Profile
+    # profiles its job too. The job's SQL and IRR work is still reported as background work.
+    context = contextvars.copy_context()
+    context.run(detach_request_stats)
+    _executor.submit(context.run, _run_job, job, func)
+    return job
+
+def get_job(job_id):
+    """Get a job by ID, or None if it does not exist or has expired"""
+    with _lock:
+        job = _jobs.get(job_id)
+    return job or _load_job(job_id)
+
+def list_jobs():
+    """Get all retained jobs, newest first"""
+    cleanup_expired_jobs()
+    jobs = {job.id: job for job in _saved_jobs()}
+    with _lock:
+        jobs.update(_jobs)
+    return sorted(jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+def cleanup_expired_jobs():
+    """
+    Remove finished jobs and their artifacts once they are older than the retention period. Stale
+    queued or running jobs are marked as failed first, as of their last update, so they expire the
+    same way.
+    """
+    cutoff = datetime.now() - timedelta(hours=JOB_RETENTION_HOURS)
+    with _lock:
+        for job_id in [
+            job_id for job_id, job in _jobs.items() if job.is_finished and job.finished_at < cutoff
+        ]:
+            del _jobs[job_id]
+    for job in _saved_jobs():
+        if _is_stale(job, cutoff):
+            _fail_stale_job(job)
+        if job.is_finished and job.finished_at < cutoff:
+            shutil.rmtree(job.directory, ignore_errors=True)
@@ -0,0 +1,400 @@
+"""
+The ledger as in-memory NumPy columns, for vectorized metric sums.
+
+Effective dates and amounts are stored as datetime64/float64 arrays and the string columns as int32
+category codes (-1 for None), in ledger id order. Sums are accumulated in that order, so they come
+out exactly as a row-by-row Python sum would. The columns for the whole ledger are kept per process
+and moved forward by the ledger CRUD routes, so a change doesn't require reading the table again.
+Columns read from the analytics snapshot are read-only views of its memory-mapped files; a change
+builds new arrays instead of writing to them.
+"""
+import threading
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.models import tbLedger
+from backend.services.data_version import get_data_version
+
+# Ledger values summed per (LP, fund); rows are attributed to LPs by LedgerColumns.attributed_rows
+LEDGER_METRICS = [
+    "commitment", "capital_called", "capital_distribution", "income_distribution",
+    "distribution"
+]
+
+# The entity columns share one set of codes, so LPs can be compared across them
+ENTITY_COLUMNS = ["entity_from", "entity_to", "related_entity"]
+CODED_COLUMNS = ["activity", "sub_activity", "related_fund", "entity"]
+ROW_COLUMNS = [
+    "id", "effective_date", "activity", "sub_activity", "amount", "entity_from", "entity_to",
+    "related_entity", "related_fund"
+]
+
+# A ledger row read from the columns, with the attributes of tbLedger
+LedgerEntry = namedtuple("LedgerEntry", ROW_COLUMNS)
+
+def _category(column):
+    return "entity" if column in ENTITY_COLUMNS else column
+
+def quarter_ends(dates):
+    """The end date of the calendar quarter of each date"""
+    months = dates.astype("datetime64[M]")
+    quarter_start = months - (months.astype(np.int64) % 3)
+    return (quarter_start + 3).astype("datetime64[D]") - 1
+
+class LedgerColumns:
+    """The ledger, or part of it, as NumPy columns in id order"""
+
+    def __init__(self, ids, effective_dates, amounts, codes, categories, version=None):
+        self.ids = ids
+        self.effective_dates = effective_dates
+        self.amounts = amounts
+        # Codes per ledger column, and the values of each category
+        # (activity, sub_activity, related_fund, entity)
+        self.codes = codes
+        self.categories = categories
+        self.index = {
+            name: {value: i for i, value in enumerate(values)}
+            for name, values in categories.items()
+        }
+        # The data version the columns were loaded at, for the per-process copy of the whole ledger
+        self.version = version
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows, version=None):
+        """
+        Build the columns from ledger rows (ORM objects or anything with the same attributes) in id
+        order
+        """
+        categories = {name: {} for name in CODED_COLUMNS}
+        values = {column: [] for column in ROW_COLUMNS}
+        for row in rows:
+            for column in ROW_COLUMNS:
+                values[column].append(getattr(row, column))
+
+        codes = {}
+        for column in ROW_COLUMNS[2:]:
+            if column == "amount":
+                continue
+            index = categories[_category(column)]
+            codes[column] = np.fromiter(
+                (-1 if v is None else index.setdefault(v, len(index)) for v in values[column]),
+                dtype=np.int32, count=len(values[column])
+            )
+        return cls(
+            ids=np.array(values["id"], dtype=np.int64),
+            effective_dates=np.array(
+                [v if v is not None else "NaT" for v in values["effective_date"]],
+                dtype="datetime64[D]"
+            ),
+            amounts=np.array(
+                [v if v is not None else np.nan for v in values["amount"]], dtype=np.float64
+            ),
+            codes=codes,
+            categories={name: list(index) for name, index in categories.items()},
+            version=version,
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot, version=None):
+        """
+        Read the columns from an analytics snapshot as views of its memory-mapped arrays, without
+        copying them. The snapshot codes its entity columns with one set of categories.
+        """
+        return cls.from_arrays(
+            snapshot.arrays,
+            {name: values[:-1] for name, values in snapshot.categories.items()},
+            version
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays, categories, version=None):
+        """Wrap the ledger arrays and categories of an analytics snapshot, as views"""
+        codes = {
+            column: np.asarray(arrays[f"ledger_{column}"])
+            for column in ROW_COLUMNS[2:] if column != "amount"
+        }
+        return cls(
+            ids=np.asarray(arrays["ledger_id"]),
+            effective_dates=np.asarray(arrays["ledger_effective_date"]),
+            amounts=np.asarray(arrays["ledger_amount"]),
+            codes=codes,
+            categories={name: categories[f"ledger_{name}"] for name in CODED_COLUMNS},
+            version=version,
+        )
+
+    def code(self, column, value):
+        """The code of a value in a column: -1 for None, -2 if the value never occurs"""
+        if value is None:
+            return -1
+        return self.index[_category(column)].get(value, -2)
+
+    def rows(self, positions):
+        """The rows at the given positions as LedgerEntry tuples"""
+        values = [
+            self.ids[positions].tolist(),
+            self.effective_dates[positions].tolist(),
+        ]
+        for column in ROW_COLUMNS[2:]:
+            if column == "amount":
+                values.append([None if v != v else v for v in self.amounts[positions].tolist()])
+            else:
+                names = self.categories[_category(column)] + [None]
+                values.append([names[code] for code in self.codes[column][positions].tolist()])
+        return [LedgerEntry(*row) for row in zip(*values)]
+
+    def with_changes(self, rows=(), deleted_ids=(), version=None):
+        """
+        Return new columns with rows inserted or replaced (matched by id) and rows removed. The
+        columns are copied rather than changed in place, so readers of the current columns (and the
+        snapshot files they may be views of) are never affected.
+        """
+        changed = {row.id: row for row in rows}
+        removed = set(deleted_ids) | set(changed)
+        keep = ~np.isin(self.ids, np.fromiter(removed, dtype=np.int64, count=len(removed)))
+        added = LedgerColumns.from_rows(sorted(changed.values(), key=lambda row: row.id))
+
+        # Re-code the new rows against these categories, adding the values they haven't seen
+        categories = {}
+        mappings = {}
+        for name, values in added.categories.items():
+            index = dict(self.index[name])
+            for value in values:
+                index.setdefault(value, len(index))
+            categories[name] = list(index)
+            mappings[name] = np.array([index[value] for value in values] + [-1], dtype=np.int32)
+        codes = {
+            column: np.concatenate(
+                [column_codes[keep], mappings[_category(column)][added.codes[column]]]
+            )
+            for column, column_codes in self.codes.items()
+        }
+
+        ids = np.concatenate([self.ids[keep], added.ids])
+        effective_dates = np.concatenate([self.effective_dates[keep], added.effective_dates])
+        amounts = np.concatenate([self.amounts[keep], added.amounts])
+        # New ids normally come after the existing ones; keep id order if not
+        if len(added) and len(ids) > len(added) and ids[-len(added)] < ids[:-len(added)].max():
+            order = np.argsort(ids, kind="stable")
+            ids, effective_dates, amounts = ids[order], effective_dates[order], amounts[order]
+            codes = {column: column_codes[order] for column, column_codes in codes.items()}
+        return LedgerColumns(ids, effective_dates, amounts, codes, categories, version)
+
+    def metric_masks(self):
+        """A row mask per LEDGER_METRICS value, from the activity and sub-activity of each row"""
+        activity = self.codes["activity"]
+        sub_activity = self.codes["sub_activity"]
+        is_call = activity == self.code("activity", "Capital Call")
+        is_distribution = activity == self.code("activity", "LP Distribution")
+        return {
+            "commitment": sub_activity == self.code("sub_activity", "New Commitment"),
+            "capital_called": is_call,
+            "capital_distribution": (
+                is_distribution
+                & (sub_activity == self.code("sub_activity", "Capital Distribution"))
+            ),
+            "income_distribution": (
+                is_distribution & (sub_activity == self.code("sub_activity", "Income Distribution"))
+            ),
+            "distribution": is_distribution,
+        }
+
+    def attributed_rows(self, mask, lp_codes=None):
+        """
+        Attribute the rows selected by mask to the LPs they count for. A row counts for its related
+        entity, and a capital call also counts for the entity the money came from when that is a
+        different entity. The fund metrics, the reconciliation and the performance analytics all use
+        this rule. lp_codes (entity codes) limits the LPs. Returns the row positions in ledger
+        order, the entity code each one counts for, and whether it is the entity-from copy of a
+        capital call, which only counts towards capital called.
+        """
+        related = self.codes["related_entity"]
+        entity_from = self.codes["entity_from"]
+        if lp_codes is not None:
+            related_lp = np.isin(related, lp_codes)
+            from_lp = np.isin(entity_from, lp_codes)
+        else:
+            related_lp = related >= 0
+            from_lp = entity_from >= 0
+        is_call = self.codes["activity"] == self.code("activity", "Capital Call")
+
+        by_related = np.flatnonzero(mask & related_lp)
+        by_entity_from = np.flatnonzero(mask & from_lp & is_call & (entity_from != related))
+        positions = np.concatenate([by_related, by_entity_from])
+        entities = np.concatenate([related[by_related], entity_from[by_entity_from]])
+        from_entity = np.concatenate([
+            np.zeros(len(by_related), dtype=bool), np.ones(len(by_entity_from), dtype=bool)
+        ])
+        order = np.argsort(positions, kind="stable")
+        return positions[order], entities[order], from_entity[order]
+
+    def ledger_totals(self, report_date, lp_short_names=None):
+        """
+        Sum the LEDGER_METRICS per (LP, fund) over rows with an effective date on or before the
+        report date. Returns {(lp_short_name, fund_name): {metric: total}}, where a metric with no
+        rows is 0 like an empty sum. Rows are attributed to LPs as in attributed_rows.
+        """
+        # NaT never compares true, so rows without an effective date are left out
+        valid = self.effective_dates <= np.datetime64(report_date, "D")
+        lp_codes = None
+        if lp_short_names is not None:
+            lp_codes = [self.code("related_entity", name) for name in lp_short_names]
+            lp_codes = np.array([code for code in lp_codes if code >= 0], dtype=np.int32)
+
+        # Accumulate in ledger order, so each total matches a sequential sum over the LP's
+        # fund ledger
+        positions, lps, only_calls = self.attributed_rows(valid, lp_codes)
+        lps = lps.astype(np.int64)
+        funds = self.codes["related_fund"][positions].astype(np.int64) + 1
+        keys, inverse = np.unique(
+            lps * (len(self.categories["related_fund"]) + 1) + funds, return_inverse=True
+        )
+        inverse = inverse.ravel()
+        amounts = self.amounts[positions]
+
+        sums = {}
+        counts = {}
+        for metric, mask in self.metric_masks().items():
+            selected = (
+                mask[positions] if metric == "capital_called" else mask[positions] & ~only_calls
+            )
+            weights = np.where(selected, amounts, 0.0)
+            sums[metric] = np.bincount(inverse, weights=weights, minlength=len(keys)).tolist()
+            counts[metric] = np.bincount(inverse, weights=selected, minlength=len(keys)).tolist()
+
+        entities = self.categories["entity"]
+        fund_names = [None] + self.categories["related_fund"]
+        n_funds = len(fund_names)
+        totals = {}
+        for i, key in enumerate(keys.tolist()):
+            totals[(entities[key // n_funds], fund_names[key % n_funds])] = {
+                metric: sums[metric][i] if counts[metric][i] else 0 for metric in LEDGER_METRICS
+            }
+        return totals
+
+    def quarter_aggregates(self, totals=True):
+        """
+        Aggregate the LEDGER_METRICS per (LP, fund, quarter), with rows attributed to LPs as in
+        attributed_rows. Each (LP, fund) has a row for every quarter from its first ledger row to
+        the last quarter of the ledger, in (LP, fund, quarter) order. Returns {name: array}: "lp"
+        (entity codes), "fund" (related_fund codes, -1 for None) and "quarter" (quarter end dates),
+        and per metric "quarter_<metric>", the sum of the quarter's rows that have an amount, and
+        "parts_<metric>", the number of sub-activities among those rows. With totals, each metric
+        also has its total as of the quarter end, exactly as ledger_totals gives it for that date.
+        """
+        positions, lps, only_calls = self.attributed_rows(~np.isnat(self.effective_dates))
+        keys, key_inverse = np.unique(
+            np.rec.fromarrays([lps, self.codes["related_fund"][positions]]), return_inverse=True
+        )
+        key_inverse = key_inverse.ravel().astype(np.int64)
+        quarters = quarter_ends(self.effective_dates[positions])
+        if len(quarters):
+            months = quarters.astype("datetime64[M]")
+            months = np.arange(months.min(), months.max() + 1, 3)
+            all_quarters = (months + 1).astype("datetime64[D]") - 1
+        else:
+            all_quarters = quarters
+        quarter_index = np.searchsorted(all_quarters, quarters)
+        n_keys, n_quarters = len(keys), len(all_quarters)
+
+        # Rows from each (LP, fund)'s first quarter on, and the (LP, fund, quarter) cell of each
+        first = np.full(n_keys, n_quarters, dtype=np.int64)
+        np.minimum.at(first, key_inverse, quarter_index)
+        counts = n_quarters - first
+        row_keys = np.repeat(np.arange(n_keys), counts)
+        row_quarters = (
+            np.arange(len(row_keys)) - np.repeat(np.cumsum(counts) - counts, counts)
+            + first[row_keys]
+        )
+        row_cells = row_keys * n_quarters + row_quarters
+        cells = key_inverse * n_quarters + quarter_index
+        aggregates = {
+            "lp": keys["f0"][row_keys], "fund": keys["f1"][row_keys],
+            "quarter": all_quarters[row_quarters],
+        }
+
+        amounts = self.amounts[positions]
+        has_amount = ~np.isnan(amounts)
+        n_sub_activities = len(self.categories["sub_activity"]) + 1
+        sub_activities = self.codes["sub_activity"][positions].astype(np.int64) + 1
+        weights = {}
+        for metric, mask in self.metric_masks().items():
+            selected = mask[positions]
+            if metric != "capital_called":
+                selected = selected & ~only_calls
+            weights[metric] = np.where(selected, amounts, 0.0)
+            in_quarter = selected & has_amount
+            aggregates[f"quarter_{metric}"] = np.bincount(
+                cells[in_quarter], weights=amounts[in_quarter], minlength=n_keys * n_quarters
+            )[row_cells]
+            parts = np.unique(cells[in_quarter] * n_sub_activities + sub_activities[in_quarter])
+            aggregates[f"parts_{metric}"] = np.bincount(
+                parts // n_sub_activities, minlength=n_keys * n_quarters
+            )[row_cells].astype(np.int32)
+
+        if totals:
+            # Summed again over all rows up to each quarter end, in ledger order, rather than
+            # added up quarter by quarter, so the totals match ledger_totals to the last bit
+            cumulative = {metric: np.zeros((n_keys, n_quarters)) for metric in LEDGER_METRICS}
+            for quarter in range(n_quarters):
+                rows = quarter_index <= quarter
+                for metric in LEDGER_METRICS:
+                    cumulative[metric][:, quarter] = np.bincount(
+                        key_inverse[rows], weights=weights[metric][rows], minlength=n_keys
+                    )
+            for metric in LEDGER_METRICS:
+                aggregates[metric] = cumulative[metric].ravel()[row_cells]
+        return aggregates
+
+_columns = None
+_lock = threading.Lock()
+
+def load_ledger_columns(db: Session, version):
+    """Load the whole ledger as columns, from the analytics snapshot when it is current"""
+    from backend.services.analytics_snapshot import current_snapshot
+    snapshot = current_snapshot(db)
+    if snapshot is not None:
+        return LedgerColumns.from_snapshot(snapshot, version)
+    columns = [getattr(tbLedger, column) for column in ROW_COLUMNS]
+    rows = db.execute(select(*columns).order_by(tbLedger.id)).all()
+    return LedgerColumns.from_rows(rows, version)
+
+def get_ledger_columns(db: Session):
+    """Get the columns of the whole ledger at the current data version, loading them if needed"""
+    global _columns
+    version = get_data_version(db).version
+    columns = _columns
+    if columns is not None and columns.version == version:
+        return columns
+    columns = load_ledger_columns(db, version)
+    with _lock:
+        if _columns is None or _columns.version is None or _columns.version < version:
+            _columns = columns
+    return columns
+
+def apply_ledger_changes(version, rows=(), deleted_ids=()):
+    """
+    Move this process's ledger columns to a new data version after a committed ledger change: rows
+    created or updated, and ids deleted. version is the data version the change was committed with.
+    If the columns are not at the version just before it (another process changed the data too), or
+    the change can't be applied, they are dropped and loaded again when next needed.
+    """
+    global _columns
+    with _lock:
+        if _columns is None:
+            return
+        if _columns.version != version - 1:
+            _columns = None
+            return
+        try:
+            _columns = _columns.with_changes(rows, deleted_ids, version)
+        except Exception as e:
+            # The change is already committed, so drop the columns rather than fail the request
+            print("Could not apply the ledger change to the in-memory columns, reloading them: "
+                  f"{str(e)}")
+            _columns = None
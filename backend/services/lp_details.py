@@ -0,0 +1,136 @@
+import os
+import threading
+from collections import OrderedDict
+from backend.services.metrics_calculator import MetricsDataset, dataset_lp_metrics
+from backend.services.single_flight import SingleFlight
+
+# Number of computed LP details payloads kept in memory
+LP_DETAILS_CACHE_SIZE = int(os.getenv("LP_DETAILS_CACHE_SIZE", "512"))
+
+class LRUCache:
+    """A thread safe least recently used cache with hit and miss counters"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._items), "max_size": self.max_size, "hits": self.hits,
+                "misses": self.misses
+            }
+
+# Computed LP details keyed by lp_details_key, so entries for older data versions are never served
+lp_details_cache = LRUCache(LP_DETAILS_CACHE_SIZE)
+
+# Coalesces concurrent LP details computations for the same key
+lp_details_flight = SingleFlight()
+
+def lp_details_key(short_name: str, report_date: str, version: int, include_transactions: bool):
+    return (short_name, report_date, version, include_transactions)
+
+def cached_lp_details(key, compute):
+    """
+    Get LP details from the cache, or compute them with compute() and cache them.
+    Concurrent misses for the same key share one computation. Details whose IRR fell back because
+    it could not be calculated in time are returned but not cached, so the next request retries.
+    """
+    details = lp_details_cache.get(key)
+    if details is not None:
+        return details
+
+    def compute_and_store():
+        result = compute()
+        if not result.get("irr_unavailable"):
+            lp_details_cache.set(key, result)
+        return result
+
+    return lp_details_flight.do(key, compute_and_store)
+
+def build_lp_details(
+    dataset: MetricsDataset, short_name: str, report_date: str, include_transactions=False
+):
+    """Build the LP details payload (fund investments, metrics and IRR) from a loaded dataset"""
+    lp = dataset.lps[short_name]
+    funds = dataset.funds.get(short_name, [])
+    
+    # Special debug for Magic LP
+    if short_name == "Magic":
+        print(f"\n------- DETAILED DEBUG FOR MAGIC LP IRR -------")
+        print(f"Report date: {report_date}")
+    
+    # Calculate fund metrics once, then derive the LP totals and IRR from them
+    lp_metrics = dataset_lp_metrics(dataset, short_name, report_date, include_transactions)
+    
+    funds_with_metrics = []
+    for fund, metrics in zip(funds, lp_metrics["funds"]):
+        funds_with_metrics.append({
+            "fund_name": fund.fund_name,
+            "fund_group": fund.fund_group,
+            "status": fund.status,
+            "management_fee": fund.management_fee,
+            "incentive": fund.incentive,
+            "term_end": fund.term_end,
+            "reinvest_start": fund.reinvest_start,
+            "harvest_start": fund.harvest_start,
+            "metrics": metrics
+        })
+    
+    totals = lp_metrics["totals"]
+    irr_data = lp_metrics["irr"]
+    
+    if short_name == "Magic":
+        print(f"Magic LP IRR Result: {irr_data['irr']}")
+        if irr_data['irr'] is None:
+            print("IRR calculation returned None - this explains the N/A in the UI")
+        print(f"Snapshot data issue: {irr_data['snapshot_data_issue']}")
+        print(f"Chronology issue: {irr_data['chronology_issue']}")
+        print(f"------- END DEBUG FOR MAGIC LP IRR -------\n")
+    
+    pcap_report_date = lp_metrics["pcap_report_date"]
+    
+    return {
+        "lp_details": {
+            "short_name": lp.short_name,
+            "active": lp.active,
+            "source": lp.source,
+            "effective_date": lp.effective_date,
+            "inactive_date": lp.inactive_date
+        },
+        "funds": funds_with_metrics,
+        "totals": totals,
+        "irr": irr_data['irr'],
+        "irr_snapshot_data_issue": irr_data['snapshot_data_issue'],
+        "irr_chronology_issue": irr_data['chronology_issue'],
+        # True when the IRR could not be calculated in time; such details are not cached
+        "irr_unavailable": irr_data.get('unavailable', False),
+        "pcap_report_date": pcap_report_date
+    }
@@ -1,178 +1,468 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, or_
+from sqlalchemy import and_, or_
 # Change from relative to absolute imports
-from backend.models import tbLedger, tbLPFund, tbPCAP
+from backend.models import tbLedger, tbLPFund, tbPCAP, tbLPLookup
 from datetime import datetime, timedelta
+from bisect import bisect_right
+from collections import namedtuple
 import csv
 import os
-from backend.services.irr_calculator import xirr
+import numpy as np
+from backend.services.irr_calculator import run_xirr, IRR_FALLBACK_RESULT
+from backend.services.profiling import profiled
+
+# PCAP fields used by the metric and IRR calculations
+METRIC_PCAP_FIELDS = ["Transfers", "Capital Calls", "Ending Capital Balance"]
+
+# Ledger columns read for the metric and IRR calculations; rows are loaded as plain tuples,
+# not ORM objects
+METRIC_LEDGER_COLUMNS = [
+    tbLedger.id, tbLedger.effective_date, tbLedger.activity, tbLedger.sub_activity, tbLedger.amount,
+    tbLedger.entity_from, tbLedger.entity_to, tbLedger.related_entity, tbLedger.related_fund
+]
+
+# Ledger sums for a fund without any matching ledger rows
+EMPTY_LEDGER_TOTALS = {
+    "commitment": 0, "capital_called": 0, "capital_distribution": 0, "income_distribution": 0,
+    "distribution": 0
+}
+
+# Metrics with supporting ledger transactions
+METRIC_NAMES = [
+    "total_commitment", "total_capital_called", "total_capital_distribution",
+    "total_income_distribution", "total_distribution", "remaining_capital"
+]
+
+def parse_report_date(report_date):
+    """Convert a 'YYYY-MM-DD' report date string to a date"""
+    return datetime.strptime(report_date, '%Y-%m-%d').date()
+
+def next_month_start(day):
+    """Get the first day of the month after the given date"""
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+# A PCAP record read from the PCAP columns
+PCAPRecord = namedtuple("PCAPRecord", ["pcap_date", "field_num", "field", "amount"])
+
+def pcap_columns_from_rows(rows):
+    """PCAP rows (ORM objects or anything with the same attributes) as PCAP columns"""
+    lp_names = {}
+    field_names = {}
+    return {
+        "lp": np.fromiter(
+            (-1 if r.lp_short_name is None else lp_names.setdefault(r.lp_short_name, len(lp_names))
+             for r in rows),
+            dtype=np.int32, count=len(rows)
+        ),
+        "pcap_date": np.array(
+            [r.pcap_date if r.pcap_date is not None else "NaT" for r in rows],
+            dtype="datetime64[D]"
+        ),
+        "field": np.fromiter(
+            (-1 if r.field is None else field_names.setdefault(r.field, len(field_names))
+             for r in rows),
+            dtype=np.int32, count=len(rows)
+        ),
+        "field_num": np.array(
+            [r.field_num if r.field_num is not None else np.nan for r in rows], dtype=np.float64
+        ),
+        "amount": np.array(
+            [r.amount if r.amount is not None else np.nan for r in rows], dtype=np.float64
+        ),
+        "lp_names": list(lp_names),
+        "field_names": list(field_names),
+    }
+
+def group_positions(codes, size):
+    """The positions of each code from 0 to size - 1 in an array of codes, in array order"""
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(size + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(size)]
+
+class MetricsDataset:
+    """
+    Ledger, PCAP and fund rows for a set of LPs, loaded once with one query per table.
+    Metrics and IRR for any of these LPs, as of any report date up to the latest one
+    the dataset was loaded for, can then be computed without further queries.
+    """
+
+    def __init__(self, lps, funds, ledger_columns, pcap, pcap_dates, snapshot=None):
+        from backend.services.fund_phases import FundPhases
+        self.lps = {lp.short_name: lp for lp in lps}
+        self.pcap_dates = sorted(pcap_dates)
+
+        # Funds per LP, in table order, and their lifecycle phases
+        funds = list(funds)
+        self.funds = {}
+        for fund in funds:
+            self.funds.setdefault(fund.lp_short_name, []).append(fund)
+        self.fund_phases = FundPhases(funds)
+
+        # The ledger as NumPy columns; a superset of the LPs' rows (such as the whole ledger) gives
+        # the same results, since everything read from them is filtered by LP and date. Python
+        # objects are only built for the rows of an LP whose transactions are listed.
+        self.ledger_columns = ledger_columns
+        self._ledger_positions = None
+        self._ledger_totals = {}
+        self._fund_ledger = {}
+
+        # The analytics snapshot the dataset was read from, for its per-quarter ledger totals
+        self.snapshot = snapshot
+
+        # PCAP columns (as pcap_columns_from_rows returns them), indexed per LP on first use
+        self.pcap_columns = pcap
+        self._pcap_positions = None
+        self._pcap = {}
+
+    def ledger_totals(self, lp_short_name, fund_name, report_date):
+        """
+        Get the ledger metric sums for an LP's fund as of a report date, summing every LP's funds on
+        first use. Quarter-end totals are read from the snapshot's aggregates when there is one.
+        """
+        totals = self._ledger_totals.get(report_date)
+        if totals is None:
+            if self.snapshot is not None:
+                totals = self.snapshot.ledger_totals(report_date, list(self.lps))
+            if totals is None:
+                totals = self.ledger_columns.ledger_totals(report_date, list(self.lps))
+            self._ledger_totals[report_date] = totals
+        return totals.get((lp_short_name, fund_name), EMPTY_LEDGER_TOTALS)
+
+    def _attributed_positions(self, lp_short_names):
+        """The positions of each LP's ledger rows, attributed as in LedgerColumns.attributed_rows"""
+        columns = self.ledger_columns
+        codes = {name: columns.code("related_entity", name) for name in lp_short_names}
+        lp_codes = np.array([code for code in codes.values() if code >= 0], dtype=np.int32)
+        positions, entities, _ = columns.attributed_rows(
+            ~np.isnat(columns.effective_dates), lp_codes
+        )
+        grouped = group_positions(entities, len(columns.categories["entity"]))
+        empty = np.zeros(0, dtype=np.int64)
+        return {
+            name: positions[grouped[code]] if code >= 0 else empty for name, code in codes.items()
+        }
+
+    def ledger_positions(self, lp_short_name):
+        """
+        Get the positions of an LP's ledger rows in the ledger columns: rows the LP is the related
+        entity of, and capital calls paid from the LP. Every LP's rows are found on first use.
+        """
+        if self._ledger_positions is None:
+            self._ledger_positions = self._attributed_positions(list(self.lps))
+        if lp_short_name not in self._ledger_positions:
+            self._ledger_positions.update(self._attributed_positions([lp_short_name]))
+        return self._ledger_positions[lp_short_name]
+
+    def fund_ledger(self, lp_short_name):
+        """Get an LP's ledger rows grouped by related fund, grouping them on first use"""
+        if lp_short_name not in self._fund_ledger:
+            grouped = {}
+            rows = self.ledger_columns.rows(self.ledger_positions(lp_short_name))
+            for entry in rows:
+                grouped.setdefault(entry.related_fund, []).append(entry)
+            self._fund_ledger[lp_short_name] = grouped
+        return self._fund_ledger[lp_short_name]
+
+    def cash_flows(self, lp_short_name, activity, until):
+        """
+        Get the (effective date, amount) of an LP's ledger rows of an activity that the LP is the
+        related entity of, up to a date, in ledger order
+        """
+        columns = self.ledger_columns
+        positions = self.ledger_positions(lp_short_name)
+        positions = positions[
+            (columns.codes["related_entity"][positions] == columns.code("related_entity",
+                                                                         lp_short_name))
+            & (columns.codes["activity"][positions] == columns.code("activity", activity))
+            & (columns.effective_dates[positions] <= np.datetime64(until, "D"))
+        ]
+        amounts = [None if v != v else v for v in columns.amounts[positions].tolist()]
+        return list(zip(columns.effective_dates[positions].tolist(), amounts))
+
+    def lp_pcap(self, lp_short_name):
+        """Get an LP's PCAP records per (PCAP date, field), in id order, built on first use"""
+        if lp_short_name not in self._pcap:
+            pcap = self.pcap_columns
+            if self._pcap_positions is None:
+                self._pcap_positions = dict(zip(
+                    pcap["lp_names"], group_positions(pcap["lp"], len(pcap["lp_names"]))
+                ))
+            positions = self._pcap_positions.get(lp_short_name, np.zeros(0, dtype=np.int64))
+            field_names = pcap["field_names"] + [None]
+            values = zip(
+                pcap["pcap_date"][positions].tolist(),
+                [None if v != v else int(v) for v in pcap["field_num"][positions].tolist()],
+                [field_names[code] for code in pcap["field"][positions].tolist()],
+                [None if v != v else v for v in pcap["amount"][positions].tolist()],
+            )
+            records = {}
+            for record in (PCAPRecord(*row) for row in values):
+                records.setdefault((record.pcap_date, record.field), []).append(record)
+            self._pcap[lp_short_name] = records
+        return self._pcap[lp_short_name]
+
+    def pcap_report_date(self, report_date):
+        """Get the latest PCAP date before or equal to the report date"""
+        index = bisect_right(self.pcap_dates, report_date)
+        return self.pcap_dates[index - 1] if index else None
+
+    def pcap_record(self, lp_short_name, pcap_date, field):
+        """Get the first PCAP record for an LP, date and field"""
+        records = self.lp_pcap(lp_short_name).get((pcap_date, field))
+        return records[0] if records else None
+
+    def ending_balance_record(self, lp_short_name, pcap_date, nearest_in_month=False):
+        """
+        Get the Ending Capital Balance for an LP on the PCAP date, taking the highest field_num.
+        With nearest_in_month, fall back to the closest date in the same month when there is no
+        exact match.
+        """
+        records = self.lp_pcap(lp_short_name).get((pcap_date, "Ending Capital Balance"))
+        if records:
+            return max(
+                records, key=lambda r: r.field_num if r.field_num is not None else float("-inf")
+            )
+        if not nearest_in_month or pcap_date is None:
+            return None
+
+        month_start = pcap_date.replace(day=1)
+        next_month = next_month_start(pcap_date)
+        candidates = [
+            r for (_, field), records in self.lp_pcap(lp_short_name).items()
+            if field == "Ending Capital Balance"
+            for r in records if month_start <= r.pcap_date < next_month
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda r: abs((r.pcap_date - pcap_date).days))
+
+def load_metrics_dataset(db: Session, lp_short_names=None, report_dates=None):
+    """
+    Load everything needed to calculate metrics for the given LPs (all LPs if None)
+    as of any of the given report dates ('YYYY-MM-DD' strings; no upper bound if None).
+    """
+    latest_date = max(parse_report_date(d) for d in report_dates) if report_dates else None
+    if lp_short_names is not None:
+        lp_short_names = list(set(lp_short_names))
+
+    # The ledger is read from this process's columns of the whole ledger, which are views of the
+    # analytics snapshot when there is one for the current data version
+    from backend.services.analytics_snapshot import current_snapshot
+    from backend.services.ledger_engine import get_ledger_columns
+    snapshot = current_snapshot(db)
+    if snapshot is not None:
+        return MetricsDataset(
+            lps=snapshot.lps(lp_short_names),
+            funds=snapshot.funds(lp_short_names),
+            ledger_columns=get_ledger_columns(db),
+            pcap=snapshot.pcap_columns(
+                METRIC_PCAP_FIELDS, lp_short_names,
+                next_month_start(latest_date) if latest_date else None
+            ),
+            pcap_dates=snapshot.pcap_dates(),
+            snapshot=snapshot
+        )
+
+    lp_query = db.query(*tbLPLookup.__table__.columns)
+    fund_query = db.query(*tbLPFund.__table__.columns)
+    pcap_query = db.query(*tbPCAP.__table__.columns).filter(tbPCAP.field.in_(METRIC_PCAP_FIELDS))
+
+    if lp_short_names is not None:
+        lp_query = lp_query.filter(tbLPLookup.short_name.in_(lp_short_names))
+        fund_query = fund_query.filter(tbLPFund.lp_short_name.in_(lp_short_names))
+        pcap_query = pcap_query.filter(tbPCAP.lp_short_name.in_(lp_short_names))
+
+    if latest_date is not None:
+        # Ending balances later in the same month can stand in for a missing exact match
+        pcap_query = pcap_query.filter(tbPCAP.pcap_date < next_month_start(latest_date))
+
+    # For every LP, read this process's columns of the whole ledger instead of building new ones
+    if lp_short_names is None:
+        ledger_columns = get_ledger_columns(db)
+    else:
+        from backend.services.ledger_engine import LedgerColumns
+        ledger_query = db.query(*METRIC_LEDGER_COLUMNS).filter(or_(
+            tbLedger.related_entity.in_(lp_short_names),
+            tbLedger.entity_from.in_(lp_short_names)
+        ))
+        if latest_date is not None:
+            ledger_query = ledger_query.filter(tbLedger.effective_date <= latest_date)
+        ledger_columns = LedgerColumns.from_rows(ledger_query.order_by(tbLedger.id).all())
+
+    pcap_dates = db.query(tbPCAP.pcap_date).filter(tbPCAP.pcap_date.isnot(None)).distinct().all()
+
+    return MetricsDataset(
+        lps=lp_query.all(),
+        funds=fund_query.order_by(tbLPFund.id).all(),
+        ledger_columns=ledger_columns,
+        pcap=pcap_columns_from_rows(pcap_query.order_by(tbPCAP.id).all()),
+        pcap_dates=[row.pcap_date for row in pcap_dates]
+    )
+
+def metric_transactions_filter(metric: str, lp_short_name: str, fund_names, report_date: str):
+    """
+    Build the tbLedger filter selecting the transactions behind a metric for an LP's funds,
+    matching the transaction lists returned by calculate_fund_metrics.
+    """
+    report_date = parse_report_date(report_date)
+
+    base = and_(
+        tbLedger.related_fund.in_(fund_names),
+        tbLedger.related_entity == lp_short_name,
+        tbLedger.effective_date <= report_date
+    )
+    capital_calls = and_(
+        tbLedger.related_fund.in_(fund_names),
+        tbLedger.activity == 'Capital Call',
+        tbLedger.effective_date <= report_date,
+        or_(
+            tbLedger.related_entity == lp_short_name,
+            tbLedger.entity_from == lp_short_name
+        )
+    )
+    capital_distributions = and_(
+        base,
+        tbLedger.activity == 'LP Distribution',
+        tbLedger.sub_activity == 'Capital Distribution'
+    )
+    income_distributions = and_(
+        base,
+        tbLedger.activity == 'LP Distribution',
+        tbLedger.sub_activity == 'Income Distribution'
+    )
+
+    if metric == "total_commitment":
+        return and_(base, tbLedger.sub_activity == 'New Commitment')
+    if metric == "total_capital_called":
+        return capital_calls
+    if metric == "total_capital_distribution":
+        return capital_distributions
+    if metric == "total_income_distribution":
+        return income_distributions
+    if metric == "total_distribution":
+        return or_(capital_distributions, income_distributions)
+    if metric == "remaining_capital":
+        return or_(capital_calls, capital_distributions)
+    raise ValueError(f"Unknown metric '{metric}'")
 
 def calculate_fund_metrics(db: Session, lp_short_name: str, fund_name: str, report_date: str):
     """Calculate fund metrics for a specific LP and fund as of the report date"""
-    
+    dataset = load_metrics_dataset(db, [lp_short_name], [report_date])
+    return dataset_fund_metrics(dataset, lp_short_name, fund_name, report_date)
+
+def dataset_fund_metrics(dataset: MetricsDataset, lp_short_name: str, fund_name: str,
+                         report_date: str, include_transactions=True):
+    """
+    Calculate fund metrics for a specific LP and fund as of the report date from a loaded dataset.
+    Without include_transactions, only the values are returned and the transaction lists are left
+    out.
+    """
+
     # Convert report_date string to datetime
-    report_date = datetime.strptime(report_date, '%Y-%m-%d').date()
-    
+    report_date = parse_report_date(report_date)
+
     # Get PCAP report date (most recent PCAP date before or equal to report_date)
-    pcap_date = get_pcap_report_date(db, report_date.strftime('%Y-%m-%d'))
-    
-    # Base query for all relevant transactions
-    base_query = db.query(tbLedger).filter(
-        and_(
-            tbLedger.related_fund == fund_name,
-            tbLedger.related_entity == lp_short_name,
-            tbLedger.effective_date <= report_date
-        )
-    )
-    
+    pcap_date = dataset.pcap_report_date(report_date)
+
+    # Ledger sums, from vectorized sums over the dataset's ledger columns
+    ledger_totals = dataset.ledger_totals(lp_short_name, fund_name, report_date)
+
     # Total Commitment - sum of all 'New Commitment' transactions
-    commitment_transactions = base_query.filter(
-        tbLedger.sub_activity == 'New Commitment'
-    ).all()
-    total_commitment = sum(t.amount for t in commitment_transactions) if commitment_transactions else 0
-    
+    total_commitment = ledger_totals["commitment"]
+
     # Total Capital Called - sum of all Capital Call transactions
     # Updated to include both:
     # 1. Standard capital calls where LP is the related_entity
     # 2. Capital calls where LP is the entity_from (e.g., Indiana -> Red Rose)
-    capital_call_transactions = db.query(tbLedger).filter(
-        and_(
-            tbLedger.related_fund == fund_name,
-            tbLedger.activity == 'Capital Call',
-            tbLedger.effective_date <= report_date,
-            or_(
-                tbLedger.related_entity == lp_short_name,
-                tbLedger.entity_from == lp_short_name
-            )
-        )
-    ).all()
-    total_capital_called = sum(t.amount for t in capital_call_transactions) if capital_call_transactions else 0
-    
+    total_capital_called = ledger_totals["capital_called"]
+
     # Check if we have no capital calls in tbLedger
     if total_capital_called == 0 and pcap_date:
         # First, check for Transfers in tbPCAP (this was our previous solution)
-        transfers = db.query(tbPCAP)\
-            .filter(
-                and_(
-                    tbPCAP.lp_short_name == lp_short_name,
-                    tbPCAP.pcap_date == pcap_date,
-                    tbPCAP.field == "Transfers"
-                )
-            ).first()
-        
+        transfers = dataset.pcap_record(lp_short_name, pcap_date, "Transfers")
+
         if transfers and transfers.amount > 0:
             # We found transfers - use as capital calls
             total_capital_called = transfers.amount
-            
+
             # If there were no commitment transactions but we have transfers, use transfers amount as commitment
             if total_commitment == 0:
                 total_commitment = transfers.amount
         else:
             # If no transfers found, check for Capital Calls in tbPCAP
-            pcap_capital_calls = db.query(tbPCAP)\
-                .filter(
-                    and_(
-                        tbPCAP.lp_short_name == lp_short_name,
-                        tbPCAP.pcap_date == pcap_date,
-                        tbPCAP.field == "Capital Calls"
-                    )
-                ).first()
-            
+            pcap_capital_calls = dataset.pcap_record(lp_short_name, pcap_date, "Capital Calls")
+
             if pcap_capital_calls and pcap_capital_calls.amount > 0:
                 # We found capital calls in PCAP - use this amount
                 total_capital_called = pcap_capital_calls.amount
-                
+
                 # If there were no commitment transactions but we have capital calls from PCAP, use this amount
                 if total_commitment == 0:
                     total_commitment = pcap_capital_calls.amount
-    
+
     # Capital Distributions
-    capital_distribution_transactions = base_query.filter(
-        and_(
-            tbLedger.activity == 'LP Distribution',
-            tbLedger.sub_activity == 'Capital Distribution'
-        )
-    ).all()
-    total_capital_distribution = sum(t.amount for t in capital_distribution_transactions) if capital_distribution_transactions else 0
+    total_capital_distribution = ledger_totals["capital_distribution"]
 
     # Income Distributions
-    income_distribution_transactions = base_query.filter(
-        and_(
-            tbLedger.activity == 'LP Distribution',
-            tbLedger.sub_activity == 'Income Distribution'
-        )
-    ).all()
-    total_income_distribution = sum(t.amount for t in income_distribution_transactions) if income_distribution_transactions else 0
+    total_income_distribution = ledger_totals["income_distribution"]
 
     # All distributions for more accurate total distribution calculation
-    all_distribution_transactions = base_query.filter(
-        tbLedger.activity == 'LP Distribution'
-    ).all()
-    total_distribution = sum(t.amount for t in all_distribution_transactions) if all_distribution_transactions else 0
+    total_distribution = ledger_totals["distribution"]
 
     # Note: We no longer calculate total_distribution as the sum of components
     # Instead we get it directly from all LP Distribution transactions
-    
+
     # Calculate both versions of remaining capital
     # Cash-based (traditional): Called Amount - Capital Distribution
     cash_based_remaining = total_capital_called - total_capital_distribution
-    
+
     # NAV-based: Use PCAP Ending Balance if available
     nav_based_remaining = cash_based_remaining  # Default to cash-based if no NAV available
-    
-    # Check if this fund is in reinvestment phase
-    fund_info = db.query(tbLPFund).filter(tbLPFund.lp_short_name == lp_short_name, 
-                                          tbLPFund.fund_name == fund_name).first()
-    
-    is_reinvest_active = False
-    if fund_info and fund_info.reinvest_start:
-        reinvest_start_date = datetime.strptime(fund_info.reinvest_start, '%m/%d/%Y').date() if isinstance(fund_info.reinvest_start, str) else fund_info.reinvest_start
-        harvest_start_date = None
-        if fund_info.harvest_start:
-            harvest_start_date = datetime.strptime(fund_info.harvest_start, '%m/%d/%Y').date() if isinstance(fund_info.harvest_start, str) else fund_info.harvest_start
-            
-        # Fund is in reinvestment phase if reinvest has started but harvest hasn't
-        is_reinvest_active = reinvest_start_date <= pcap_date and (not harvest_start_date or harvest_start_date > pcap_date)
-    
+
+    # Check if this fund is in reinvestment phase: reinvest has started but harvest hasn't
+    is_reinvest_active = bool(pcap_date) and dataset.fund_phases.is_reinvest_active(
+        lp_short_name, fund_name, pcap_date
+    )
+
     # Look for the PCAP Ending Balance for NAV-based calculation
-    pcap_balance = db.query(tbPCAP)\
-        .filter(
-            and_(
-                tbPCAP.lp_short_name == lp_short_name,
-                tbPCAP.pcap_date == pcap_date,
-                tbPCAP.field == "Ending Capital Balance"
-            )
-        )\
-        .order_by(tbPCAP.field_num.desc())\
-        .first()
-        
-    # If no exact match, try to get the closest ending balance by date
-    if not pcap_balance:
-        # Try for dates within the same month
-        month_start = pcap_date.replace(day=1)
-        next_month = (pcap_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-        
-        pcap_balance = db.query(tbPCAP)\
-            .filter(
-                and_(
-                    tbPCAP.lp_short_name == lp_short_name,
-                    tbPCAP.pcap_date >= month_start,
-                    tbPCAP.pcap_date < next_month,
-                    tbPCAP.field == "Ending Capital Balance"
-                )
-            )\
-            .order_by(func.abs(tbPCAP.pcap_date - pcap_date))\
-            .first()
-        
+    # If there is no exact match, use the closest ending balance in the same month
+    pcap_balance = dataset.ending_balance_record(lp_short_name, pcap_date, nearest_in_month=True)
+
     # If we found a PCAP Ending Balance, use it for NAV-based remaining capital
     if pcap_balance:
         nav_based_remaining = pcap_balance.amount
-    
+
     # Set the default remaining capital based on reinvestment status
     # For reinvest-active funds, use NAV-based; otherwise, use cash-based
     remaining_capital = nav_based_remaining if is_reinvest_active else cash_based_remaining
 
+    # The supporting transactions, selected the same way as the sums above
+    commitment_transactions = []
+    capital_call_transactions = []
+    capital_distribution_transactions = []
+    income_distribution_transactions = []
+    if include_transactions:
+        ledger = [
+            t for t in dataset.fund_ledger(lp_short_name).get(fund_name, [])
+            if t.effective_date is not None and t.effective_date <= report_date
+        ]
+        base_transactions = [t for t in ledger if t.related_entity == lp_short_name]
+        commitment_transactions = [
+            t for t in base_transactions if t.sub_activity == 'New Commitment'
+        ]
+        capital_call_transactions = [t for t in ledger if t.activity == 'Capital Call']
+        capital_distribution_transactions = [
+            t for t in base_transactions
+            if t.activity == 'LP Distribution' and t.sub_activity == 'Capital Distribution'
+        ]
+        income_distribution_transactions = [
+            t for t in base_transactions
+            if t.activity == 'LP Distribution' and t.sub_activity == 'Income Distribution'
+        ]
+
     def transactions_to_dict(transactions):
+        if not include_transactions:
+            return None
         return [
             {
                 "effective_date": t.effective_date.strftime('%Y-%m-%d'),
@@ -187,18 +477,18 @@ def calculate_fund_metrics(db: Session, lp_short_name: str, fund_name: str, repo
         ]
 
     # Combine transactions for total distribution and remaining capital
-    all_distribution_transactions = sorted(
+    all_distribution_transactions = [] if not include_transactions else sorted(
         capital_distribution_transactions + income_distribution_transactions,
         key=lambda x: x.effective_date
     )
 
-    remaining_capital_transactions = sorted(
+    remaining_capital_transactions = [] if not include_transactions else sorted(
         capital_call_transactions + capital_distribution_transactions,
         key=lambda x: x.effective_date
     )
 
     # Return restructured data to match frontend expectations
-    return {
+    metrics = {
         "total_commitment": {
             "value": total_commitment,
             "transactions": transactions_to_dict(commitment_transactions)
@@ -228,11 +518,35 @@ def calculate_fund_metrics(db: Session, lp_short_name: str, fund_name: str, repo
         }
     }
 
+    if not include_transactions:
+        for metric in metrics.values():
+            del metric["transactions"]
+
+    return metrics
+
 def calculate_lp_totals(db: Session, lp_short_name: str, report_date: str):
     """Calculate totals across all funds for an LP"""
+    dataset = load_metrics_dataset(db, [lp_short_name], [report_date])
+    return dataset_lp_totals(dataset, lp_short_name, report_date)
+
+def dataset_lp_totals(dataset: MetricsDataset, lp_short_name: str, report_date: str,
+                      include_transactions=True, fund_metrics=None):
+    """
+    Calculate totals across all funds for an LP from a loaded dataset. Without include_transactions,
+    only the values are returned and the transaction lists are left out. fund_metrics can pass in
+    metrics already calculated for each of the LP's funds (in dataset.funds order, with the same
+    include_transactions) so they are summed rather than calculated again.
+    """
     # Get all funds for this LP
-    funds = db.query(tbLPFund).filter(tbLPFund.lp_short_name == lp_short_name).all()
-    
+    funds = dataset.funds.get(lp_short_name, [])
+    if fund_metrics is None:
+        fund_metrics = [
+            dataset_fund_metrics(
+                dataset, lp_short_name, fund.fund_name, report_date, include_transactions
+            )
+            for fund in funds
+        ]
+
     # Initialize with the structure the frontend expects
     totals = {
         "total_commitment": {"value": 0, "transactions": []},
@@ -241,97 +555,117 @@ def calculate_lp_totals(db: Session, lp_short_name: str, report_date: str):
         "total_income_distribution": {"value": 0, "transactions": []},
         "total_distribution": {"value": 0, "transactions": []},
         "remaining_capital": {
-            "value": 0, 
-            "cash_based_value": 0, 
-            "nav_based_value": 0, 
+            "value": 0,
+            "cash_based_value": 0,
+            "nav_based_value": 0,
             "is_reinvest_active": False,
             "transactions": []
         }
     }
-    
+
     # Sum up metrics across all funds
-    for fund in funds:
-        fund_metrics = calculate_fund_metrics(db, lp_short_name, fund.fund_name, report_date)
-        
+    for metrics in fund_metrics:
         # Add values for standard metrics
-        for key in ["total_commitment", "total_capital_called", "total_capital_distribution", 
+        for key in ["total_commitment", "total_capital_called", "total_capital_distribution",
                    "total_income_distribution", "total_distribution"]:
-            totals[key]["value"] += fund_metrics[key]["value"]
+            totals[key]["value"] += metrics[key]["value"]
             # Combine transactions
-            totals[key]["transactions"].extend(fund_metrics[key]["transactions"])
-        
+            if include_transactions:
+                totals[key]["transactions"].extend(metrics[key]["transactions"])
+
         # Handle remaining capital specially to track both calculation methods
-        remaining_capital = fund_metrics["remaining_capital"]
+        remaining_capital = metrics["remaining_capital"]
         totals["remaining_capital"]["value"] += remaining_capital["value"]
         totals["remaining_capital"]["cash_based_value"] += remaining_capital["cash_based_value"] if "cash_based_value" in remaining_capital else remaining_capital["value"]
         totals["remaining_capital"]["nav_based_value"] += remaining_capital["nav_based_value"] if "nav_based_value" in remaining_capital else remaining_capital["value"]
-        
+
         # If any fund is in reinvestment phase, mark the total as having reinvest-active funds
         if remaining_capital.get("is_reinvest_active", False):
             totals["remaining_capital"]["is_reinvest_active"] = True
-        
+
         # Combine transactions
-        totals["remaining_capital"]["transactions"].extend(remaining_capital["transactions"])
-    
+        if include_transactions:
+            totals["remaining_capital"]["transactions"].extend(remaining_capital["transactions"])
+
+    if not include_transactions:
+        for key in totals:
+            del totals[key]["transactions"]
+        return totals
+
     # Sort combined transactions by date for each metric
     for key in totals:
         totals[key]["transactions"].sort(key=lambda x: x["effective_date"])
-    
+
     return totals
 
+def dataset_lp_metrics(dataset: MetricsDataset, lp_short_name: str, report_date: str,
+                       include_transactions=False):
+    """
+    Calculate everything shown for an LP as of the report date from a loaded dataset:
+    the metrics of each fund (in dataset.funds order), the LP totals summed from those same
+    fund metrics, the IRR and the PCAP report date. Each fund's metrics are calculated once.
+    """
+    funds = dataset.funds.get(lp_short_name, [])
+    fund_metrics = [
+        dataset_fund_metrics(
+            dataset, lp_short_name, fund.fund_name, report_date, include_transactions
+        )
+        for fund in funds
+    ]
+
+    return {
+        "funds": fund_metrics,
+        "totals": dataset_lp_totals(
+            dataset, lp_short_name, report_date, include_transactions, fund_metrics
+        ),
+        "irr": dataset_lp_irr(dataset, lp_short_name, report_date),
+        "pcap_report_date": dataset.pcap_report_date(parse_report_date(report_date))
+    }
+
 def get_pcap_report_date(db: Session, report_date: str):
     """Get the latest PCAP report date before or equal to the given report date"""
-    report_date = datetime.strptime(report_date, '%Y-%m-%d').date()
-    
+    report_date = parse_report_date(report_date)
+
     latest_pcap = db.query(tbPCAP.pcap_date)\
         .filter(tbPCAP.pcap_date <= report_date)\
         .order_by(tbPCAP.pcap_date.desc())\
         .first()
-    
+
     return latest_pcap.pcap_date if latest_pcap else None
 
 def calculate_lp_irr(db: Session, lp_short_name: str, report_date: str):
     """Calculate IRR across all funds for an LP"""
+    dataset = load_metrics_dataset(db, [lp_short_name], [report_date])
+    return dataset_lp_irr(dataset, lp_short_name, report_date)
+
+def dataset_lp_irr(dataset: MetricsDataset, lp_short_name: str, report_date: str):
+    """Calculate IRR across all funds for an LP from a loaded dataset"""
     # Get PCAP report date
-    pcap_date = get_pcap_report_date(db, report_date)
+    pcap_date = dataset.pcap_report_date(parse_report_date(report_date))
     if not pcap_date:
         return {"irr": None, "snapshot_data_issue": False, "chronology_issue": False}
-    
+
     # Added debug logging for Magic LP
     is_magic_lp = lp_short_name == "Magic"
     if is_magic_lp:
         print(f"\nDEBUG calculate_lp_irr for Magic LP:")
         print(f"PCAP date: {pcap_date}")
-        
+
     # Get all relevant cash flows
     cash_flows = []
-    
+
     # Add Capital Calls (negative cash flows)
-    calls = db.query(tbLedger)\
-        .filter(
-            and_(
-                tbLedger.related_entity == lp_short_name,
-                tbLedger.activity == 'Capital Call',
-                tbLedger.effective_date <= pcap_date
-            )
-        ).all()
-    
-    for call in calls:
-        cash_flows.append((call.effective_date, -call.amount))
-    
+    calls = dataset.cash_flows(lp_short_name, 'Capital Call', pcap_date)
+
+    for effective_date, amount in calls:
+        cash_flows.append((effective_date, -amount))
+
     if is_magic_lp:
         print(f"Capital calls from tbLedger: {len(calls)}")
-    
+
     # Check for transfers - ALWAYS include transfers, not just when there are no calls
-    transfers_record = db.query(tbPCAP)\
-        .filter(
-            and_(
-                tbPCAP.lp_short_name == lp_short_name,
-                tbPCAP.pcap_date == pcap_date,
-                tbPCAP.field == "Transfers"
-            )
-        ).first()
-    
+    transfers_record = dataset.pcap_record(lp_short_name, pcap_date, "Transfers")
+
     if transfers_record and transfers_record.amount > 0:
         # Use pcap_date as the effective date for the transfer
         # We treat transfers as capital calls (negative cash flow from investor perspective)
@@ -340,104 +674,40 @@ def calculate_lp_irr(db: Session, lp_short_name: str, report_date: str):
             print(f"Transfer found: amount = {transfers_record.amount}")
     elif is_magic_lp:
         print("No transfer record found or amount is zero")
-    
+
     # If no capital calls and no transfers, try Capital Calls from tbPCAP
     if len(cash_flows) == 0:
-        pcap_capital_calls = db.query(tbPCAP)\
-            .filter(
-                and_(
-                    tbPCAP.lp_short_name == lp_short_name,
-                    tbPCAP.pcap_date == pcap_date,
-                    tbPCAP.field == "Capital Calls"
-                )
-            ).first()
-        
+        pcap_capital_calls = dataset.pcap_record(lp_short_name, pcap_date, "Capital Calls")
+
         if pcap_capital_calls and pcap_capital_calls.amount > 0:
             # Use pcap_date as the effective date for the capital calls
             cash_flows.append((pcap_date, -pcap_capital_calls.amount))
             if is_magic_lp:
                 print(f"PCAP Capital calls found: amount = {pcap_capital_calls.amount}")
-    
+
     # Add Distributions (positive cash flows)
-    distributions = db.query(tbLedger)\
-        .filter(
-            and_(
-                tbLedger.related_entity == lp_short_name,
-                tbLedger.activity == 'LP Distribution',
-                tbLedger.effective_date <= pcap_date
-            )
-        ).all()
-    
-    for dist in distributions:
-        cash_flows.append((dist.effective_date, dist.amount))
-    
+    distributions = dataset.cash_flows(lp_short_name, 'LP Distribution', pcap_date)
+
+    for effective_date, amount in distributions:
+        cash_flows.append((effective_date, amount))
+
     if is_magic_lp:
         print(f"Distributions from tbLedger: {len(distributions)}")
-        dist_sum = sum(d.amount for d in distributions)
+        dist_sum = sum(amount for _, amount in distributions)
         print(f"Sum of distributions: {dist_sum}")
-    
+
     # Check if this LP is in reinvestment phase
-    funds = db.query(tbLPFund).filter(tbLPFund.lp_short_name == lp_short_name).all()
-    is_reinvest_active = any(
-        fund.reinvest_start and 
-        (datetime.strptime(fund.reinvest_start, '%m/%d/%Y').date() if isinstance(fund.reinvest_start, str) else fund.reinvest_start) <= pcap_date and
-        (not fund.harvest_start or 
-         (datetime.strptime(fund.harvest_start, '%m/%d/%Y').date() if isinstance(fund.harvest_start, str) else fund.harvest_start) > pcap_date)
-        for fund in funds
-    )
-    
+    is_reinvest_active = dataset.fund_phases.lp_reinvest_active(lp_short_name, pcap_date)
+
     if is_magic_lp:
         print(f"LP in reinvestment phase: {is_reinvest_active}")
-    
-    # Modify the query for ending balance to look for the most recent record within a date range
-    # This helps with date mismatches like 2024-12-30 vs 2024-12-31
-    if is_reinvest_active or is_magic_lp:  # Apply special handling for reinvest-active funds and Magic
-        # First try with exact date match 
-        ending_balance_record = db.query(tbPCAP)\
-            .filter(
-                and_(
-                    tbPCAP.lp_short_name == lp_short_name,
-                    tbPCAP.pcap_date == pcap_date,
-                    tbPCAP.field == "Ending Capital Balance"
-                )
-            )\
-            .order_by(tbPCAP.field_num.desc())\
-            .first()
-            
-        # If no exact match, try to get the closest ending balance by date
-        if not ending_balance_record:
-            # Try for dates within the same month, prioritizing by date proximity
-            month_start = pcap_date.replace(day=1)
-            next_month = (pcap_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-            
-            ending_balance_record = db.query(tbPCAP)\
-                .filter(
-                    and_(
-                        tbPCAP.lp_short_name == lp_short_name,
-                        tbPCAP.pcap_date >= month_start,
-                        tbPCAP.pcap_date < next_month,
-                        tbPCAP.field == "Ending Capital Balance"
-                    )
-                )\
-                .order_by(func.abs(tbPCAP.pcap_date - pcap_date))\
-                .first()
-                
-            if is_magic_lp and ending_balance_record:
-                print(f"Found closest date Ending Balance: {ending_balance_record.pcap_date}")
-                
-    else:
-        # Original ending balance query for non-reinvest-active funds
-        ending_balance_record = db.query(tbPCAP)\
-            .filter(
-                and_(
-                    tbPCAP.lp_short_name == lp_short_name,
-                    tbPCAP.pcap_date == pcap_date,
-                    tbPCAP.field == "Ending Capital Balance"
-                )
-            )\
-            .order_by(tbPCAP.field_num.desc())\
-            .first()
-    
+
+    # For reinvest-active funds (and Magic), fall back to the closest ending balance in the
+    # same month. This helps with date mismatches like 2024-12-30 vs 2024-12-31
+    ending_balance_record = dataset.ending_balance_record(
+        lp_short_name, pcap_date, nearest_in_month=is_reinvest_active or is_magic_lp
+    )
+
     if ending_balance_record:
         ending_balance = ending_balance_record.amount
         cash_flows.append((pcap_date, ending_balance))
@@ -445,7 +715,7 @@ def calculate_lp_irr(db: Session, lp_short_name: str, report_date: str):
             print(f"PCAP Ending Balance found: {ending_balance}")
     elif is_magic_lp:
         print("No ending balance record found in PCAP")
-    
+
     # Calculate IRR if we have cash flows
     if cash_flows:
         if is_magic_lp:
@@ -456,18 +726,22 @@ def calculate_lp_irr(db: Session, lp_short_name: str, report_date: str):
                 print("Cash flows in chronological order:")
                 for date, amount in sorted(cash_flows, key=lambda x: x[0]):
                     print(f"  {date.strftime('%Y-%m-%d')}: ${amount:,.2f}")
-            
-            result = xirr(cash_flows)
-            
+
+            result = run_xirr(cash_flows)
+            if result is IRR_FALLBACK_RESULT:
+                # Timed out or the worker died; flagged so the result isn't cached
+                return {"irr": None, "snapshot_data_issue": False, "chronology_issue": False,
+                        "unavailable": True}
+
             # Handle the expanded return value
             if isinstance(result, tuple) and len(result) == 3:
                 irr_value, snapshot_data_issue, chronology_issue = result
-                
+
                 if is_magic_lp:
                     print(f"IRR calculation result: {irr_value}")
                     print(f"Snapshot data issue detected: {snapshot_data_issue}")
                     print(f"Chronology issue detected: {chronology_issue}")
-                
+
                 return {
                     "irr": irr_value,
                     "snapshot_data_issue": snapshot_data_issue,
@@ -477,27 +751,31 @@ def calculate_lp_irr(db: Session, lp_short_name: str, report_date: str):
                 # Handle older versions or failed calculations
                 if is_magic_lp:
                     print(f"IRR calculation result (simple): {result}")
-                
+
                 return {
                     "irr": result,
                     "snapshot_data_issue": False,
                     "chronology_issue": False
                 }
-                
+
         except Exception as e:
             if is_magic_lp:
                 print(f"Exception in IRR calculation: {str(e)}")
             return {"irr": None, "snapshot_data_issue": False, "chronology_issue": False}
-    
+
     if is_magic_lp:
         print("No cash flows available for IRR calculation")
-    
+
     return {"irr": None, "snapshot_data_issue": False, "chronology_issue": False}
 
-def export_irr_cash_flows_to_csv(db: Session, output_file="irr_cash_flows.csv"):
+@profiled("export")
+def export_irr_cash_flows_to_csv(
+    db: Session, output_file="irr_cash_flows.csv", progress_callback=None
+):
     """
     Export all LP cash flows used for IRR calculations to a CSV file.
     This helps diagnose issues with IRR calculations by making the data transparent.
+    If progress_callback is given, it is called with (completed, total) before each LP.
     """
     # Get all LPs
     lps = db.query(tbLPFund.lp_short_name).distinct().all()
@@ -517,7 +795,10 @@ def export_irr_cash_flows_to_csv(db: Session, output_file="irr_cash_flows.csv"):
         ])
         
         # For each LP, get cash flows and write to CSV
-        for lp_name in lp_names:
+        for lp_index, lp_name in enumerate(lp_names):
+            if progress_callback:
+                progress_callback(lp_index, len(lp_names))
+
             # Get PCAP report date
             pcap_date = get_pcap_report_date(db, current_date)
             if not pcap_date:
@@ -528,7 +809,7 @@ def export_irr_cash_flows_to_csv(db: Session, output_file="irr_cash_flows.csv"):
             cash_flow_descriptions = []  # To store descriptions for CSV
             
             # Add Capital Calls (negative cash flows)
-            calls = db.query(tbLedger)\
+            calls = db.query(tbLedger.effective_date, tbLedger.amount, tbLedger.sub_activity)\
                 .filter(
                     and_(
                         tbLedger.related_entity == lp_name,
@@ -542,7 +823,7 @@ def export_irr_cash_flows_to_csv(db: Session, output_file="irr_cash_flows.csv"):
                 cash_flow_descriptions.append(f"Capital Call - {call.sub_activity}")
             
             # Always check for transfers - include even if we already have capital calls
-            transfers_record = db.query(tbPCAP)\
+            transfers_record = db.query(tbPCAP.amount)\
                 .filter(
                     and_(
                         tbPCAP.lp_short_name == lp_name,
@@ -559,7 +840,7 @@ def export_irr_cash_flows_to_csv(db: Session, output_file="irr_cash_flows.csv"):
             
             # If no capital calls and no transfers, try Capital Calls from tbPCAP
             if len(cash_flows) == 0:
-                pcap_capital_calls = db.query(tbPCAP)\
+                pcap_capital_calls = db.query(tbPCAP.amount)\
                     .filter(
                         and_(
                             tbPCAP.lp_short_name == lp_name,
@@ -573,21 +854,22 @@ def export_irr_cash_flows_to_csv(db: Session, output_file="irr_cash_flows.csv"):
                     cash_flow_descriptions.append("Capital Call (from PCAP)")
             
             # Add Distributions (positive cash flows)
-            distributions = db.query(tbLedger)\
-                .filter(
-                    and_(
-                        tbLedger.related_entity == lp_name,
-                        tbLedger.activity == 'LP Distribution',
-                        tbLedger.effective_date <= pcap_date
-                    )
-                ).all()
+            distributions = db.query(
+                tbLedger.effective_date, tbLedger.amount, tbLedger.sub_activity
+            ).filter(
+                and_(
+                    tbLedger.related_entity == lp_name,
+                    tbLedger.activity == 'LP Distribution',
+                    tbLedger.effective_date <= pcap_date
+                )
+            ).all()
             
             for dist in distributions:
                 cash_flows.append((dist.effective_date, dist.amount))
                 cash_flow_descriptions.append(f"Distribution - {dist.sub_activity}")
             
             # Add ending balance from PCAP - Get the LAST/most recent Ending Capital Balance
-            ending_balance_record = db.query(tbPCAP)\
+            ending_balance_record = db.query(tbPCAP.amount)\
                 .filter(
                     and_(
                         tbPCAP.lp_short_name == lp_name,
@@ -607,7 +889,7 @@ def export_irr_cash_flows_to_csv(db: Session, output_file="irr_cash_flows.csv"):
             irr_value = None
             if cash_flows:
                 try:
-                    irr_value = xirr(cash_flows)
+                    irr_value = run_xirr(cash_flows)
                 except Exception as e:
                     irr_value = f"Error: {str(e)}"
                     print(f"IRR calculation failed for {lp_name}: {str(e)}")
@@ -630,4 +912,53 @@ def export_irr_cash_flows_to_csv(db: Session, output_file="irr_cash_flows.csv"):
             # Add empty row between LPs for readability
             writer.writerow([])
     
-    return os.path.abspath(output_file)
\ No newline at end of file
+    return os.path.abspath(output_file)
+
+@profiled("export")
+def export_portfolio_report_to_csv(
+    db: Session, report_date: str, output_file="portfolio_report.csv", progress_callback=None
+):
+    """
+    Export a portfolio report with the fund totals and IRR of every LP as of the report date.
+    If progress_callback is given, it is called with (completed, total) after each LP.
+    """
+    lps = db.query(tbLPFund.lp_short_name).distinct().order_by(tbLPFund.lp_short_name).all()
+    lp_names = [lp[0] for lp in lps]
+
+    # Load every LP's data once rather than querying per LP
+    dataset = load_metrics_dataset(db, lp_names, [report_date])
+    pcap_date = dataset.pcap_report_date(parse_report_date(report_date))
+
+    with open(output_file, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+
+        writer.writerow([
+            'LP Name', 'Report Date', 'PCAP Date', 'Total Commitment', 'Total Capital Called',
+            'Total Capital Distribution', 'Total Income Distribution', 'Total Distribution',
+            'Remaining Capital', 'IRR', 'Snapshot Data Issue', 'Chronology Issue'
+        ])
+
+        for lp_index, lp_name in enumerate(lp_names):
+            lp_metrics = dataset_lp_metrics(dataset, lp_name, report_date)
+            totals = lp_metrics["totals"]
+            irr_data = lp_metrics["irr"]
+
+            writer.writerow([
+                lp_name,
+                report_date,
+                pcap_date.strftime('%Y-%m-%d') if pcap_date else "",
+                totals["total_commitment"]["value"],
+                totals["total_capital_called"]["value"],
+                totals["total_capital_distribution"]["value"],
+                totals["total_income_distribution"]["value"],
+                totals["total_distribution"]["value"],
+                totals["remaining_capital"]["value"],
+                irr_data["irr"] if irr_data["irr"] is not None else "",
+                irr_data["snapshot_data_issue"],
+                irr_data["chronology_issue"]
+            ])
+
+            if progress_callback:
+                progress_callback(lp_index + 1, len(lp_names))
+
+    return os.path.abspath(output_file)
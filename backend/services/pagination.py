@@ -0,0 +1,123 @@
+import base64
+import json
+from datetime import date, datetime
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque cursor string"""
+    values = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor back into values typed for the given sort columns"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match the sort order")
+        return [
+            date.fromisoformat(v) if v is not None and column.type.python_type is date else v
+            for v, column in zip(values, columns)
+        ]
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_sort(model, sort, default_sort):
+    """Parse a sort parameter like 'effective_date' or '-amount' into (column, descending)"""
+    sort = sort or default_sort
+    descending = sort.startswith("-")
+    column = model.__table__.columns.get(sort.lstrip("-"))
+    if column is None:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort.lstrip('-')}'")
+    return column, descending
+
+def parse_fields(model, fields):
+    """Parse a comma separated fields parameter into table columns, defaulting to all columns"""
+    if not fields:
+        return list(model.__table__.columns)
+    columns = []
+    for name in fields.split(","):
+        column = model.__table__.columns.get(name.strip())
+        if column is None:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{name.strip()}'")
+        if column not in columns:
+            columns.append(column)
+    return columns
+
+def _after_cursor(sort_column, key_column, descending, sort_value, key_value):
+    """
+    Build the keyset condition for rows that come after the cursor.
+    NULL sort values are ordered as the smallest values (first ascending, last descending).
+    """
+    if sort_column is key_column:
+        return key_column < key_value if descending else key_column > key_value
+    if descending:
+        if sort_value is None:
+            return and_(sort_column.is_(None), key_column < key_value)
+        return or_(
+            sort_column < sort_value,
+            sort_column.is_(None),
+            and_(sort_column == sort_value, key_column < key_value)
+        )
+    if sort_value is None:
+        return or_(sort_column.isnot(None), and_(sort_column.is_(None), key_column > key_value))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, key_column > key_value))
+
+def paginate(
+    db: Session, model, filters=None, sort=None, default_sort=None, limit=DEFAULT_PAGE_SIZE,
+    cursor=None, fields=None, include_total=True
+):
+    """
+    Get one page of rows from a table using keyset pagination.
+    Only the requested columns (plus the primary key) are selected, so rows come back as tuples
+    rather than ORM objects. Returns the items with a cursor for the next page and the total count.
+    """
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    key_column = list(model.__table__.primary_key.columns)[0]
+    sort_column, descending = parse_sort(model, sort, default_sort or key_column.name)
+    columns = parse_fields(model, fields)
+    if key_column not in columns:
+        columns.insert(0, key_column)
+    selected = columns + ([sort_column] if sort_column not in columns else [])
+
+    query = db.query(*selected)
+    if filters:
+        query = query.filter(and_(*filters))
+
+    total = query.order_by(None).count() if include_total else None
+
+    if cursor:
+        sort_value, key_value = decode_cursor(cursor, [sort_column, key_column])
+        query = query.filter(
+            _after_cursor(sort_column, key_column, descending, sort_value, key_value)
+        )
+
+    if sort_column is key_column:
+        order = [key_column.desc() if descending else key_column.asc()]
+    elif descending:
+        order = [sort_column.desc().nulls_last(), key_column.desc()]
+    else:
+        order = [sort_column.asc().nulls_first(), key_column.asc()]
+
+    rows = query.order_by(*order).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor([last[sort_column], last[key_column]])
+
+    return {
+        "items": [{column.name: row[i] for i, column in enumerate(columns)} for row in rows],
+        "next_cursor": next_cursor,
+        "total": total,
+        "limit": limit,
+        "sort": ("-" if descending else "") + sort_column.name,
+    }
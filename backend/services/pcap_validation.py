@@ -0,0 +1,156 @@
+"""
+Validate the roll-forward of every PCAP statement.
+
+A statement is the PCAP rows of one LP on one PCAP date, from "Beginning Capital Balance" through
+"Ending Capital Balance" with the flows of the quarter in between. All rows are pivoted into one (LP
+x PCAP date x field) array, so each statement is checked (beginning + flows = ending) and chained to
+the LP's next statement (ending = next beginning) with whole-array operations.
+"""
+import os
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from backend.services.reconciliation import load_pcap_columns
+
+# Largest roll-forward difference that is still accepted; each PCAP field is rounded to whole
+# dollars, so a statement can be off by a few dollars. Can be overridden from the .env file.
+PCAP_ROLLFORWARD_TOLERANCE = float(os.getenv("PCAP_ROLLFORWARD_TOLERANCE", "5.0"))
+
+BEGINNING_FIELD = "Beginning Capital Balance"
+ENDING_FIELD = "Ending Capital Balance"
+
+CHECK_ROLL_FORWARD = "roll_forward"  # beginning + flows != ending within a statement
+CHECK_CONTINUITY = "continuity"  # ending != the beginning of the LP's next statement
+CHECK_MISSING_BALANCE = "missing_balance"  # a statement without a beginning or ending balance
+# PCAP dates skipped between two of an LP's statements
+CHECK_MISSING_STATEMENT = "missing_statement"
+CHECK_DUPLICATE_FIELD = "duplicate_field"  # a field reported more than once in a statement
+
+def _amount(value):
+    return round(float(value), 2) + 0.0
+
+def pivot_pcap(lp_codes, date_codes, field_codes, amounts, shape):
+    """
+    Pivot PCAP rows into (LP x date x field) arrays of summed amounts (0 where not reported) and row
+    counts
+    """
+    flat = (lp_codes.astype(np.int64) * shape[1] + date_codes) * shape[2] + field_codes
+    size = shape[0] * shape[1] * shape[2]
+    values = np.bincount(flat, weights=amounts, minlength=size).reshape(shape)
+    counts = np.bincount(flat, minlength=size).reshape(shape)
+    return values, counts
+
+def validate_pcap(db: Session, lp_short_names=None, tolerance=None):
+    """
+    Check the roll-forward of every PCAP statement, or of some LPs' statements. Returns a summary
+    and the breaks, ordered by LP, PCAP date and check.
+    """
+    tolerance = PCAP_ROLLFORWARD_TOLERANCE if tolerance is None else tolerance
+    lp_names, lp_codes, dates, field_names, field_codes, amounts = load_pcap_columns(db)
+
+    valid = (lp_codes >= 0) & (field_codes >= 0) & ~np.isnat(dates) & ~np.isnan(amounts)
+    if lp_short_names is not None:
+        wanted = set(lp_short_names)
+        valid &= np.array([name in wanted for name in lp_names] + [False])[lp_codes]
+    pcap_dates, date_codes = np.unique(dates[valid], return_inverse=True)
+    shape = (len(lp_names), len(pcap_dates), len(field_names))
+    values, counts = pivot_pcap(
+        lp_codes[valid], date_codes.ravel(), field_codes[valid], amounts[valid], shape
+    )
+
+    exists = counts.any(axis=2)
+    beginning_index = field_names.index(BEGINNING_FIELD) if BEGINNING_FIELD in field_names else None
+    ending_index = field_names.index(ENDING_FIELD) if ENDING_FIELD in field_names else None
+    no_field = np.zeros(shape[:2])
+    beginning = values[:, :, beginning_index] if beginning_index is not None else no_field
+    ending = values[:, :, ending_index] if ending_index is not None else no_field
+    has_beginning = (
+        counts[:, :, beginning_index] > 0 if beginning_index is not None else no_field > 0
+    )
+    has_ending = counts[:, :, ending_index] > 0 if ending_index is not None else no_field > 0
+    flow_indexes = [i for i in range(len(field_names)) if i not in (beginning_index, ending_index)]
+    expected_ending = beginning + values[:, :, flow_indexes].sum(axis=2)
+
+    # The LP's next statement after each date, or len(pcap_dates) if there is none
+    n_dates = len(pcap_dates)
+    positions = np.where(exists, np.arange(n_dates), n_dates)
+    following = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1]
+    next_statement = np.concatenate([following, np.full((shape[0], 1), n_dates)], axis=1)[:, 1:]
+    chained = exists & (next_statement < n_dates)
+    next_beginning = np.take_along_axis(beginning, np.minimum(next_statement, n_dates - 1), axis=1)
+    next_has_beginning = np.take_along_axis(
+        has_beginning, np.minimum(next_statement, n_dates - 1), axis=1
+    )
+
+    breaks = {
+        CHECK_ROLL_FORWARD: (exists & has_beginning & has_ending
+                             & (np.abs(ending - expected_ending) > tolerance)),
+        CHECK_CONTINUITY: (chained & has_ending & next_has_beginning
+                           & (np.abs(next_beginning - ending) > tolerance)),
+        CHECK_MISSING_BALANCE: exists & ~(has_beginning & has_ending),
+        CHECK_MISSING_STATEMENT: chained & (next_statement > np.arange(n_dates) + 1),
+        CHECK_DUPLICATE_FIELD: (counts > 1).any(axis=2),
+    }
+
+    date_strings = [str(d) for d in pcap_dates]
+    records = []
+    for check_index, (check, mask) in enumerate(breaks.items()):
+        for lp, i in zip(*np.nonzero(mask)):
+            j = next_statement[lp, i]
+            record = {"lp_short_name": lp_names[lp], "pcap_date": date_strings[i], "check": check,
+                      "expected": None, "actual": None, "difference": None, "detail": None}
+            if check == CHECK_ROLL_FORWARD:
+                record.update(expected=_amount(expected_ending[lp, i]),
+                              actual=_amount(ending[lp, i]),
+                              difference=_amount(ending[lp, i] - expected_ending[lp, i]))
+            elif check == CHECK_CONTINUITY:
+                record.update(pcap_date=date_strings[j], expected=_amount(ending[lp, i]),
+                              actual=_amount(next_beginning[lp, i]),
+                              difference=_amount(next_beginning[lp, i] - ending[lp, i]),
+                              detail=f"previous statement {date_strings[i]}")
+            elif check == CHECK_MISSING_BALANCE:
+                missing = [name for name, present in [(BEGINNING_FIELD, has_beginning[lp, i]),
+                                                      (ENDING_FIELD, has_ending[lp, i])]
+                           if not present]
+                record["detail"] = f"no {' or '.join(missing)}"
+            elif check == CHECK_MISSING_STATEMENT:
+                record.update(pcap_date=date_strings[j],
+                              detail=f"previous statement {date_strings[i]}, "
+                                     f"{j - i - 1} PCAP date(s) skipped")
+            else:
+                duplicated = [f"{field_names[f]} x{counts[lp, i, f]}"
+                              for f in np.flatnonzero(counts[lp, i] > 1)]
+                record["detail"] = ", ".join(duplicated)
+            records.append((record["lp_short_name"], record["pcap_date"], check_index, record))
+    records.sort(key=lambda item: item[:3])
+
+    by_check = {check: int(mask.sum()) for check, mask in breaks.items()}
+    return {
+        "tolerance": tolerance,
+        "summary": {
+            "lps": int(exists.any(axis=1).sum()),
+            "statements": int(exists.sum()),
+            "first_date": date_strings[0] if date_strings else None,
+            "last_date": date_strings[-1] if date_strings else None,
+            "breaks": sum(by_check.values()),
+            "by_check": by_check,
+        },
+        "breaks": [record for *_, record in records],
+    }
+
+def print_breaks(report, limit=20):
+    """Print a validation report's summary and its first breaks"""
+    summary = report["summary"]
+    print(f"PCAP roll-forward: {summary['statements']} statements for {summary['lps']} LPs, "
+          f"{summary['breaks']} breaks {summary['by_check']}")
+    for record in report["breaks"][:limit]:
+        values = ""
+        if record["difference"] is not None:
+            values = f" expected {record['expected']:,.2f}, got {record['actual']:,.2f}"
+        detail = f" ({record['detail']})" if record["detail"] else ""
+        print(
+            f"  {record['lp_short_name']} {record['pcap_date']} {record['check']}:{values}{detail}"
+        )
+    if len(report["breaks"]) > limit:
+        print(f"  ... and {len(report['breaks']) - limit} more")
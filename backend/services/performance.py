@@ -0,0 +1,261 @@
+"""
+Fund performance analytics: XIRR and TVPI, DPI and RVPI multiples per (LP, fund), per fund and per
+fund group.
+
+The cash flows of every LP's funds are taken from the in-memory ledger columns in one pass: capital
+calls (negative) and LP distributions (positive) up to the PCAP report date, attributed to LPs as in
+the fund metrics, with the LP's PCAP ending balance as the terminal value on that date. The PCAP is
+reported per LP, so an LP's ending balance is split across its funds in proportion to their net
+invested capital (capital called less capital distributed), or evenly when none is left invested.
+Fund and fund group series pool the cash flows and values of their LP funds. All series are solved
+together with a vectorized Newton iteration.
+"""
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.models import tbLPFund, tbLPLookup
+from backend.services.ledger_engine import get_ledger_columns
+from backend.services.metrics_calculator import (
+    get_pcap_report_date, next_month_start, parse_report_date
+)
+from backend.services.reconciliation import load_pcap_columns
+
+# Starting rates tried in turn for series that have not converged, as in xirr
+XIRR_GUESSES = [0.1, 0.05, 0.01, 0.2, 0.3, -0.1, -0.2]
+XIRR_TOLERANCE = 1.0e-6
+XIRR_MAX_ITERATIONS = 200
+
+# Flow kinds
+FLOW_CALL = 0
+FLOW_DISTRIBUTION = 1
+FLOW_NAV = 2
+
+def solve_xirr(series, years, amounts, n_series):
+    """
+    Solve the XIRR of many cash flow series at once. series gives the series of each flow and years
+    its time in years (days / 365) since the first flow of its series. Newton steps are taken for
+    all unsolved series together; a series that doesn't converge to a rate between -99% and 1000% is
+    retried from the next guess. Returns one rate per series, NaN where there is none (such as a
+    series without both signs of flow).
+    """
+    has_inflow = np.bincount(series, weights=amounts > 0, minlength=n_series) > 0
+    has_outflow = np.bincount(series, weights=amounts < 0, minlength=n_series) > 0
+    rates = np.full(n_series, np.nan)
+    pending = has_inflow & has_outflow
+
+    for guess in XIRR_GUESSES:
+        if not pending.any():
+            break
+        rate = np.full(n_series, guess)
+        active = pending.copy()
+        for _ in range(XIRR_MAX_ITERATIONS):
+            flow_active = active[series]
+            with np.errstate(all="ignore"):
+                growth = 1.0 + rate[series]
+                discounted = np.where(flow_active, amounts * growth ** -years, 0.0)
+                npv = np.bincount(series, weights=discounted, minlength=n_series)
+                slope = np.bincount(
+                    series, weights=-years * discounted / growth, minlength=n_series
+                )
+                new_rate = rate - npv / slope
+            finite = np.isfinite(new_rate)
+            converged = active & finite & (np.abs(new_rate - rate) <= XIRR_TOLERANCE)
+            solved = converged & (new_rate > -0.99) & (new_rate < 10)
+            rates[solved] = new_rate[solved]
+            pending &= ~solved
+            active &= finite & ~converged
+            if not active.any():
+                break
+            rate = np.where(active, new_rate, rate)
+    return rates
+
+def lp_ending_balances(db: Session, lp_index, pcap_date):
+    """
+    Get each LP's PCAP ending balance on the PCAP date, or the closest one in the same month, as an
+    array indexed like lp_index (NaN for LPs without one)
+    """
+    balances = np.full(len(lp_index), np.nan)
+    if pcap_date is None:
+        return balances
+    lp_names, lp_codes, dates, _, _, amounts = load_pcap_columns(db, ["Ending Capital Balance"])
+    lps = np.array([lp_index.get(name, -1) for name in lp_names] + [-1], dtype=np.int64)[lp_codes]
+    day = np.datetime64(pcap_date, "D")
+    in_month = (
+        (lps >= 0) & ~np.isnan(amounts)
+        & (dates >= np.datetime64(pcap_date.replace(day=1), "D"))
+        & (dates < np.datetime64(next_month_start(pcap_date), "D"))
+    )
+    rows = np.flatnonzero(in_month)
+    distance = np.abs((dates[rows] - day).astype(np.int64))
+    # The closest row of each LP, the first one in table order on a tie
+    order = np.lexsort((rows, distance, lps[rows]))
+    closest_lps, first = np.unique(lps[rows][order], return_index=True)
+    balances[closest_lps] = amounts[rows][order][first]
+    return balances
+
+def _metrics(paid_in, distributed, nav, irr, flows):
+    with np.errstate(all="ignore"):
+        dpi = np.where(paid_in > 0, distributed / paid_in, np.nan)
+        rvpi = np.where(paid_in > 0, nav / paid_in, np.nan)
+        tvpi = np.where(paid_in > 0, (distributed + nav) / paid_in, np.nan)
+    values = {
+        "paid_in": paid_in, "distributed": distributed, "nav": nav, "tvpi": tvpi, "dpi": dpi,
+        "rvpi": rvpi, "irr": irr
+    }
+    rows = [dict(zip(values, row)) for row in zip(*(v.tolist() for v in values.values()))]
+    for row, count in zip(rows, flows.tolist()):
+        for name in ["tvpi", "dpi", "rvpi", "irr"]:
+            if row[name] != row[name]:
+                row[name] = None
+        row["cash_flows"] = int(count)
+    return rows
+
+def performance_report(db: Session, report_date: str):
+    """
+    Calculate XIRR, TVPI, DPI and RVPI as of a report date for every LP's funds, every fund and
+    every fund group. Cash flows and values are taken up to the latest PCAP date on or before the
+    report date.
+    """
+    pcap_date = get_pcap_report_date(db, report_date)
+    cutoff = pcap_date if pcap_date is not None else parse_report_date(report_date)
+
+    fund_rows = db.execute(
+        select(tbLPFund.lp_short_name, tbLPFund.fund_name, tbLPFund.fund_group)
+        .order_by(tbLPFund.id)
+    ).all()
+    lp_names = sorted(
+        set(db.execute(select(tbLPLookup.short_name)).scalars())
+        | {row[0] for row in fund_rows if row[0]}
+    )
+    lp_index = {name: i for i, name in enumerate(lp_names)}
+
+    # Cash flows of every LP fund from the ledger columns, attributed to LPs as in the fund metrics;
+    # fund code 0 is a ledger row without a fund
+    columns = get_ledger_columns(db)
+    fund_names = [None] + columns.categories["related_fund"]
+    fund_names += sorted({row[1] for row in fund_rows if row[1] is not None} - set(fund_names[1:]))
+    fund_index = {name: i for i, name in enumerate(fund_names)}
+    entity_lps = np.array(
+        [lp_index.get(name, -1) for name in columns.categories["entity"]] + [-1], dtype=np.int64
+    )
+    masks = columns.metric_masks()
+    in_range = (
+        (masks["capital_called"] | masks["distribution"]) & ~np.isnan(columns.amounts)
+        & (columns.effective_dates <= np.datetime64(cutoff, "D"))
+    )
+    ledger_rows, entities, _ = columns.attributed_rows(in_range)
+    flow_lps = entity_lps[entities]
+    kept = flow_lps >= 0
+    ledger_rows, flow_lps = ledger_rows[kept], flow_lps[kept]
+    is_call = masks["capital_called"][ledger_rows]
+    flow_pairs = (
+        flow_lps * len(fund_names) + columns.codes["related_fund"][ledger_rows].astype(np.int64) + 1
+    )
+    flow_days = columns.effective_dates[ledger_rows].astype(np.int64)
+    flow_kinds = np.where(is_call, FLOW_CALL, FLOW_DISTRIBUTION)
+    flow_amounts = np.where(is_call, -columns.amounts[ledger_rows], columns.amounts[ledger_rows])
+
+    # Every LP fund with cash flows or a tbLPFund row
+    listed = np.array(
+        [lp_index[lp] * len(fund_names) + fund_index[fund]
+         for lp, fund, _ in fund_rows if lp in lp_index],
+        dtype=np.int64
+    )
+    pairs, pair_of_flow = np.unique(np.concatenate([flow_pairs, listed]), return_inverse=True)
+    pair_of_flow = pair_of_flow.ravel()[:len(flow_pairs)]
+    pair_lps = pairs // len(fund_names)
+    pair_funds = pairs % len(fund_names)
+    n_pairs = len(pairs)
+
+    # Split each LP's ending balance over its funds by net invested capital
+    balances = lp_ending_balances(db, lp_index, pcap_date)
+    called = np.bincount(
+        pair_of_flow, weights=np.where(flow_kinds == FLOW_CALL, -flow_amounts, 0.0),
+        minlength=n_pairs
+    )
+    returned = np.bincount(
+        pair_of_flow,
+        weights=np.where(masks["capital_distribution"][ledger_rows], flow_amounts, 0.0),
+        minlength=n_pairs
+    )
+    invested = np.maximum(called - returned, 0.0)
+    lp_invested = np.bincount(pair_lps, weights=invested, minlength=len(lp_names))
+    lp_funds = np.bincount(pair_lps, minlength=len(lp_names))
+    with np.errstate(all="ignore"):
+        share = np.where(
+            lp_invested[pair_lps] > 0, invested / lp_invested[pair_lps], 1.0 / lp_funds[pair_lps]
+        )
+    pair_nav = np.nan_to_num(balances[pair_lps]) * share
+    has_nav = ~np.isnan(balances[pair_lps]) & (pair_nav != 0)
+
+    # The fund group of each LP fund: its own tbLPFund row, else any LP's row for the fund
+    group_of = {}
+    for lp, fund, group in fund_rows:
+        group_of.setdefault(fund, group)
+    for lp, fund, group in fund_rows:
+        group_of[(lp, fund)] = group
+    pair_groups = [
+        group_of.get((lp_names[lp], fund_names[fund]), group_of.get(fund_names[fund]))
+        for lp, fund in zip(pair_lps.tolist(), pair_funds.tolist())
+    ]
+    group_names = sorted({group for group in pair_groups if group is not None})
+    group_index = {name: i for i, name in enumerate(group_names)}
+    pair_group_codes = np.array([group_index.get(group, -1) for group in pair_groups],
+                                dtype=np.int64)
+
+    # One flow list with the terminal values, then every flow once per level: LP fund, fund and
+    # fund group
+    nav_pairs = np.flatnonzero(has_nav)
+    nav_day = np.datetime64(cutoff, "D").astype(np.int64)
+    pair_of_flow = np.concatenate([pair_of_flow, nav_pairs])
+    flow_days = np.concatenate([flow_days, np.full(len(nav_pairs), nav_day)])
+    flow_kinds = np.concatenate([flow_kinds, np.full(len(nav_pairs), FLOW_NAV)])
+    flow_amounts = np.concatenate([flow_amounts, pair_nav[nav_pairs]])
+
+    n_funds = len(fund_names)
+    levels = [pair_of_flow, n_pairs + pair_funds[pair_of_flow]]
+    grouped = pair_group_codes[pair_of_flow] >= 0
+    levels.append(n_pairs + n_funds + pair_group_codes[pair_of_flow][grouped])
+    series = np.concatenate(levels)
+    n_series = n_pairs + n_funds + len(group_names)
+    days = np.concatenate([flow_days, flow_days, flow_days[grouped]])
+    kinds = np.concatenate([flow_kinds, flow_kinds, flow_kinds[grouped]])
+    amounts = np.concatenate([flow_amounts, flow_amounts, flow_amounts[grouped]])
+
+    first_day = np.full(n_series, np.iinfo(np.int64).max)
+    np.minimum.at(first_day, series, days)
+    irr = solve_xirr(series, (days - first_day[series]) / 365, amounts, n_series)
+
+    def total(kind, sign=1.0):
+        weights = np.where(kinds == kind, sign * amounts, 0.0)
+        return np.bincount(series, weights=weights, minlength=n_series).astype(np.float64)
+
+    rows = _metrics(
+        total(FLOW_CALL, -1.0), total(FLOW_DISTRIBUTION), total(FLOW_NAV), irr,
+        np.bincount(series, minlength=n_series)
+    )
+    lp_fund_rows = [
+        {"lp_short_name": lp_names[lp], "fund_name": fund_names[fund], "fund_group": group, **row}
+        for lp, fund, group, row in zip(
+            pair_lps.tolist(), pair_funds.tolist(), pair_groups, rows[:n_pairs]
+        )
+    ]
+    fund_rows_out = [
+        {"fund_name": fund_names[fund], "fund_group": group_of.get(fund_names[fund]),
+         **rows[n_pairs + fund]}
+        for fund in sorted(set(pair_funds.tolist()),
+                           key=lambda fund: (fund_names[fund] is None, fund_names[fund] or ""))
+    ]
+    group_rows = [
+        {"fund_group": name, **rows[n_pairs + n_funds + i]} for i, name in enumerate(group_names)
+    ]
+    return {
+        "report_date": report_date,
+        "pcap_date": pcap_date.isoformat() if pcap_date else None,
+        "lp_funds": sorted(lp_fund_rows, key=lambda row: (row["lp_short_name"],
+                                                          row["fund_name"] is None,
+                                                          row["fund_name"] or "")),
+        "funds": fund_rows_out,
+        "fund_groups": group_rows,
+    }
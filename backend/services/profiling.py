@@ -0,0 +1,112 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+
+# Get the absolute path of the project root directory
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Profiling settings can be overridden from the .env file
+# PROFILE_TARGETS is a comma separated list of targets to always profile,
+# e.g. "lp_details,import", or "all"
+PROFILE_TARGETS = {t.strip() for t in os.getenv("PROFILE_TARGETS", "").split(",") if t.strip()}
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "false").lower() == "true"
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", os.path.join(project_root, "backend", "artifacts", "profiles")
+)
+# Requests sending this token in the X-Profile header are profiled; header profiling is off
+# without it
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+
+# Targets that can be profiled
+PROFILE_TARGET_NAMES = ["lp_details", "irr_cash_flows", "export", "import"]
+
+class ProfileRequest:
+    """Profiling asked for by the current HTTP request, and the files written for it"""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.files = []
+
+_profile_request = ContextVar("profile_request", default=None)
+# cProfile and tracemalloc can only profile one call at a time in a process
+_profiling_lock = threading.Lock()
+
+def request_profiling(headers):
+    """
+    Turn on profiling for the current request if its X-Profile header carries the admin token.
+    X-Profile-Memory: 1 also records peak traced memory. Returns the ProfileRequest or None.
+    """
+    token = headers.get("x-profile")
+    if not PROFILE_ADMIN_TOKEN or token != PROFILE_ADMIN_TOKEN:
+        return None
+    profile_request = ProfileRequest(
+        memory=PROFILE_MEMORY or headers.get("x-profile-memory") == "1"
+    )
+    _profile_request.set(profile_request)
+    return profile_request
+
+def _write_profile(target, profiler, seconds, peak_memory, args_summary):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{target}_{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{name}.pstats"))
+    with open(os.path.join(PROFILE_DIR, f"{name}.json"), "w") as f:
+        json.dump({
+            "target": target,
+            "arguments": args_summary,
+            "duration_seconds": round(seconds, 6),
+            "peak_memory_bytes": peak_memory,
+        }, f, indent=2)
+    return f"{name}.pstats"
+
+def profiled(target):
+    """
+    Decorate a function so that calls are run under cProfile when the target is listed in
+    PROFILE_TARGETS or the current request asked for profiling. Each call writes a .pstats file
+    (readable with pstats, snakeviz or flameprof) and a .json summary to PROFILE_DIR. Only one call
+    is profiled at a time: calls made while another profiled call is running, on any thread, run
+    unprofiled.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile_request = _profile_request.get()
+            enabled = (
+                profile_request is not None or target in PROFILE_TARGETS or "all" in PROFILE_TARGETS
+            )
+            if not enabled or not _profiling_lock.acquire(blocking=False):
+                return func(*args, **kwargs)
+
+            memory = PROFILE_MEMORY or (profile_request is not None and profile_request.memory)
+            # tracemalloc is process wide, so unprofiled concurrent work is included in the peak
+            started_tracemalloc = memory and not tracemalloc.is_tracing()
+            if started_tracemalloc:
+                tracemalloc.start()
+            if memory:
+                tracemalloc.reset_peak()
+
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            try:
+                return profiler.runcall(func, *args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                peak_memory = tracemalloc.get_traced_memory()[1] if memory else None
+                if started_tracemalloc:
+                    tracemalloc.stop()
+                _profiling_lock.release()
+                args_summary = {key: str(value) for key, value in kwargs.items()
+                                if isinstance(value, (str, int, float))}
+                file_name = _write_profile(target, profiler, seconds, peak_memory, args_summary)
+                print(f"Profiled {target} in {seconds:.3f}s: "
+                      f"{os.path.join(PROFILE_DIR, file_name)}")
+                if profile_request is not None:
+                    profile_request.files.append(file_name)
+        return wrapper
+    return decorator
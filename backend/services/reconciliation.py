@@ -0,0 +1,245 @@
+"""
+Reconcile the ledger with the PCAP statements for every LP and quarter.
+
+The PCAP reports each LP's capital calls and distributions per quarter, and the ledger records the
+same cash movements as transactions. The PCAP is loaded in bulk as NumPy columns and the ledger as
+its per-(LP, fund, quarter) aggregates, read from the analytics snapshot when it is current. Both
+are summed per (LP, quarter) in one pass each and compared check by check, so the whole portfolio
+is reconciled at once rather than LP by LP.
+"""
+import os
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.models import tbLPLookup, tbPCAP
+from backend.services.analytics_snapshot import current_snapshot
+from backend.services.ledger_engine import get_ledger_columns, quarter_ends
+
+# Largest difference between the ledger and the PCAP that still counts as a match. PCAP amounts are
+# rounded to whole dollars per fund before they are added up per LP, so RECONCILIATION_ROUNDING is
+# allowed on top for each rounded value: each fund and ledger sub-activity the LP's quarter has rows
+# for. Can be overridden from the .env file.
+RECONCILIATION_TOLERANCE = float(os.getenv("RECONCILIATION_TOLERANCE", "1.0"))
+RECONCILIATION_ROUNDING = float(os.getenv("RECONCILIATION_ROUNDING", "0.5"))
+
+# Each check compares a ledger total with the sum of PCAP fields times a sign; the PCAP reports
+# distributions as negative amounts. Older statements report one "Distributions" field instead of
+# principal and income.
+RECONCILIATION_CHECKS = {
+    "capital_called": (["Capital Calls"], 1.0),
+    "capital_distribution": (["Distributions (Principal)"], -1.0),
+    "income_distribution": (["Distributions (Income)"], -1.0),
+    "distribution": (["Distributions", "Distributions (Principal)", "Distributions (Income)"],
+                     -1.0),
+}
+
+STATUS_MATCHED = "matched"
+STATUS_MISMATCH = "mismatch"
+STATUS_MISSING_PCAP = "missing_pcap"
+STATUSES = [STATUS_MATCHED, STATUS_MISMATCH, STATUS_MISSING_PCAP]
+
+def _lp_mapping(values, lp_index):
+    """Map a list of category values onto LP indexes, with -1 for values that are not LPs"""
+    return np.array([lp_index.get(value, -1) for value in values] + [-1], dtype=np.int64)
+
+def _amount(value):
+    # Adding 0.0 turns -0.0 (a negated zero PCAP amount) into 0.0
+    return round(float(value), 2) + 0.0
+
+def load_pcap_columns(db: Session, fields=None):
+    """
+    The PCAP rows of the given fields (default all) as columns: LP names and their codes, PCAP
+    dates, field names and their codes, and amounts. Read from the analytics snapshot when it is
+    current.
+    """
+    snapshot = current_snapshot(db)
+    if snapshot is not None:
+        a = snapshot.arrays
+        field_names = snapshot.categories["pcap_field"][:-1]
+        if fields is None:
+            rows = np.arange(len(a["pcap_field"]))
+        else:
+            wanted = [i for i, name in enumerate(field_names) if name in fields]
+            rows = np.flatnonzero(np.isin(a["pcap_field"], wanted))
+        return (
+            snapshot.categories["pcap_lp_short_name"][:-1],
+            np.asarray(a["pcap_lp_short_name"][rows]),
+            np.asarray(a["pcap_pcap_date"][rows]),
+            field_names, np.asarray(a["pcap_field"][rows]),
+            np.asarray(a["pcap_amount"][rows]),
+        )
+
+    query = select(tbPCAP.lp_short_name, tbPCAP.pcap_date, tbPCAP.field, tbPCAP.amount)
+    if fields is not None:
+        query = query.where(tbPCAP.field.in_(fields))
+    rows = db.execute(query).all()
+    lp_names = {}
+    field_names = {}
+    lp_codes = np.fromiter(
+        (-1 if row[0] is None else lp_names.setdefault(row[0], len(lp_names)) for row in rows),
+        dtype=np.int32, count=len(rows)
+    )
+    field_codes = np.fromiter(
+        (-1 if row[2] is None else field_names.setdefault(row[2], len(field_names))
+         for row in rows),
+        dtype=np.int32, count=len(rows)
+    )
+    dates = np.array([row[1] if row[1] is not None else "NaT" for row in rows],
+                     dtype="datetime64[D]")
+    amounts = np.array([row[3] if row[3] is not None else np.nan for row in rows], dtype=np.float64)
+    return list(lp_names), lp_codes, dates, list(field_names), field_codes, amounts
+
+def _ledger_entries(db: Session, lp_index):
+    """
+    The ledger per (LP, fund, quarter) with an amount for any check: the LP indexes, quarter ends,
+    and per check the amount and the number of sub-activities it is made of. Rows are attributed to
+    LPs as in the fund metrics (LedgerColumns.quarter_aggregates).
+    """
+    snapshot = current_snapshot(db)
+    if snapshot is not None:
+        aggregates = snapshot.ledger_aggregates()
+        entities = snapshot.categories["ledger_entity"][:-1]
+    else:
+        columns = get_ledger_columns(db)
+        aggregates = columns.quarter_aggregates(totals=False)
+        entities = columns.categories["entity"]
+    lps = _lp_mapping(entities, lp_index)[aggregates["lp"]]
+    # Every check's rows are capital calls or distributions
+    kept = np.flatnonzero(
+        (lps >= 0)
+        & ((aggregates["parts_capital_called"] > 0) | (aggregates["parts_distribution"] > 0))
+    )
+    amounts = {check: aggregates[f"quarter_{check}"][kept] for check in RECONCILIATION_CHECKS}
+    parts = {check: aggregates[f"parts_{check}"][kept] for check in RECONCILIATION_CHECKS}
+    return lps[kept], aggregates["quarter"][kept], amounts, parts
+
+def reconcile(
+    db: Session, lp_short_names=None, tolerance=None, include_matched=False, rounding=None
+):
+    """
+    Compare the ledger with the PCAP for every (LP, quarter) in the PCAP date range, or only for
+    some LPs. A check is made where the PCAP reports one of its fields for the LP's quarter, or
+    where the ledger has an amount but the PCAP doesn't (missing_pcap). Ledger rows are assigned to
+    the quarter of their effective date. A reported check matches within the tolerance plus the
+    rounding allowance for each fund and sub-activity it has ledger rows for. Returns a summary and
+    the discrepancies, ordered by LP, quarter and check.
+    """
+    tolerance = RECONCILIATION_TOLERANCE if tolerance is None else tolerance
+    rounding = RECONCILIATION_ROUNDING if rounding is None else rounding
+    fields = list(dict.fromkeys(field for field_list, _ in RECONCILIATION_CHECKS.values()
+                                for field in field_list))
+
+    pcap_lp_names, pcap_lp_codes, pcap_dates, field_names, field_codes, pcap_amounts = (
+        load_pcap_columns(db, fields)
+    )
+    lp_names = sorted(set(db.execute(select(tbLPLookup.short_name)).scalars()) | set(pcap_lp_names))
+    if lp_short_names is not None:
+        wanted = set(lp_short_names)
+        lp_names = [name for name in lp_names if name in wanted]
+    lp_index = {name: i for i, name in enumerate(lp_names)}
+
+    # PCAP entries, keeping rows of the LPs being reconciled
+    pcap_lps = _lp_mapping(pcap_lp_names, lp_index)[pcap_lp_codes]
+    pcap_valid = (pcap_lps >= 0) & ~np.isnat(pcap_dates) & ~np.isnan(pcap_amounts)
+    pcap_lps = pcap_lps[pcap_valid]
+    pcap_quarters = quarter_ends(pcap_dates[pcap_valid])
+    pcap_fields = np.asarray(field_codes)[pcap_valid]
+    pcap_amounts = pcap_amounts[pcap_valid]
+
+    ledger_lps, ledger_quarters, ledger_amounts, ledger_parts = _ledger_entries(db, lp_index)
+    # Quarters outside the PCAP history (of every LP, so an LP without any statements is still
+    # reconciled) have no statement to reconcile against
+    all_quarters = quarter_ends(pcap_dates[~np.isnat(pcap_dates)])
+    if len(all_quarters):
+        in_range = (ledger_quarters >= all_quarters.min()) & (ledger_quarters <= all_quarters.max())
+    else:
+        in_range = np.zeros(len(ledger_quarters), dtype=bool)
+    ledger_lps, ledger_quarters = ledger_lps[in_range], ledger_quarters[in_range]
+    ledger_amounts = {check: amounts[in_range] for check, amounts in ledger_amounts.items()}
+    ledger_parts = {check: parts[in_range] for check, parts in ledger_parts.items()}
+
+    # One key per (LP, quarter) seen on either side
+    keys, inverse = np.unique(
+        np.rec.fromarrays([
+            np.concatenate([pcap_lps, ledger_lps]),
+            np.concatenate([pcap_quarters, ledger_quarters]).astype(np.int64),
+        ]),
+        return_inverse=True
+    )
+    inverse = inverse.ravel()
+    pcap_inverse, ledger_inverse = inverse[:len(pcap_lps)], inverse[len(pcap_lps):].astype(np.int64)
+
+    results = {}
+    for check, (check_fields, sign) in RECONCILIATION_CHECKS.items():
+        in_check = np.isin(
+            pcap_fields, [i for i, name in enumerate(field_names) if name in check_fields]
+        )
+        ledger_total = np.bincount(
+            ledger_inverse, weights=ledger_amounts[check], minlength=len(keys)
+        )
+        pcap_total = sign * np.bincount(
+            pcap_inverse, weights=np.where(in_check, pcap_amounts, 0.0), minlength=len(keys)
+        )
+        reported = np.bincount(pcap_inverse, weights=in_check, minlength=len(keys)) > 0
+        # One rounded PCAP value per (fund, sub-activity) with ledger rows in the LP's quarter
+        rounded = np.bincount(ledger_inverse, weights=ledger_parts[check], minlength=len(keys))
+        allowed = tolerance + rounding * rounded
+        difference = ledger_total - pcap_total
+        status = np.where(
+            reported,
+            np.where(np.abs(difference) <= allowed, 0, 1),
+            np.where(np.abs(ledger_total) > tolerance, 2, -1)
+        )
+        results[check] = (ledger_total, pcap_total, reported, difference, allowed, status)
+
+    summary = {status: 0 for status in STATUSES}
+    by_check = {}
+    rows = []
+    for check_index, (check, result) in enumerate(results.items()):
+        status = result[-1]
+        counts = np.bincount(status[status >= 0], minlength=len(STATUSES)).tolist()
+        by_check[check] = dict(zip(STATUSES, counts))
+        for name, count in by_check[check].items():
+            summary[name] += count
+        shown = np.flatnonzero(status >= (0 if include_matched else 1))
+        rows.append((shown, np.full(len(shown), check_index)))
+
+    positions = np.concatenate([shown for shown, _ in rows]).astype(np.int64)
+    check_indexes = np.concatenate([check_index for _, check_index in rows]).astype(np.int64)
+    order = np.lexsort((check_indexes, positions))
+    checks = list(RECONCILIATION_CHECKS)
+    quarters = keys["f1"].astype("datetime64[D]")
+
+    discrepancies = []
+    for position, check_index in zip(positions[order].tolist(), check_indexes[order].tolist()):
+        result = results[checks[check_index]]
+        ledger_total, pcap_total, reported, difference, allowed, status = result
+        discrepancies.append({
+            "lp_short_name": lp_names[keys["f0"][position]],
+            "quarter": str(quarters[position]),
+            "check": checks[check_index],
+            "ledger": _amount(ledger_total[position]),
+            "pcap": _amount(pcap_total[position]) if reported[position] else None,
+            "difference": _amount(difference[position]),
+            "allowed_difference": _amount(allowed[position]) if reported[position] else tolerance,
+            "status": STATUSES[status[position]],
+        })
+
+    return {
+        "tolerance": tolerance,
+        "rounding": rounding,
+        "checks": {check: {"pcap_fields": check_fields, "sign": sign}
+                   for check, (check_fields, sign) in RECONCILIATION_CHECKS.items()},
+        "summary": {
+            "lps": len(np.unique(keys["f0"])),
+            "lp_quarters": len(keys),
+            "first_quarter": str(quarters.min()) if len(keys) else None,
+            "last_quarter": str(quarters.max()) if len(keys) else None,
+            "discrepancies": summary[STATUS_MISMATCH] + summary[STATUS_MISSING_PCAP],
+            **summary,
+            "by_check": by_check,
+        },
+        "discrepancies": discrepancies,
+    }
@@ -0,0 +1,213 @@
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# Histogram buckets for request latency in seconds and for SQL queries per request
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+QUERY_COUNT_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+# Route label for queries and IRR calculations that happen outside a request
+# (warm-up, jobs, imports)
+BACKGROUND_ROUTE = "background"
+
+class RequestStats:
+    """SQL and IRR work done while handling one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.irr_calculations = 0
+        self.irr_seconds = 0.0
+
+_current_stats = ContextVar("request_stats", default=None)
+
+class Histogram:
+    """A Prometheus style cumulative histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+_lock = threading.Lock()
+_request_counts = {}        # (method, route, status) -> count
+_latency = {}               # (method, route) -> Histogram of seconds
+_queries_per_request = {}   # (method, route) -> Histogram of query counts
+_db_totals = {}             # route -> [queries, seconds]
+_irr_totals = {}            # route -> [calculations, seconds]
+_irr_timeouts = 0
+
+def start_request():
+    """Start collecting stats for the current request and return them"""
+    stats = RequestStats()
+    _current_stats.set(stats)
+    return stats
+
+def detach_request_stats():
+    """Stop counting work in the current context towards a request; it is reported as background"""
+    _current_stats.set(None)
+
+def record_request(method, route, status, seconds, stats):
+    """Record a finished request in the latency and per-request query histograms"""
+    with _lock:
+        key = (method, route, status)
+        _request_counts[key] = _request_counts.get(key, 0) + 1
+        _latency.setdefault((method, route), Histogram(LATENCY_BUCKETS)).observe(seconds)
+        _queries_per_request.setdefault((method, route), Histogram(QUERY_COUNT_BUCKETS)).observe(
+            stats.queries
+        )
+        _add_total(_db_totals, route, stats.queries, stats.db_seconds)
+        _add_total(_irr_totals, route, stats.irr_calculations, stats.irr_seconds)
+
+def _add_total(totals, route, count, seconds):
+    total = totals.setdefault(route, [0, 0.0])
+    total[0] += count
+    total[1] += seconds
+
+def record_irr(seconds, timed_out=False):
+    """Record time spent waiting on the IRR solver, against the current request if there is one"""
+    global _irr_timeouts
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.irr_calculations += 1
+        stats.irr_seconds += seconds
+    with _lock:
+        if stats is None:
+            _add_total(_irr_totals, BACKGROUND_ROUTE, 1, seconds)
+        if timed_out:
+            _irr_timeouts += 1
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start_times"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+        return
+    with _lock:
+        _add_total(_db_totals, BACKGROUND_ROUTE, 1, seconds)
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute, so drop its start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_times"):
+        conn.info["query_start_times"].pop()
+
+def instrument_engine(engine):
+    """Count SQL statements and time spent in the database through SQLAlchemy engine events"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def server_timing_header(seconds, stats):
+    """Format request, database and IRR time as a Server-Timing header value"""
+    return (
+        f'app;dur={seconds * 1000:.1f}, '
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+        f'irr;dur={stats.irr_seconds * 1000:.1f};desc="{stats.irr_calculations} calculations"'
+    )
+
+def _labels(**labels):
+    escaped = {k: str(v).replace("\\", "\\\\").replace('"', '\\"') for k, v in labels.items()}
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped.items()) + "}"
+
+def _format_bound(bound):
+    return f"{bound:g}"
+
+def _histogram_lines(name, histograms):
+    lines = []
+    for (method, route), histogram in sorted(histograms.items()):
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            labels = _labels(method=method, route=route, le=_format_bound(bound))
+            lines.append(f"{name}_bucket{labels} {count}")
+        lines.append(
+            f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {histogram.count}"
+        )
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+    return lines
+
+def render_prometheus(extra_metrics=None):
+    """
+    Render all collected metrics in the Prometheus text exposition format. extra_metrics is a list
+    of (name, type, help, value) tuples for gauges and counters owned elsewhere.
+    """
+    with _lock:
+        lines = [
+            "# HELP lp_http_requests_total HTTP requests handled, by route and status.",
+            "# TYPE lp_http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(_request_counts.items()):
+            labels = _labels(method=method, route=route, status=status)
+            lines.append(f"lp_http_requests_total{labels} {count}")
+
+        lines += [
+            "# HELP lp_http_request_duration_seconds HTTP request latency, by route.",
+            "# TYPE lp_http_request_duration_seconds histogram",
+        ]
+        lines += _histogram_lines("lp_http_request_duration_seconds", _latency)
+
+        lines += [
+            "# HELP lp_http_request_db_queries SQL statements executed per HTTP request, by route.",
+            "# TYPE lp_http_request_db_queries histogram",
+        ]
+        lines += _histogram_lines("lp_http_request_db_queries", _queries_per_request)
+
+        lines += [
+            "# HELP lp_db_queries_total SQL statements executed, by route.",
+            "# TYPE lp_db_queries_total counter",
+        ]
+        lines += [
+            f"lp_db_queries_total{_labels(route=route)} {total[0]}"
+            for route, total in sorted(_db_totals.items())
+        ]
+        lines += [
+            "# HELP lp_db_query_seconds_total Time spent executing SQL statements, by route.",
+            "# TYPE lp_db_query_seconds_total counter",
+        ]
+        lines += [
+            f"lp_db_query_seconds_total{_labels(route=route)} {total[1]}"
+            for route, total in sorted(_db_totals.items())
+        ]
+
+        lines += [
+            "# HELP lp_irr_calculations_total IRR calculations, by route.",
+            "# TYPE lp_irr_calculations_total counter",
+        ]
+        lines += [
+            f"lp_irr_calculations_total{_labels(route=route)} {total[0]}"
+            for route, total in sorted(_irr_totals.items())
+        ]
+        lines += [
+            "# HELP lp_irr_seconds_total Time spent waiting on the IRR solver, by route.",
+            "# TYPE lp_irr_seconds_total counter",
+        ]
+        lines += [
+            f"lp_irr_seconds_total{_labels(route=route)} {total[1]}"
+            for route, total in sorted(_irr_totals.items())
+        ]
+        lines += [
+            "# HELP lp_irr_timeouts_total IRR calculations that timed out and used the fallback "
+            "result.",
+            "# TYPE lp_irr_timeouts_total counter",
+            f"lp_irr_timeouts_total {_irr_timeouts}",
+        ]
+
+    for name, metric_type, help_text, value in extra_metrics or []:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+
+    return "\n".join(lines) + "\n"
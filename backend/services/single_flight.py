@@ -0,0 +1,57 @@
+import threading
+
+class _Call:
+    """A computation in flight, shared by the leader that runs it and any followers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent computations.
+    The first caller for a key (the leader) runs the function; callers with the same key
+    that arrive while it is running (hits) wait and get the leader's result or exception.
+    Nothing is kept once the leader finishes, so this only deduplicates concurrent work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.hits = 0
+
+    def do(self, key, func):
+        """Run func() for the key, or wait for the identical call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.hits += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """Get the leader and hit counts and the number of computations in flight"""
+        with self._lock:
+            return {"leaders": self.leaders, "hits": self.hits, "in_flight": len(self._calls)}
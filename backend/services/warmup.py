@@ -0,0 +1,291 @@
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime
+from backend.db import SessionLocal
+from backend.middleware import active_request_count
+from backend.models import tbPCAP
+from backend.services.data_version import get_data_version
+from backend.services.lp_details import (
+    build_lp_details, cached_lp_details, lp_details_cache, lp_details_key
+)
+from backend.services.metrics_calculator import load_metrics_dataset
+
+# Warm-up settings can be overridden from the .env file
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", "1"))
+WARMUP_QUARTERS = int(os.getenv("WARMUP_QUARTERS", "4"))
+WARMUP_INCLUDE_TODAY = os.getenv("WARMUP_INCLUDE_TODAY", "true").lower() == "true"
+# The dashboard requests metric values only, so that is what is warmed by default
+WARMUP_INCLUDE_TRANSACTIONS = os.getenv("WARMUP_INCLUDE_TRANSACTIONS", "false").lower() == "true"
+WARMUP_POLL_SECONDS = float(os.getenv("WARMUP_POLL_SECONDS", "30"))
+WARMUP_PAUSE_SECONDS = float(os.getenv("WARMUP_PAUSE_SECONDS", "0.2"))
+# Lower the OS scheduling priority of warm-up threads by this niceness increment where supported
+WARMUP_NICENESS = int(os.getenv("WARMUP_NICENESS", "10"))
+
+WARMUP_STATUS_IDLE = "idle"
+WARMUP_STATUS_RUNNING = "running"
+WARMUP_STATUS_COMPLETED = "completed"
+WARMUP_STATUS_CANCELLED = "cancelled"
+WARMUP_STATUS_FAILED = "failed"
+
+class WarmupRun:
+    """One pass over every LP and warm-up report date for a data version"""
+
+    def __init__(self, data_version):
+        self.data_version = data_version
+        self.status = WARMUP_STATUS_RUNNING
+        self.report_dates = []
+        self.total = 0
+        self.completed = 0
+        self.computed = 0
+        self.already_cached = 0
+        self.skipped = 0
+        self.paused_seconds = 0.0
+        self.error = None
+        self.started_at = datetime.now()
+        self.finished_at = None
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def record(self, computed, paused_seconds):
+        with self._lock:
+            self.completed += 1
+            if computed:
+                self.computed += 1
+            else:
+                self.already_cached += 1
+            self.paused_seconds += paused_seconds
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "data_version": self.data_version,
+            "report_dates": self.report_dates,
+            "total": self.total,
+            "completed": self.completed,
+            "progress": round(self.completed / self.total, 4) if self.total else 0.0,
+            "computed": self.computed,
+            "already_cached": self.already_cached,
+            "skipped": self.skipped,
+            "paused_seconds": round(self.paused_seconds, 3),
+            "error": self.error,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+_current_run = None
+_lock = threading.Lock()
+_stop = threading.Event()
+_wake = threading.Event()
+# Set once the first warm-up run after startup has finished
+_first_run_finished = threading.Event()
+_scheduler_thread = None
+_executor = None
+
+def warmup_report_dates(pcap_dates, quarters=WARMUP_QUARTERS, include_today=WARMUP_INCLUDE_TODAY):
+    """
+    Get the report dates to warm: the latest PCAP date of the most recent quarter and of each of the
+    given number of previous quarters, plus today's date (the dashboard's default) if include_today.
+    """
+    latest_per_quarter = {}
+    for pcap_date in pcap_dates:
+        quarter = (pcap_date.year, (pcap_date.month - 1) // 3)
+        if quarter not in latest_per_quarter or pcap_date > latest_per_quarter[quarter]:
+            latest_per_quarter[quarter] = pcap_date
+
+    dates = sorted(latest_per_quarter.values(), reverse=True)[:quarters + 1]
+    report_dates = [d.strftime('%Y-%m-%d') for d in dates]
+    if include_today:
+        today = date.today().strftime('%Y-%m-%d')
+        if today not in report_dates:
+            report_dates.insert(0, today)
+    return report_dates
+
+def warmup_tasks(report_dates, short_names, capacity):
+    """
+    Get the (LP, report date) pairs to warm, in the order to warm them. The cache evicts the least
+    recently used entries, so the most requested dates (in the order warmup_report_dates gives them)
+    are warmed last, and pairs for the oldest dates are dropped beyond the cache capacity.
+    """
+    tasks = [(short_name, report_date)
+             for report_date in reversed(report_dates) for short_name in sorted(short_names)]
+    return tasks[max(len(tasks) - capacity, 0):]
+
+def _lower_thread_priority():
+    """Best effort: raise the niceness of the current thread (per-thread on Linux)"""
+    if WARMUP_NICENESS <= 0 or not hasattr(os, "setpriority"):
+        return
+    try:
+        thread_id = threading.get_native_id()
+        os.setpriority(
+            os.PRIO_PROCESS, thread_id, os.getpriority(os.PRIO_PROCESS, thread_id) + WARMUP_NICENESS
+        )
+    except OSError:
+        pass
+
+def _wait_for_idle(run):
+    """Block while interactive requests are in progress and return how long we waited"""
+    paused = 0.0
+    while active_request_count() > 0 and not run.cancelled.is_set() and not _stop.is_set():
+        time.sleep(WARMUP_PAUSE_SECONDS)
+        paused += WARMUP_PAUSE_SECONDS
+    return paused
+
+def _warm_one(run, dataset, short_name, report_date):
+    paused = _wait_for_idle(run)
+    if run.cancelled.is_set() or _stop.is_set():
+        return
+
+    key = lp_details_key(short_name, report_date, run.data_version, WARMUP_INCLUDE_TRANSACTIONS)
+    if key in lp_details_cache:
+        run.record(False, paused)
+        return
+    cached_lp_details(
+        key, lambda: build_lp_details(dataset, short_name, report_date, WARMUP_INCLUDE_TRANSACTIONS)
+    )
+    run.record(True, paused)
+
+def _execute(run):
+    """
+    Load every LP's data once and compute the details for each LP and report date on the worker pool
+    """
+    db = SessionLocal()
+    try:
+        pcap_dates = (
+            db.query(tbPCAP.pcap_date).filter(tbPCAP.pcap_date.isnot(None)).distinct().all()
+        )
+        run.report_dates = warmup_report_dates([row.pcap_date for row in pcap_dates])
+        if not run.report_dates:
+            return []
+        # Persist the tables for this data version first, so every worker can map them
+        # instead of querying
+        try:
+            from backend.services.analytics_snapshot import refresh_snapshot
+            refresh_snapshot(db)
+        except Exception as e:
+            print(f"Could not build the analytics snapshot: {str(e)}")
+        dataset = load_metrics_dataset(db, None, run.report_dates)
+    finally:
+        db.close()
+
+    tasks = warmup_tasks(run.report_dates, dataset.lps, lp_details_cache.max_size)
+    run.total = len(tasks)
+    run.skipped = len(run.report_dates) * len(dataset.lps) - len(tasks)
+    if run.skipped:
+        print(f"Skipping {run.skipped} LP details for older report dates, "
+              f"which would not fit in the cache (LP_DETAILS_CACHE_SIZE)")
+    return [_executor.submit(_warm_one, run, dataset, short_name, report_date)
+            for short_name, report_date in tasks]
+
+def _current_version():
+    db = SessionLocal()
+    try:
+        return get_data_version(db).version
+    finally:
+        db.close()
+
+def _run_warmup(version):
+    """Warm the cache for a data version, cancelling if the data changes underneath it"""
+    global _current_run
+    run = WarmupRun(version)
+    with _lock:
+        _current_run = run
+    print(f"Warming LP details cache for data version {version}")
+
+    try:
+        futures = _execute(run)
+        while futures and not _stop.is_set():
+            done, not_done = wait(futures, timeout=WARMUP_POLL_SECONDS)
+            if not not_done:
+                break
+            if _current_version() != version:
+                run.cancelled.set()
+                wait(not_done)
+                break
+        for future in futures:
+            if future.done() and not future.cancelled() and future.exception():
+                raise future.exception()
+    except Exception as e:
+        print(f"Cache warm-up failed: {str(e)}")
+        traceback.print_exc()
+        run.status = WARMUP_STATUS_FAILED
+        run.error = str(e)
+    else:
+        cancelled = run.cancelled.is_set() or _stop.is_set()
+        run.status = WARMUP_STATUS_CANCELLED if cancelled else WARMUP_STATUS_COMPLETED
+        if run.status == WARMUP_STATUS_COMPLETED:
+            print(f"Warmed {run.computed} LP details for data version {version}")
+    run.finished_at = datetime.now()
+    if run.status != WARMUP_STATUS_CANCELLED:
+        _first_run_finished.set()
+    return run
+
+def _scheduler_loop():
+    """Start a warm-up whenever the data version changes (startup, imports, edits)"""
+    warmed_version = None
+    while not _stop.is_set():
+        try:
+            version = _current_version()
+        except Exception as e:
+            print(f"Cache warm-up could not read the data version: {str(e)}")
+            version = warmed_version
+
+        if version != warmed_version:
+            run = _run_warmup(version)
+            # A failed run is not retried until the data changes again
+            if run.status != WARMUP_STATUS_CANCELLED:
+                warmed_version = version
+            continue
+
+        _wake.wait(WARMUP_POLL_SECONDS)
+        _wake.clear()
+
+def start_warmup_scheduler():
+    """Start the background warm-up scheduler if it is enabled and not already running"""
+    global _scheduler_thread, _executor
+    if not WARMUP_ENABLED or (_scheduler_thread is not None and _scheduler_thread.is_alive()):
+        return
+    _stop.clear()
+    _executor = ThreadPoolExecutor(
+        max_workers=WARMUP_WORKERS, thread_name_prefix="lp-warmup",
+        initializer=_lower_thread_priority
+    )
+    _scheduler_thread = threading.Thread(
+        target=_scheduler_loop, name="lp-warmup-scheduler", daemon=True
+    )
+    _scheduler_thread.start()
+
+def stop_warmup_scheduler():
+    """Stop the scheduler and cancel any warm-up in progress"""
+    _stop.set()
+    _wake.set()
+    with _lock:
+        if _current_run is not None:
+            _current_run.cancelled.set()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+
+def trigger_warmup():
+    """Check the data version now rather than at the next poll"""
+    _wake.set()
+
+def warmup_ready():
+    """Whether the first warm-up after startup has finished, or warm-up is disabled"""
+    return not WARMUP_ENABLED or _first_run_finished.is_set()
+
+def get_warmup_progress():
+    """Get the state of the latest warm-up run and the LP details cache"""
+    from backend.services.analytics_snapshot import get_snapshot_stats
+    with _lock:
+        run = _current_run
+    return {
+        "enabled": WARMUP_ENABLED,
+        "scheduler_running": _scheduler_thread is not None and _scheduler_thread.is_alive(),
+        "run": run.to_dict() if run else {"status": WARMUP_STATUS_IDLE},
+        "interactive_requests": active_request_count(),
+        "cache": lp_details_cache.stats(),
+        "analytics_snapshot": get_snapshot_stats(),
+    }
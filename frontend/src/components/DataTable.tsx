@@ -1,11 +1,19 @@
 import React, { useState, useEffect } from 'react';
-import { TableProps, LPLookupData, LPFundData, PCAPData, LedgerData } from '../types/types';
+import {
+  TableProps, LPLookupData, LPFundData, PCAPData, LedgerData, PaginatedResponse, Job
+} from '../types/types';
 import config from '../config';
 import './DataTable.css';
 
 // Define the API base URL
 const API_BASE_URL = config.API_URL;
 
+// Number of rows requested per page
+const PAGE_SIZE = 50;
+
+// How often a running export job is polled, in milliseconds
+const JOB_POLL_INTERVAL = 1000;
+
 type DataType = LPLookupData | LPFundData | PCAPData | LedgerData;
 
 /**
@@ -18,18 +26,25 @@ const DataTable: React.FC<TableProps> = ({ tableType }) => {
   const [editingItem, setEditingItem] = useState<DataType | null>(null);
   const [newItem, setNewItem] = useState<boolean>(false);
   const [exportStatus, setExportStatus] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [totalCount, setTotalCount] = useState<number | null>(null);
   
-  // Function to fetch data from the API
-  const fetchData = async () => {
-    setLoading(true);
+  // Function to fetch a page of data from the API, appending to the loaded rows
+  // when a cursor is given
+  const fetchData = async (cursor: string | null = null) => {
+    if (!cursor) setLoading(true);
     setError(null);
     try {
-      const response = await fetch(`${API_BASE_URL}/api/data/${tableType}`);
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${API_BASE_URL}/api/data/${tableType}?${params.toString()}`);
       if (!response.ok) {
         throw new Error(`Error fetching ${tableType} data: ${response.statusText}`);
       }
-      const result = await response.json();
-      setData(result);
+      const result: PaginatedResponse<DataType> = await response.json();
+      setData(prevData => cursor ? [...prevData, ...result.items] : result.items);
+      setNextCursor(result.next_cursor);
+      setTotalCount(result.total);
     } catch (err) {
       setError(`Failed to load data: ${err instanceof Error ? err.message : String(err)}`);
     } finally {
@@ -463,58 +478,56 @@ const DataTable: React.FC<TableProps> = ({ tableType }) => {
     });
   };
   
-  // Function to handle exporting the current table to CSV
-  const handleExportTable = async () => {
-    setExportStatus('Exporting data...');
+  // Function to run an export as a background job: submit it, poll until it finishes,
+  // then download the file
+  const runExportJob = async (path: string, label: string) => {
+    setExportStatus(`${label}...`);
     try {
-      const response = await fetch(`${API_BASE_URL}/api/data/export/${tableType}`, {
-        method: 'POST',
-      });
-      
+      const response = await fetch(`${API_BASE_URL}${path}`, { method: 'POST' });
       if (!response.ok) {
-        throw new Error(`Error exporting data: ${response.statusText}`);
+        throw new Error(`Error starting export: ${response.statusText}`);
       }
-      
-      // Removed unused result variable
-      await response.json();
-      setExportStatus('Export successful!');
-      
-      // Clear the status message after 3 seconds
-      setTimeout(() => {
-        setExportStatus(null);
-      }, 3000);
-    } catch (err) {
-      setError(`Failed to export data: ${err instanceof Error ? err.message : String(err)}`);
-      setExportStatus(null);
-    }
-  };
-  
-  // Function to handle exporting all tables to CSV
-  const handleExportAllTables = async () => {
-    setExportStatus('Exporting all tables...');
-    try {
-      const response = await fetch(`${API_BASE_URL}/api/data/export-all`, {
-        method: 'POST',
-      });
-      
-      if (!response.ok) {
-        throw new Error(`Error exporting all tables: ${response.statusText}`);
+      let job: Job = await response.json();
+
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+        const statusResponse = await fetch(`${API_BASE_URL}/api/jobs/${job.id}`);
+        if (!statusResponse.ok) {
+          throw new Error(`Error checking export: ${statusResponse.statusText}`);
+        }
+        job = await statusResponse.json();
+        setExportStatus(`${label}... ${Math.round(job.progress * 100)}%`);
       }
-      
-      // Removed unused result variable
-      await response.json();
+
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Export job failed');
+      }
+
+      // Download the artifact through a temporary link
+      const link = document.createElement('a');
+      link.href = `${API_BASE_URL}/api/jobs/${job.id}/download`;
+      link.download = job.artifact_name || '';
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
       setExportStatus('Export successful!');
-      
+
       // Clear the status message after 3 seconds
       setTimeout(() => {
         setExportStatus(null);
       }, 3000);
     } catch (err) {
-      setError(`Failed to export all tables: ${err instanceof Error ? err.message : String(err)}`);
+      setError(`Failed to export data: ${err instanceof Error ? err.message : String(err)}`);
       setExportStatus(null);
     }
   };
 
+  // Function to handle exporting the current table to CSV
+  const handleExportTable = () => runExportJob(`/api/jobs/export/${tableType}`, 'Exporting data');
+
+  // Function to handle exporting all tables to a zip of CSV files
+  const handleExportAllTables = () => runExportJob('/api/jobs/export-all', 'Exporting all tables');
+
   return (
     <div className="data-table-component">
       {error && <div className="error-message">{error}</div>}
@@ -556,6 +569,14 @@ const DataTable: React.FC<TableProps> = ({ tableType }) => {
                     {renderTableRows()}
                   </tbody>
                 </table>
+                <div className="pagination-status">
+                  Showing {data.length}{totalCount !== null ? ` of ${totalCount}` : ''} rows
+                  {nextCursor && (
+                    <button onClick={() => fetchData(nextCursor)} className="btn-load-more">
+                      Load More
+                    </button>
+                  )}
+                </div>
               </div>
             ) : (
               <div className="no-data">No data available</div>
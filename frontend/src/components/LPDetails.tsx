@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
-import { LPDetails as LPDetailsType, Fund, Transaction } from "../types/types";
+import { LPDetails as LPDetailsType, Fund } from "../types/types";
 import config from '../config';
 import Tooltip from './tooltip';
 import IRRTooltip from './IRRTooltip';
@@ -50,11 +50,6 @@ const LPDetails: React.FC<LocalLPDetailsProps> = ({ lpShortName, reportDate }) =
     const [lpData, setLPData] = useState<LPDetailsType | null>(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
-    const [distributionDiscrepancy, setDistributionDiscrepancy] = useState<{
-        difference: number, 
-        otherSubcategories: Array<{name: string, amount: number, transactions: Transaction[]}>,
-        otherSubcategoryNames?: string[]
-    } | null>(null);
 
     useEffect(() => {
         const fetchLPDetails = async () => {
@@ -182,47 +177,17 @@ const LPDetails: React.FC<LocalLPDetailsProps> = ({ lpShortName, reportDate }) =
         </div>
     );
 
-    const getDistributionDiscrepancy = () => {
-        if (!lpData?.totals) return null;
-        
+    // Amount of the total distribution that isn't a capital or income distribution; the tooltip
+    // loads the transactions to name the other sub-activities when it is expanded
+    const getDistributionDifference = (): number | undefined => {
+        if (!lpData?.totals) return undefined;
+
         const { total_distribution, total_capital_distribution, total_income_distribution } = lpData.totals;
-        const sumOfParts = total_capital_distribution.value + total_income_distribution.value;
-        
-        if (Math.abs(total_distribution.value - sumOfParts) < 0.01) return null;
-        
-        const standardSubcategories = ['Capital Distribution', 'Income Distribution'];
-        
-        const otherSubcategoryDetails = total_distribution.transactions
-            .filter(t => !standardSubcategories.includes(t.sub_activity || ''))
-            .reduce((acc, t) => {
-                const key = t.sub_activity || 'Uncategorized';
-                if (!acc[key]) {
-                    acc[key] = {
-                        name: key,
-                        amount: 0,
-                        transactions: []
-                    };
-                }
-                acc[key].amount += t.amount;
-                acc[key].transactions.push(t);
-                return acc;
-            }, {} as Record<string, { name: string, amount: number, transactions: Transaction[] }>);
-        
-        const otherSubcategories = Object.values(otherSubcategoryDetails);
-        
-        return {
-            difference: total_distribution.value - sumOfParts,
-            otherSubcategories,
-            otherSubcategoryNames: otherSubcategories.map(sc => sc.name)
-        };
+        const difference = total_distribution.value
+            - (total_capital_distribution.value + total_income_distribution.value);
+        return Math.abs(difference) < 0.01 ? undefined : difference;
     };
 
-    useEffect(() => {
-        if (lpData?.totals) {
-            setDistributionDiscrepancy(getDistributionDiscrepancy());
-        }
-    }, [lpData?.totals]);
-
     if (loading) return <div>Loading...</div>;
     if (error) return <div className="error">{error}</div>;
     if (!lpData) return <div>No data available</div>;
@@ -267,7 +232,8 @@ const LPDetails: React.FC<LocalLPDetailsProps> = ({ lpShortName, reportDate }) =
                                     {formatCurrency(lpData.totals.total_commitment.value)}
                                     <Tooltip 
                                         text={tooltipTexts.totalCommitment.text}
-                                        transactions={lpData.totals.total_commitment.transactions}
+                                        lpShortName={lpShortName}
+                                        reportDate={reportDate}
                                         metricName="total_commitment"
                                     />
                                 </span>
@@ -278,7 +244,8 @@ const LPDetails: React.FC<LocalLPDetailsProps> = ({ lpShortName, reportDate }) =
                                     {formatCurrency(lpData.totals.total_capital_called.value)}
                                     <Tooltip 
                                         text={tooltipTexts.totalCapitalCalled.text}
-                                        transactions={lpData.totals.total_capital_called.transactions}
+                                        lpShortName={lpShortName}
+                                        reportDate={reportDate}
                                         metricName="total_capital_called"
                                     />
                                 </span>
@@ -289,7 +256,8 @@ const LPDetails: React.FC<LocalLPDetailsProps> = ({ lpShortName, reportDate }) =
                                     {formatCurrency(lpData.totals.total_capital_distribution.value)}
                                     <Tooltip 
                                         text={tooltipTexts.totalCapitalDistribution.text}
-                                        transactions={lpData.totals.total_capital_distribution.transactions}
+                                        lpShortName={lpShortName}
+                                        reportDate={reportDate}
                                         metricName="total_capital_distribution"
                                     />
                                 </span>
@@ -300,7 +268,8 @@ const LPDetails: React.FC<LocalLPDetailsProps> = ({ lpShortName, reportDate }) =
                                     {formatCurrency(lpData.totals.total_income_distribution.value)}
                                     <Tooltip 
                                         text={tooltipTexts.totalIncomeDistribution.text}
-                                        transactions={lpData.totals.total_income_distribution.transactions}
+                                        lpShortName={lpShortName}
+                                        reportDate={reportDate}
                                         metricName="total_income_distribution"
                                     />
                                 </span>
@@ -311,9 +280,10 @@ const LPDetails: React.FC<LocalLPDetailsProps> = ({ lpShortName, reportDate }) =
                                     {formatCurrency(lpData.totals.total_distribution.value)}
                                     <Tooltip 
                                         text={tooltipTexts.totalDistribution.text}
-                                        transactions={lpData.totals.total_distribution.transactions}
+                                        lpShortName={lpShortName}
+                                        reportDate={reportDate}
                                         metricName="total_distribution"
-                                        distributionDiscrepancy={distributionDiscrepancy}
+                                        distributionDifference={getDistributionDifference()}
                                     />
                                 </span>
                             </div>
@@ -1,29 +1,61 @@
 import React, { useState, useRef, useEffect } from 'react';
-import { Transaction } from '../types/types';
+import axios from 'axios';
+import { Transaction, PaginatedResponse } from '../types/types';
+import config from '../config';
 import './tooltip.css';
 
+// Largest page the transactions endpoint returns
+const TRANSACTIONS_PAGE_SIZE = 1000;
+
+/**
+ * Fetch all the ledger transactions behind one of an LP's metrics, page by page
+ */
+export const fetchMetricTransactions = async (
+    lpShortName: string, reportDate: string, metricName: string
+): Promise<Transaction[]> => {
+    const transactions: Transaction[] = [];
+    let cursor: string | null = null;
+    do {
+        const params: Record<string, string | number> = {
+            report_date: reportDate, metric: metricName, limit: TRANSACTIONS_PAGE_SIZE
+        };
+        if (cursor) params.cursor = cursor;
+        const response: { data: PaginatedResponse<Transaction> } = await axios.get(
+            `${config.API_URL}/api/lp/${lpShortName}/transactions`, { params }
+        );
+        transactions.push(...response.data.items);
+        cursor = response.data.next_cursor;
+    } while (cursor);
+    return transactions;
+};
+
+const STANDARD_DISTRIBUTION_SUBCATEGORIES = ['Capital Distribution', 'Income Distribution'];
+
 interface TooltipProps {
     text: string;
+    // Transactions to show, or an LP and report date to load the metric's transactions
+    // from when expanded
     transactions?: Transaction[];
+    lpShortName?: string;
+    reportDate?: string;
     metricName?: string;
     children?: React.ReactNode;
-    distributionDiscrepancy?: {
-        difference: number;
-        otherSubcategories: Array<{
-            name: string;
-            amount: number;
-            transactions: Transaction[];
-        }>;
-        otherSubcategoryNames?: string[];
-    } | null;
+    // Amount of the total distribution that isn't a capital or income distribution
+    distributionDifference?: number;
     customTooltipContent?: React.ReactNode;
 }
 
-const Tooltip: React.FC<TooltipProps> = ({ text, transactions, metricName, children, distributionDiscrepancy, customTooltipContent }) => {
+const Tooltip: React.FC<TooltipProps> = ({
+    text, transactions: givenTransactions, lpShortName, reportDate, metricName, children,
+    distributionDifference, customTooltipContent
+}) => {
     const [isVisible, setIsVisible] = useState(false);
     const [showBelow, setShowBelow] = useState(false);
+    const [loadedTransactions, setLoadedTransactions] = useState<Transaction[] | null>(null);
+    const [loadingTransactions, setLoadingTransactions] = useState(false);
     const tooltipRef = useRef<HTMLDivElement>(null);
     const contentRef = useRef<HTMLDivElement>(null);
+    const transactions = givenTransactions || loadedTransactions || undefined;
 
     // Check tooltip position and adjust if needed
     useEffect(() => {
@@ -44,6 +76,36 @@ const Tooltip: React.FC<TooltipProps> = ({ text, transactions, metricName, child
         }
     }, [isVisible]);
 
+    // Forget loaded transactions when the LP or report date changes
+    useEffect(() => {
+        setLoadedTransactions(null);
+    }, [lpShortName, reportDate, metricName]);
+
+    // Load the metric's transactions the first time the tooltip is expanded
+    useEffect(() => {
+        if (!isVisible || givenTransactions || loadedTransactions || loadingTransactions) return;
+        if (!lpShortName || !reportDate || !metricName) return;
+        setLoadingTransactions(true);
+        fetchMetricTransactions(lpShortName, reportDate, metricName)
+            .then(setLoadedTransactions)
+            .catch(err => console.error('Error fetching transactions:', err))
+            .finally(() => setLoadingTransactions(false));
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [isVisible, lpShortName, reportDate, metricName]);
+
+    // Distribution sub-activities other than capital and income distributions, largest first
+    const otherSubcategories = distributionDifference && transactions
+        ? Object.values(transactions
+            .filter(t => !STANDARD_DISTRIBUTION_SUBCATEGORIES.includes(t.sub_activity || ''))
+            .reduce((acc, t) => {
+                const key = t.sub_activity || 'Uncategorized';
+                acc[key] = acc[key] || { name: key, amount: 0 };
+                acc[key].amount += t.amount;
+                return acc;
+            }, {} as Record<string, { name: string, amount: number }>))
+            .sort((a, b) => Math.abs(b.amount) - Math.abs(a.amount))
+        : [];
+
     const handleMouseEnter = () => {
         setIsVisible(true);
     };
@@ -117,18 +179,21 @@ const Tooltip: React.FC<TooltipProps> = ({ text, transactions, metricName, child
                 >
                     <div className="tooltip-text">
                         {text}
-                        {distributionDiscrepancy && distributionDiscrepancy.otherSubcategories.length > 0 && (
+                        {distributionDifference ? (
                             <div className="distribution-discrepancy">
                                 <p className="discrepancy-note">
                                     <span className="info-icon">ℹ️</span> 
-                                    Also includes {formatCurrency(distributionDiscrepancy.difference)} 
-                                    {distributionDiscrepancy.otherSubcategories.length > 0 && 
-                                     ` (e.g., ${distributionDiscrepancy.otherSubcategories[0].name})`}
+                                    Also includes {formatCurrency(distributionDifference)} 
+                                    {otherSubcategories.length > 0 && 
+                                     ` (e.g., ${otherSubcategories[0].name})`}
                                 </p>
                             </div>
-                        )}
+                        ) : null}
                     </div>
                     {customTooltipContent}
+                    {loadingTransactions && (
+                        <div className="tooltip-footer">Loading transactions...</div>
+                    )}
                     {transactions && transactions.length > 0 && (
                         <div className="tooltip-data">
                             <table className="data-preview">
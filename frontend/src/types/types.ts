@@ -28,11 +28,11 @@ export interface Transaction {
 }
 
 /**
- * Metric with value and transactions
+ * Metric with value, and its transactions when requested with include=transactions
  */
 export interface Metric {
     value: number;
-    transactions: Transaction[];
+    transactions?: Transaction[];
 }
 
 /**
@@ -81,6 +81,7 @@ export interface LPDetails {
     irr: number | null;
     irr_snapshot_data_issue: boolean;
     irr_chronology_issue: boolean;
+    irr_unavailable: boolean;  // IRR could not be calculated in time; retried on the next request
     pcap_report_date: string | null;
 }
 
@@ -159,6 +160,29 @@ export interface LedgerData {
 
 export type TableType = 'lplookup' | 'lpfund' | 'pcap' | 'ledger';
 
+/**
+ * One page of rows from a /api/data list endpoint
+ */
+export interface PaginatedResponse<T> {
+    items: T[];
+    next_cursor: string | null;
+    total: number | null;
+    limit: number;
+    sort: string;
+}
+
 export interface TableProps {
     tableType: TableType;
-}
\ No newline at end of file
+}
+/**
+ * A background job from the /api/jobs endpoints
+ */
+export interface Job {
+    id: string;
+    kind: string;
+    status: 'queued' | 'running' | 'succeeded' | 'failed';
+    progress: number;
+    message: string | null;
+    error: string | null;
+    artifact_name: string | null;
+}
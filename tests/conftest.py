@@ -0,0 +1,71 @@
+"""
+Shared fixtures. The tests run against a generated portfolio in a temporary SQLite database, so the
+database, snapshot and job artifact settings are set before anything from backend is imported.
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_tmp_dir = tempfile.mkdtemp(prefix="lpmanagement-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ["ANALYTICS_SNAPSHOT_DIR"] = os.path.join(_tmp_dir, "analytics_snapshots")
+os.environ["JOB_ARTIFACT_DIR"] = os.path.join(_tmp_dir, "artifacts")
+
+# Size of the generated portfolio; small enough to load in a few seconds
+TEST_LPS = 8
+TEST_SEED = 11
+
+@pytest.fixture(scope="session", autouse=True)
+def portfolio():
+    """Create the schema and load a generated portfolio, through the same path as the CSV import"""
+    from backend.db import Base, engine
+    from backend.generate_data import generate
+    from backend.import_csv import load_csv_to_db
+    Base.metadata.create_all(bind=engine)
+    data_dir = os.path.join(_tmp_dir, "data")
+    counts = generate(data_dir, lps=TEST_LPS, seed=TEST_SEED)
+    load_csv_to_db(data_dir)
+    yield counts
+    engine.dispose()
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+@pytest.fixture
+def db():
+    from backend.db import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def client():
+    """A test client without the startup work (IRR workers, warm-up), which the tests don't use"""
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    return TestClient(app)
+
+@pytest.fixture
+def add_rows(db):
+    """
+    Add rows for a test and remove them again afterwards, bumping the data version both times so
+    the in-memory columns and snapshots follow the change
+    """
+    from backend.services.data_version import bump_data_version
+    added = []
+
+    def add(*rows):
+        db.add_all(rows)
+        bump_data_version(db)
+        db.commit()
+        added.extend(rows)
+        return rows
+
+    yield add
+    for row in reversed(added):
+        db.delete(row)
+    if added:
+        bump_data_version(db)
+        db.commit()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from backend.services import analytics_snapshot
+from backend.services.analytics_snapshot import refresh_snapshot
+from backend.services.ledger_engine import LedgerColumns, get_ledger_columns, quarter_ends
+from backend.services.reconciliation import reconcile
+
+@pytest.fixture
+def snapshot(db):
+    return refresh_snapshot(db)
+
+def test_columns_are_views_of_the_snapshot(snapshot):
+    columns = LedgerColumns.from_snapshot(snapshot)
+    assert np.shares_memory(columns.amounts, snapshot.arrays["ledger_amount"])
+    assert np.shares_memory(columns.codes["related_entity"],
+                            snapshot.arrays["ledger_related_entity"])
+    assert not columns.amounts.flags.writeable
+
+    # Changes are made to new arrays, leaving the snapshot as it was
+    amounts = np.array(snapshot.arrays["ledger_amount"])
+    row = columns.rows([0])[0]._replace(amount=-1.0)
+    changed = columns.with_changes([row])
+    assert changed.amounts[0] == -1.0
+    assert np.array_equal(snapshot.arrays["ledger_amount"], amounts, equal_nan=True)
+
+def test_aggregates_give_the_ledger_totals(snapshot):
+    columns = LedgerColumns.from_snapshot(snapshot)
+    quarters = np.unique(snapshot.arrays["aggregate_quarter"])
+    lps = columns.categories["entity"][:3]
+    before_first = (quarters[0].astype("datetime64[M]") - 2).astype("datetime64[D]") - 1
+    # After the last quarter, any date is as of the last quarter
+    for day in list(quarters[::5]) + [quarters[-1], before_first, quarters[-1] + 40]:
+        report_date = str(day)
+        # Exactly the same sums, not just close ones
+        assert snapshot.ledger_totals(report_date) == columns.ledger_totals(report_date)
+        assert snapshot.ledger_totals(report_date, lps) == columns.ledger_totals(report_date, lps)
+
+def test_aggregates_only_cover_quarter_ends(snapshot):
+    quarters = np.unique(snapshot.arrays["aggregate_quarter"])
+    assert snapshot.ledger_totals(str(quarters[1] - 10)) is None
+    assert np.array_equal(quarter_ends(quarters), quarters)
+
+def test_reconcile_from_snapshot_matches_columns(db, monkeypatch, snapshot):
+    from_snapshot = reconcile(db, include_matched=True)
+    monkeypatch.setattr(analytics_snapshot, "ANALYTICS_SNAPSHOT_ENABLED", False)
+    get_ledger_columns(db)
+    assert reconcile(db, include_matched=True) == from_snapshot
@@ -0,0 +1,89 @@
+from backend.models import tbLedger, tbLPLookup
+
+def ledger_entry(**values):
+    entry = {
+        "entry_date": "2021-05-14", "activity_date": "2021-05-14", "effective_date": "2021-05-14",
+        "activity": "Capital Call", "sub_activity": "Test", "amount": 125.0,
+        "entity_from": "Test LP", "entity_to": "Test Fund", "related_entity": "Test LP",
+        "related_fund": "Test Fund"
+    }
+    entry.update(values)
+    return entry
+
+def test_batch_applies_all_operations(client, db):
+    response = client.post("/api/data/ledger/batch", json={"operations": [
+        {"op": "create", "data": ledger_entry()},
+        {"op": "create", "data": ledger_entry(amount=75.0)},
+    ]})
+    assert response.status_code == 200
+    first_id, second_id = [result["key"] for result in response.json()["results"]]
+
+    # Keys can be sent as strings and are converted to the id type
+    response = client.post("/api/data/ledger/batch", json={"operations": [
+        {"op": "update", "key": str(first_id), "data": ledger_entry(amount=99.0)},
+        {"op": "delete", "key": second_id},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["updated"], body["deleted"]) == (0, 1, 1)
+    assert [result["status"] for result in body["results"]] == ["updated", "deleted"]
+    assert db.get(tbLedger, first_id).amount == 99.0
+    assert db.get(tbLedger, second_id) is None
+
+    client.post("/api/data/ledger/batch", json={"operations": [{"op": "delete", "key": first_id}]})
+
+def test_invalid_batch_is_not_applied(client, db):
+    count = db.query(tbLedger).count()
+    response = client.post("/api/data/ledger/batch", json={"operations": [
+        {"op": "create", "data": ledger_entry()},
+        {"op": "update", "key": 10 ** 9, "data": ledger_entry()},
+        {"op": "create", "data": ledger_entry(amount="not a number")},
+        {"op": "delete"},
+        {"op": "rename", "key": 1},
+        {"op": "delete", "key": "abc"},
+    ]})
+    assert response.status_code == 400
+    results = response.json()["detail"]["results"]
+    assert [result["status"] for result in results] == ["skipped"] + ["error"] * 5
+    assert results[1]["error"] == "Ledger entry not found"
+    assert results[2]["error"].startswith("amount:")
+    assert results[3]["error"] == "'key' is required to delete"
+    assert results[4]["error"] == "Unknown operation 'rename'"
+    assert results[5]["error"] == "'key' must be of type int"
+    assert db.query(tbLedger).count() == count
+
+def test_batch_rejects_unknown_lp(client, db):
+    response = client.post("/api/data/pcap/batch", json={"operations": [
+        {"op": "create", "data": {"lp_short_name": "No Such LP", "pcap_date": "2021-03-31",
+                                  "field_num": 1, "field": "Capital Calls", "amount": 1.0}},
+    ]})
+    assert response.status_code == 400
+    error = response.json()["detail"]["results"][0]["error"]
+    assert error == "LP with short_name 'No Such LP' does not exist"
+
+def test_failed_batch_is_rolled_back(client, db):
+    first, second = [row.short_name for row in db.query(tbLPLookup).order_by(tbLPLookup.short_name)
+                     .limit(2)]
+    # Renaming an LP to an existing short name only fails in the database, after the create
+    response = client.post("/api/data/lplookup/batch", json={"operations": [
+        {"op": "create", "data": {"short_name": "Rollback LP"}},
+        {"op": "update", "key": first, "data": {"short_name": second}},
+    ]})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Batch violates a database constraint")
+    assert db.get(tbLPLookup, "Rollback LP") is None
+    assert db.get(tbLPLookup, first) is not None
+
+def test_batch_rejects_a_key_used_twice(client, db):
+    row_id = db.query(tbLedger.id).order_by(tbLedger.id).first().id
+    amount = db.get(tbLedger, row_id).amount
+    response = client.post("/api/data/ledger/batch", json={"operations": [
+        {"op": "update", "key": row_id, "data": ledger_entry(amount=1.0)},
+        {"op": "delete", "key": str(row_id)},
+    ]})
+    assert response.status_code == 400
+    results = response.json()["detail"]["results"]
+    assert [result["status"] for result in results] == ["skipped", "error"]
+    assert results[1]["error"] == f"key {row_id} is used by more than one operation"
+    db.expire_all()
+    assert db.get(tbLedger, row_id).amount == amount
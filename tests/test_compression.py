@@ -0,0 +1,41 @@
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+
+from backend.middleware import brotli
+from backend.responses import FastJSONResponse
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    pytest.param("br, gzip", "br",
+                 marks=pytest.mark.skipif(brotli is None, reason="brotli is not installed")),
+    ("gzip", "gzip"),
+])
+def test_large_responses_are_compressed(client, accept_encoding, encoding):
+    params = {"limit": 200}
+    plain = client.get("/api/data/ledger", params=params, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    response = client.get("/api/data/ledger", params=params,
+                          headers={"Accept-Encoding": accept_encoding})
+    assert response.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(plain.content)
+    # The client decodes the body, which matches the uncompressed response
+    assert response.json() == plain.json()
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/api/data/ledger", params={"limit": 1, "fields": "amount"},
+                          headers={"Accept-Encoding": "br, gzip"})
+    assert len(response.content) < 1024
+    assert "content-encoding" not in response.headers
+
+def test_fast_json_response_serializes_dates_numpy_and_nan():
+    response = FastJSONResponse({
+        "date": date(2023, 12, 31), "amount": np.float64(1.5), "values": np.array([1, 2]),
+        "missing": float("nan"), 7: "key"
+    })
+    assert json.loads(response.body) == {
+        "date": "2023-12-31", "amount": 1.5, "values": [1, 2], "missing": None, "7": "key"
+    }
@@ -0,0 +1,75 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.db import Base
+from backend.models import tbDataVersion
+from backend.services.data_version import bump_data_version, get_data_version
+
+def ledger_entry(**values):
+    entry = {
+        "entry_date": "2021-05-14", "activity_date": "2021-05-14", "effective_date": "2021-05-14",
+        "activity": "Capital Call", "sub_activity": "Test", "amount": 125.0,
+        "entity_from": "Test LP", "entity_to": "Test Fund", "related_entity": "Test LP",
+        "related_fund": "Test Fund"
+    }
+    entry.update(values)
+    return entry
+
+def test_list_etag_and_not_modified(client):
+    response = client.get("/api/data/ledger", params={"limit": 5})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    cached = client.get("/api/data/ledger", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+    # Weak and strong forms of the tag both match, and If-None-Match wins over If-Modified-Since
+    strong = etag.removeprefix("W/")
+    headers = {"If-None-Match": f'"other", {strong}'}
+    assert client.get("/api/data/ledger", params={"limit": 5}, headers=headers).status_code == 304
+    headers = {"If-None-Match": '"other"', "If-Modified-Since": response.headers["Last-Modified"]}
+    assert client.get("/api/data/ledger", params={"limit": 5}, headers=headers).status_code == 200
+
+    headers = {"If-Modified-Since": response.headers["Last-Modified"]}
+    assert client.get("/api/data/ledger", params={"limit": 5}, headers=headers).status_code == 304
+
+def test_change_invalidates_etag(client):
+    etag = client.get("/api/data/ledger", params={"limit": 5}).headers["ETag"]
+    created = client.post("/api/data/ledger", json=ledger_entry())
+    assert created.status_code == 200
+    try:
+        response = client.get("/api/data/ledger", params={"limit": 5},
+                              headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+    finally:
+        client.delete(f"/api/data/ledger/{created.json()['id']}")
+
+def test_missing_resources_are_not_found_for_a_current_etag(client):
+    etag = client.get("/api/data/ledger", params={"limit": 1}).headers["ETag"]
+    headers = {"If-None-Match": etag}
+    params = {"report_date": "2023-12-31", "metric": "total_capital_called"}
+    for path in ["/api/data/ledger/999999999", "/api/data/pcap/999999999",
+                 "/api/data/lpfund/999999999", "/api/data/lplookup/No Such LP",
+                 "/api/lp/No Such LP", "/api/lp/No Such LP/transactions"]:
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == 404, path
+
+def test_data_version_row_is_seeded_with_the_table():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[tbDataVersion.__table__])
+    with Session(engine) as db:
+        assert db.get(tbDataVersion, 1).version == 0
+        assert bump_data_version(db) == 1
+        db.commit()
+
+        # A table created without the row gets it on the first bump
+        db.query(tbDataVersion).delete()
+        db.commit()
+        assert bump_data_version(db) == 1
+        assert bump_data_version(db) == 2
+        db.commit()
+        assert get_data_version(db).version == 2
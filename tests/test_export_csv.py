@@ -0,0 +1,36 @@
+import csv
+
+from backend.export_csv import export_db_to_csv, export_table_to_csv, table_exports
+from backend.models import tbLedger, tbPCAP
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+def test_export_writes_every_table(tmp_path, db):
+    export_db_to_csv(str(tmp_path))
+    for table_name, (model, header, _) in table_exports.items():
+        rows = read_csv(tmp_path / f"{table_name}.csv")
+        assert rows[0] == header
+        assert len(rows) - 1 == db.query(model).count()
+
+def test_export_formats_ledger_rows(tmp_path, db):
+    export_table_to_csv("tbLedger", str(tmp_path))
+    rows = read_csv(tmp_path / "tbLedger.csv")
+    first = db.query(tbLedger).order_by(tbLedger.id).first()
+    assert rows[1][:6] == [
+        first.entry_date.strftime("%m/%d/%Y"), first.activity_date.strftime("%m/%d/%Y"),
+        first.effective_date.strftime("%m/%d/%Y"), first.activity, first.sub_activity or "",
+        repr(first.amount),
+    ]
+    # Lines end in \n, not the csv module's default \r\n
+    assert b"\r" not in (tmp_path / "tbLedger.csv").read_bytes()
+
+def test_export_writes_none_as_empty(tmp_path, add_rows, db):
+    add_rows(tbPCAP(lp_short_name="Test Export LP", pcap_date=None, field_num=None,
+                    field="Capital Calls", amount=None))
+    export_table_to_csv("tbPCAP", str(tmp_path))
+    assert ["Test Export LP", "", "", "Capital Calls", ""] in read_csv(tmp_path / "tbPCAP.csv")
+
+def test_export_unknown_table(tmp_path):
+    assert export_table_to_csv("tbNope", str(tmp_path)) is False
@@ -0,0 +1,77 @@
+from datetime import date, timedelta
+
+import pytest
+
+from backend.import_csv import clean_date
+from backend.models import tbLPFund
+from backend.services.fund_phases import PHASE_REINVEST, FundPhases, get_fund_phases
+
+def row_phase(fund, day):
+    """The phase of one fund as the per-fund checks worked it out"""
+    if fund.harvest_start and fund.harvest_start <= day:
+        return "harvest"
+    if fund.reinvest_start and fund.reinvest_start <= day:
+        return "reinvest"
+    return "investment"
+
+def row_reinvest_active(fund, day):
+    return bool(fund.reinvest_start and fund.reinvest_start <= day
+                and (not fund.harvest_start or fund.harvest_start > day))
+
+def phase_dates(funds):
+    """Every fund's start dates and the days before them, where the phases change"""
+    days = {date(2015, 1, 1), date(2030, 1, 1)}
+    for fund in funds:
+        for start in (fund.reinvest_start, fund.harvest_start):
+            if start:
+                days |= {start, start - timedelta(days=1)}
+    return sorted(days)
+
+def test_phases_match_per_fund_checks(db):
+    funds = db.query(tbLPFund).order_by(tbLPFund.id).all()
+    phases = get_fund_phases(db)
+    for day in phase_dates(funds):
+        assert [row["phase"] for row in phases.all_phases(day)] == [
+            row_phase(fund, day) for fund in funds
+        ]
+        for fund in funds:
+            assert phases.is_reinvest_active(fund.lp_short_name, fund.fund_name, day) == (
+                row_reinvest_active(fund, day)
+            )
+        for lp in {fund.lp_short_name for fund in funds}:
+            assert phases.lp_reinvest_active(lp, day) == any(
+                row_reinvest_active(fund, day) for fund in funds if fund.lp_short_name == lp
+            )
+
+def test_unknown_funds_have_no_phase(db):
+    phases = get_fund_phases(db)
+    assert phases.phase("No Such LP", "No Such Fund", date(2022, 1, 1)) is None
+    assert phases.lp_reinvest_active("No Such LP", date(2022, 1, 1)) is False
+
+def test_duplicate_fund_rows_use_the_first():
+    funds = [
+        tbLPFund(lp_short_name="LP", fund_name="Fund", reinvest_start=date(2020, 1, 1)),
+        tbLPFund(lp_short_name="LP", fund_name="Fund", harvest_start=date(2020, 1, 1)),
+    ]
+    assert FundPhases(funds).phase("LP", "Fund", date(2021, 1, 1)) == PHASE_REINVEST
+
+def test_phases_follow_the_data_version(db, add_rows):
+    before = get_fund_phases(db)
+    add_rows(tbLPFund(lp_short_name="Test Phase LP", fund_name="Test Phase Fund",
+                      reinvest_start=date(2021, 1, 1), harvest_start=date(2023, 1, 1)))
+    phases = get_fund_phases(db)
+    assert phases is not before
+    assert phases.phase("Test Phase LP", "Test Phase Fund", date(2022, 6, 30)) == PHASE_REINVEST
+
+def test_phases_endpoint(client, db):
+    response = client.get("/api/funds/phases", params={"date": "2022-06-30"})
+    assert response.status_code == 200
+    assert response.json()["funds"] == get_fund_phases(db).all_phases(date(2022, 6, 30))
+    assert client.get("/api/funds/phases", params={"date": "30/06/2022"}).status_code == 400
+
+@pytest.mark.parametrize("value, expected", [
+    ("06/30/2022", date(2022, 6, 30)), ("2022-06-30", date(2022, 6, 30)), (" NA ", None),
+    ("n/a", None), ("", None), ("-", None), (None, None), ("not a date", None),
+])
+def test_import_clean_date(value, expected):
+    assert clean_date(value) == expected
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+
+from backend.services import irr_calculator, metrics_calculator
+from backend.services.data_version import get_data_version
+from backend.services.irr_calculator import IRR_FALLBACK_RESULT, run_xirr, xirr
+from backend.services.lp_details import lp_details_cache, lp_details_key
+
+CASH_FLOWS = [(date(2020, 1, 1), -1000.0), (date(2021, 1, 1), 300.0),
+              (date(2022, 1, 1), 1000.0)]
+
+@pytest.fixture
+def irr_pool(monkeypatch):
+    monkeypatch.setattr(irr_calculator, "IRR_PROCESS_WORKERS", 1)
+    yield
+    irr_calculator.shutdown_irr_pool()
+
+def test_timed_out_calculation_falls_back_and_the_pool_recovers(irr_pool):
+    # The worker process is still starting, so the calculation can't finish in time
+    assert run_xirr(CASH_FLOWS, timeout=0) is IRR_FALLBACK_RESULT
+    assert run_xirr(CASH_FLOWS, timeout=60) == xirr(CASH_FLOWS)
+
+def test_worker_processes_do_not_connect_to_the_database():
+    # A spawned worker imports irr_calculator to unpickle xirr
+    code = "import sys, backend.services.irr_calculator; print('backend.db' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            check=True)
+    assert result.stdout.strip() == "False"
+
+def test_fallback_details_are_not_cached(client, db, monkeypatch):
+    lp = client.get("/api/lps").json()[0]["short_name"]
+    report_date = "2022-09-30"
+    key = lp_details_key(lp, report_date, get_data_version(db).version, False)
+    monkeypatch.setattr(metrics_calculator, "run_xirr", lambda cash_flows: IRR_FALLBACK_RESULT)
+
+    details = client.get(f"/api/lp/{lp}", params={"report_date": report_date}).json()
+    assert details["irr"] is None
+    assert details["irr_unavailable"] is True
+    assert key not in lp_details_cache
+
+    monkeypatch.undo()
+    details = client.get(f"/api/lp/{lp}", params={"report_date": report_date}).json()
+    assert details["irr_unavailable"] is False
+    assert key in lp_details_cache
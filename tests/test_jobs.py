@@ -0,0 +1,67 @@
+import csv
+import io
+import os
+import threading
+import time
+
+from backend.services.job_manager import JOB_STATUS_RUNNING, get_job, submit_job
+
+def wait_for(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+def test_irr_cash_flows_job(client):
+    response = client.post("/api/jobs/irr-cash-flows")
+    assert response.status_code == 202
+    job = wait_for(client, response.json()["id"])
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+
+    download = client.get(f"/api/jobs/{job['id']}/download")
+    assert download.status_code == 200
+    assert download.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(download.text)))
+    assert len(rows) > 1
+    assert job["id"] in [item["id"] for item in client.get("/api/jobs").json()]
+
+def test_export_table_job(client, db):
+    job = wait_for(client, client.post("/api/jobs/export/lplookup").json()["id"])
+    assert job["status"] == "succeeded"
+    rows = list(csv.DictReader(io.StringIO(client.get(f"/api/jobs/{job['id']}/download").text)))
+    assert len(rows) == client.get("/api/data/lplookup").json()["total"]
+    assert client.post("/api/jobs/export/nope").status_code == 400
+
+def test_download_of_an_unfinished_job_is_a_conflict(client):
+    started, release = threading.Event(), threading.Event()
+
+    def run(job):
+        started.set()
+        release.wait(10)
+        with open(os.path.join(job.directory, "out.csv"), "w") as f:
+            f.write("a\n")
+        return "out.csv"
+
+    job = submit_job("test", run)
+    try:
+        assert started.wait(10)
+        assert get_job(job.id).status == JOB_STATUS_RUNNING
+        response = client.get(f"/api/jobs/{job.id}/download")
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Job is running"
+    finally:
+        release.set()
+    assert wait_for(client, job.id)["status"] == "succeeded"
+
+def test_download_of_an_expired_artifact_is_gone(client):
+    job = wait_for(client, client.post("/api/jobs/export/lplookup").json()["id"])
+    os.remove(get_job(job["id"]).artifact_path)
+    assert client.get(f"/api/jobs/{job['id']}/download").status_code == 410
+
+def test_unknown_job(client):
+    assert client.get("/api/jobs/no-such-job").status_code == 404
+    assert client.get("/api/jobs/no-such-job/download").status_code == 404
+    assert client.get("/api/export-irr-cash-flows").status_code == 404
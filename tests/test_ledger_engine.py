@@ -0,0 +1,139 @@
+from datetime import date
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from backend.models import tbLedger
+from backend.services.ledger_engine import (
+    LEDGER_METRICS, ROW_COLUMNS, LedgerColumns, get_ledger_columns, load_ledger_columns
+)
+
+REPORT_DATES = ["2020-06-30", "2022-12-31", "2024-12-31"]
+
+def load_rows(db):
+    columns = [getattr(tbLedger, column) for column in ROW_COLUMNS]
+    return db.execute(select(*columns).order_by(tbLedger.id)).all()
+
+def row_sums(rows, report_date):
+    """The ledger totals as a row-by-row Python sum, attributing rows as the fund metrics do"""
+    report_date = date.fromisoformat(report_date)
+    totals = {}
+
+    def add(lp, fund, metrics, amount):
+        sums = totals.setdefault((lp, fund), {metric: 0 for metric in LEDGER_METRICS})
+        for metric in metrics:
+            sums[metric] += amount
+
+    for row in rows:
+        if row.effective_date is None or row.effective_date > report_date:
+            continue
+        is_call = row.activity == "Capital Call"
+        is_distribution = row.activity == "LP Distribution"
+        metrics = [
+            metric for metric, selected in [
+                ("commitment", row.sub_activity == "New Commitment"),
+                ("capital_called", is_call),
+                ("capital_distribution",
+                 is_distribution and row.sub_activity == "Capital Distribution"),
+                ("income_distribution",
+                 is_distribution and row.sub_activity == "Income Distribution"),
+                ("distribution", is_distribution),
+            ] if selected
+        ]
+        if row.related_entity is not None:
+            add(row.related_entity, row.related_fund, metrics, row.amount)
+        if is_call and row.entity_from is not None and row.entity_from != row.related_entity:
+            add(row.entity_from, row.related_fund, ["capital_called"], row.amount)
+    return totals
+
+def ledger_row(id, **values):
+    row = {
+        "id": id, "effective_date": date(2021, 5, 14), "activity": "Capital Call",
+        "sub_activity": None, "amount": 250.0, "entity_from": "Test LP", "entity_to": "Test Fund",
+        "related_entity": "Test LP", "related_fund": "Test Fund"
+    }
+    row.update(values)
+    return SimpleNamespace(**row)
+
+def test_ledger_totals_match_row_sums(db):
+    rows = load_rows(db)
+    columns = LedgerColumns.from_rows(rows)
+    for report_date in REPORT_DATES:
+        assert columns.ledger_totals(report_date) == row_sums(rows, report_date)
+
+def test_ledger_totals_for_some_lps(db):
+    rows = load_rows(db)
+    columns = LedgerColumns.from_rows(rows)
+    lps = sorted({row.related_entity for row in rows if row.related_entity})[:3]
+    expected = {key: sums for key, sums in row_sums(rows, "2023-06-30").items() if key[0] in lps}
+    assert columns.ledger_totals("2023-06-30", lps + ["Unknown LP"]) == expected
+
+def test_capital_call_counts_for_entity_from(db):
+    rows = [
+        ledger_row(1, entity_from="Other LP", amount=100.0),
+        ledger_row(2, activity="LP Distribution", sub_activity="Capital Distribution",
+                   entity_from="Test Fund", entity_to="Test LP", amount=40.0),
+        ledger_row(3, effective_date=date(2025, 1, 1), amount=1000.0),
+    ]
+    totals = LedgerColumns.from_rows(rows).ledger_totals("2024-12-31")
+    assert totals[("Test LP", "Test Fund")] == {
+        "commitment": 0, "capital_called": 100.0, "capital_distribution": 40.0,
+        "income_distribution": 0, "distribution": 40.0
+    }
+    assert totals[("Other LP", "Test Fund")] == {
+        "commitment": 0, "capital_called": 100.0, "capital_distribution": 0,
+        "income_distribution": 0, "distribution": 0
+    }
+
+def test_with_changes_matches_rebuilt_columns(db):
+    rows = load_rows(db)
+    columns = LedgerColumns.from_rows(rows, version=1)
+    updated = ledger_row(rows[5].id, related_entity=rows[5].related_entity,
+                         related_fund="New Fund", sub_activity="New Sub Activity")
+    deleted_ids = [rows[0].id, rows[10].id]
+    created = [ledger_row(rows[-1].id + 1), ledger_row(rows[-1].id + 2, entity_from=None)]
+
+    changed = columns.with_changes([updated] + created, deleted_ids, version=2)
+    expected_rows = [
+        updated if row.id == updated.id else row for row in rows if row.id not in deleted_ids
+    ] + created
+    expected = LedgerColumns.from_rows(expected_rows)
+
+    assert changed.version == 2
+    assert changed.ids.tolist() == expected.ids.tolist()
+    for report_date in REPORT_DATES:
+        assert changed.ledger_totals(report_date) == row_sums(expected_rows, report_date)
+    # The original columns are left as they were
+    assert len(columns) == len(rows)
+    assert columns.ledger_totals("2024-12-31") == row_sums(rows, "2024-12-31")
+
+def test_with_changes_keeps_id_order():
+    columns = LedgerColumns.from_rows([ledger_row(2), ledger_row(5), ledger_row(9)])
+    changed = columns.with_changes([ledger_row(4, amount=10.0), ledger_row(1, amount=20.0)], [5])
+    assert changed.ids.tolist() == [1, 2, 4, 9]
+    assert changed.amounts.tolist() == [20.0, 250.0, 10.0, 250.0]
+
+def test_columns_follow_committed_changes(client, db):
+    get_ledger_columns(db)
+    entry = {
+        "entry_date": "2021-05-14", "activity_date": "2021-05-14", "effective_date": "2021-05-14",
+        "activity": "Capital Call", "sub_activity": "Test", "amount": 125.0,
+        "entity_from": "Test LP", "entity_to": "Test Fund", "related_entity": "Test LP",
+        "related_fund": "Test Fund"
+    }
+    created = client.post("/api/data/ledger", json=entry).json()
+    client.put(f"/api/data/ledger/{created['id']}", json={**entry, "amount": 99.0})
+    batch = client.post("/api/data/ledger/batch", json={"operations": [
+        {"op": "create", "data": {**entry, "related_fund": "Other Fund"}},
+    ]}).json()
+
+    # The in-memory columns were moved forward with each change rather than loaded again
+    columns = get_ledger_columns(db)
+    reloaded = load_ledger_columns(db, columns.version)
+    assert columns.ids.tolist() == reloaded.ids.tolist()
+    assert columns.ledger_totals("2024-12-31") == reloaded.ledger_totals("2024-12-31")
+    assert columns.ledger_totals("2024-12-31")[("Test LP", "Test Fund")]["capital_called"] == 99.0
+
+    client.delete(f"/api/data/ledger/{created['id']}")
+    client.delete(f"/api/data/ledger/{batch['results'][0]['key']}")
+    assert ("Test LP", "Test Fund") not in get_ledger_columns(db).ledger_totals("2024-12-31")
@@ -0,0 +1,89 @@
+import pytest
+
+from backend.routes.lp_routes import MAX_BATCH_COMBINATIONS
+
+REPORT_DATES = ["2022-06-30", "2023-12-31"]
+
+@pytest.fixture
+def lps(client):
+    return sorted(lp["short_name"] for lp in client.get("/api/lps").json())
+
+def test_batch_matches_single_requests(client, lps):
+    response = client.post("/api/lps/details", json={
+        "short_names": lps[:3] + ["No Such LP", lps[0]], "report_dates": REPORT_DATES
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["not_found"] == ["No Such LP"]
+    assert sorted(body["results"]) == lps[:3]
+    for short_name in lps[:3]:
+        for report_date in REPORT_DATES:
+            single = client.get(f"/api/lp/{short_name}", params={"report_date": report_date})
+            assert body["results"][short_name][report_date] == single.json()
+
+def test_batch_includes_transactions_on_request(client, lps):
+    batch = {"short_names": lps[:1], "report_dates": REPORT_DATES[:1], "include": ["transactions"]}
+    details = client.post("/api/lps/details", json=batch).json()["results"][lps[0]][REPORT_DATES[0]]
+    single = client.get(f"/api/lp/{lps[0]}",
+                        params={"report_date": REPORT_DATES[0], "include": "transactions"})
+    assert details == single.json()
+    assert "transactions" in details["totals"]["total_capital_called"]
+
+@pytest.mark.parametrize("batch", [
+    {"short_names": [], "report_dates": REPORT_DATES},
+    {"short_names": ["Any LP"], "report_dates": []},
+    {"short_names": ["Any LP"], "report_dates": ["31/12/2023"]},
+    {"short_names": [f"LP {i}" for i in range(MAX_BATCH_COMBINATIONS + 1)],
+     "report_dates": REPORT_DATES[:1]},
+])
+def test_invalid_batches(client, batch):
+    assert client.post("/api/lps/details", json=batch).status_code == 400
+
+def transaction_key(transaction):
+    return (transaction["effective_date"], transaction["activity"], transaction["amount"],
+            transaction["related_fund"])
+
+def drill_down(client, short_name, metric, fund=None):
+    params = {"report_date": REPORT_DATES[1], "metric": metric, "limit": 5}
+    if fund:
+        params["fund"] = fund
+    transactions = []
+    while True:
+        page = client.get(f"/api/lp/{short_name}/transactions", params=params)
+        assert page.status_code == 200
+        page = page.json()
+        transactions += page["items"]
+        if page["next_cursor"] is None:
+            return transactions
+        params["cursor"] = page["next_cursor"]
+
+def test_details_return_metric_values_only(client, lps):
+    details = client.get(f"/api/lp/{lps[0]}", params={"report_date": REPORT_DATES[1]}).json()
+    for metrics in [details["totals"]] + [fund["metrics"] for fund in details["funds"]]:
+        assert all("transactions" not in metric for metric in metrics.values())
+
+def test_drill_down_pages_match_embedded_transactions(client, lps):
+    details = client.get(f"/api/lp/{lps[0]}",
+                         params={"report_date": REPORT_DATES[1], "include": "transactions"}).json()
+    fund = details["funds"][0]
+    for metric in ["total_commitment", "total_capital_called", "total_distribution"]:
+        embedded = details["totals"][metric]["transactions"]
+        paged = drill_down(client, lps[0], metric)
+        assert sorted(map(transaction_key, paged)) == sorted(map(transaction_key, embedded))
+        assert [item["effective_date"] for item in paged] == sorted(
+            item["effective_date"] for item in paged
+        )
+        assert sum(item["amount"] for item in paged) == pytest.approx(
+            details["totals"][metric]["value"]
+        )
+
+        embedded = fund["metrics"][metric]["transactions"]
+        paged = drill_down(client, lps[0], metric, fund["fund_name"])
+        assert sorted(map(transaction_key, paged)) == sorted(map(transaction_key, embedded))
+
+def test_drill_down_rejects_invalid_parameters(client, lps):
+    path = f"/api/lp/{lps[0]}/transactions"
+    assert client.get(path, params={"report_date": REPORT_DATES[1],
+                                    "metric": "nav"}).status_code == 400
+    assert client.get(path, params={"report_date": "2023-13-01",
+                                    "metric": "total_commitment"}).status_code == 400
@@ -0,0 +1,42 @@
+import pytest
+
+from backend.services import analytics_snapshot, ledger_engine
+from backend.services.analytics_snapshot import current_snapshot, refresh_snapshot
+from backend.services.metrics_calculator import (
+    dataset_fund_metrics, dataset_lp_totals, load_metrics_dataset, parse_report_date
+)
+
+# Quarter ends are read from the snapshot aggregates, other dates from the ledger columns
+REPORT_DATES = ["2020-12-31", "2022-05-15", "2023-06-30", "2024-12-31"]
+
+def metrics(dataset, report_date):
+    """Every fund's metrics and every LP's totals, with their transactions"""
+    return {
+        lp: {
+            "funds": [
+                dataset_fund_metrics(dataset, lp, fund.fund_name, report_date)
+                for fund in dataset.funds.get(lp, [])
+            ],
+            "totals": dataset_lp_totals(dataset, lp, report_date),
+            "pcap_report_date": dataset.pcap_report_date(parse_report_date(report_date)),
+        }
+        for lp in sorted(dataset.lps)
+    }
+
+@pytest.mark.parametrize("lp_count", [None, 3])
+def test_snapshot_matches_sql(db, monkeypatch, lp_count):
+    assert refresh_snapshot(db) is current_snapshot(db) is not None
+    lps = None
+    if lp_count is not None:
+        lps = sorted(load_metrics_dataset(db).lps)[:lp_count]
+    from_snapshot = load_metrics_dataset(db, lps, REPORT_DATES)
+
+    # Read from the tables instead, with newly loaded ledger columns
+    monkeypatch.setattr(analytics_snapshot, "ANALYTICS_SNAPSHOT_ENABLED", False)
+    monkeypatch.setattr(ledger_engine, "_columns", None)
+    from_sql = load_metrics_dataset(db, lps, REPORT_DATES)
+
+    assert sorted(from_snapshot.lps) == sorted(from_sql.lps)
+    assert from_snapshot.pcap_dates == from_sql.pcap_dates
+    for report_date in REPORT_DATES:
+        assert metrics(from_snapshot, report_date) == metrics(from_sql, report_date)
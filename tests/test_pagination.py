@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from backend.models import tbLedger, tbLPFund
+from backend.services.pagination import decode_cursor, encode_cursor, paginate
+
+def all_pages(db, model, sort, limit=7, fields=None):
+    items = []
+    cursor = None
+    while True:
+        page = paginate(db, model, sort=sort, limit=limit, cursor=cursor, fields=fields)
+        items += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items, page["total"]
+
+def test_cursor_round_trip():
+    cursor = encode_cursor([date(2023, 3, 31), 42])
+    assert decode_cursor(cursor, [tbLedger.effective_date, tbLedger.id]) == [date(2023, 3, 31), 42]
+    cursor = encode_cursor([None, 7])
+    assert decode_cursor(cursor, [tbLedger.sub_activity, tbLedger.id]) == [None, 7]
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor([1, 2, 3]),
+                                    encode_cursor(["x", 1])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, [tbLedger.effective_date, tbLedger.id])
+    assert error.value.status_code == 400
+
+@pytest.mark.parametrize("sort", ["id", "-id", "amount", "-amount", "effective_date",
+                                  "-effective_date"])
+def test_keyset_pages_follow_the_sort_order(db, sort):
+    items, total = all_pages(db, tbLedger, sort)
+    rows = db.query(tbLedger).all()
+    column = sort.lstrip("-")
+    expected = sorted(rows, key=lambda row: (getattr(row, column), row.id),
+                      reverse=sort.startswith("-"))
+    assert total == len(rows)
+    assert [item["id"] for item in items] == [row.id for row in expected]
+
+@pytest.mark.parametrize("sort", ["term_end", "-term_end"])
+def test_keyset_pages_order_nulls_first(db, sort):
+    # Null sort values come first ascending and last descending, and pages don't skip them
+    fund = db.query(tbLPFund).first()
+    term_end, fund.term_end = fund.term_end, None
+    db.commit()
+    try:
+        items, total = all_pages(db, tbLPFund, sort, limit=3, fields="term_end")
+        rows = db.query(tbLPFund).all()
+        expected = sorted(rows, key=lambda row: (row.term_end is not None, row.term_end or date.min,
+                                                 row.id),
+                          reverse=sort.startswith("-"))
+        assert [item["id"] for item in items] == [row.id for row in expected]
+        assert set(items[0]) == {"id", "term_end"}
+    finally:
+        fund.term_end = term_end
+        db.commit()
+
+def test_page_limits(db):
+    page = paginate(db, tbLedger, limit=5, include_total=False)
+    assert len(page["items"]) == 5
+    assert page["total"] is None
+    with pytest.raises(HTTPException):
+        paginate(db, tbLedger, limit=0)
+    with pytest.raises(HTTPException):
+        paginate(db, tbLedger, sort="no_such_column")
+
+def test_list_endpoint_filters_and_pages(client, db):
+    lp = db.query(tbLedger.related_entity).filter(tbLedger.related_entity.isnot(None)).first()[0]
+    params = {"lp": lp, "date_from": "2021-01-01", "sort": "-amount", "fields": "amount",
+              "limit": 4}
+    items = []
+    while True:
+        page = client.get("/api/data/ledger", params=params).json()
+        items += page["items"]
+        if page["next_cursor"] is None:
+            break
+        params["cursor"] = page["next_cursor"]
+    rows = db.query(tbLedger).filter(tbLedger.related_entity == lp,
+                                     tbLedger.effective_date >= date(2021, 1, 1)).all()
+    expected = sorted(rows, key=lambda row: (row.amount, row.id), reverse=True)
+    assert page["total"] == len(rows)
+    assert items == [{"id": row.id, "amount": row.amount} for row in expected]
+
+def test_list_endpoint_rejects_unknown_columns(client):
+    assert client.get("/api/data/pcap", params={"sort": "nope"}).status_code == 400
+    assert client.get("/api/data/pcap", params={"fields": "id,nope"}).status_code == 400
@@ -0,0 +1,97 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from backend.models import tbLedger, tbLPFund, tbLPLookup, tbPCAP
+from backend.services.irr_calculator import xirr
+from backend.services.metrics_calculator import get_pcap_report_date
+from backend.services.performance import performance_report, solve_xirr
+
+LP = "Test Performance LP"
+FUND_A = "Test Performance Fund A"
+FUND_B = "Test Performance Fund B"
+GROUP = "Test Performance Group"
+REPORT_DATE = "2024-12-31"
+
+def years_since_first(dates):
+    return np.array([(d - dates[0]).days / 365 for d in dates])
+
+def ledger(effective_date, activity, sub_activity, amount, fund):
+    entity_from, entity_to = (LP, fund) if activity == "Capital Call" else (fund, LP)
+    return tbLedger(entry_date=effective_date, activity_date=effective_date,
+                    effective_date=effective_date, activity=activity, sub_activity=sub_activity,
+                    amount=amount, entity_from=entity_from, entity_to=entity_to,
+                    related_entity=LP, related_fund=fund)
+
+@pytest.fixture
+def test_lp(db, add_rows):
+    """
+    An LP in two funds of one group, with 700 left invested in the first and 500 in the second, and
+    an ending balance of 1800 on the report's PCAP date
+    """
+    pcap_date = get_pcap_report_date(db, REPORT_DATE)
+    add_rows(
+        tbLPLookup(short_name=LP, active="Y"),
+        tbLPFund(lp_short_name=LP, fund_name=FUND_A, fund_group=GROUP),
+        tbLPFund(lp_short_name=LP, fund_name=FUND_B, fund_group=GROUP),
+        ledger(date(2021, 1, 4), "Capital Call", None, 1000.0, FUND_A),
+        ledger(date(2022, 1, 3), "LP Distribution", "Capital Distribution", 300.0, FUND_A),
+        ledger(date(2021, 7, 1), "Capital Call", None, 500.0, FUND_B),
+        tbPCAP(lp_short_name=LP, pcap_date=pcap_date, field_num=0,
+               field="Ending Capital Balance", amount=1800.0),
+    )
+    return pcap_date
+
+def test_solve_xirr_known_rates():
+    # A 10% return over a year, a loss of half over two years, and series without a rate
+    series = np.array([0, 0, 1, 1, 2, 2, 3])
+    years = np.array([0.0, 1.0, 0.0, 2.0, 0.0, 1.0, 0.0])
+    amounts = np.array([-1000.0, 1100.0, -1000.0, 500.0, -1000.0, -200.0, 100.0])
+    rates = solve_xirr(series, years, amounts, 4)
+    assert rates[0] == pytest.approx(0.10)
+    assert rates[1] == pytest.approx(0.5 ** 0.5 - 1)
+    assert np.isnan(rates[2]) and np.isnan(rates[3])
+
+def test_solve_xirr_matches_xirr():
+    dates = [date(2020, 1, 15), date(2020, 7, 1), date(2021, 3, 31), date(2022, 12, 31)]
+    amounts = [-500000.0, -250000.0, 120000.0, 810000.0]
+    rate = solve_xirr(np.zeros(4, dtype=np.int64), years_since_first(dates), np.array(amounts), 1)
+    expected, _, _ = xirr(list(zip(dates, amounts)))
+    assert rate[0] == pytest.approx(expected, abs=1e-6)
+
+def test_performance_report_multiples(db):
+    report = performance_report(db, REPORT_DATE)
+    assert report["lp_funds"]
+    for row in report["lp_funds"] + report["funds"] + report["fund_groups"]:
+        if row["paid_in"] > 0:
+            assert row["dpi"] == pytest.approx(row["distributed"] / row["paid_in"])
+            assert row["tvpi"] == pytest.approx(row["dpi"] + row["rvpi"])
+
+def test_performance_report_splits_the_ending_balance(db, test_lp):
+    report = performance_report(db, REPORT_DATE)
+    lp_funds = {row["fund_name"]: row for row in report["lp_funds"] if row["lp_short_name"] == LP}
+    assert {fund: (row["paid_in"], row["distributed"], row["nav"], row["cash_flows"])
+            for fund, row in lp_funds.items()} == {
+        FUND_A: (1000.0, 300.0, 1050.0, 3),
+        FUND_B: (500.0, 0.0, 750.0, 2),
+    }
+    flows_a = [(date(2021, 1, 4), -1000.0), (date(2022, 1, 3), 300.0), (test_lp, 1050.0)]
+    flows_b = [(date(2021, 7, 1), -500.0), (test_lp, 750.0)]
+    assert lp_funds[FUND_A]["irr"] == pytest.approx(xirr(flows_a)[0], abs=1e-6)
+    assert lp_funds[FUND_B]["irr"] == pytest.approx(xirr(flows_b)[0], abs=1e-6)
+
+    # The only LP in either fund, so the funds match its LP funds and the group pools them
+    funds = {row["fund_name"]: row for row in report["funds"]}
+    assert funds[FUND_A]["irr"] == lp_funds[FUND_A]["irr"]
+    group = next(row for row in report["fund_groups"] if row["fund_group"] == GROUP)
+    assert (group["paid_in"], group["distributed"], group["nav"]) == (1500.0, 300.0, 1800.0)
+    assert group["tvpi"] == pytest.approx(2100.0 / 1500.0)
+    pooled = sorted(flows_a + flows_b[:1]) + [(test_lp, 750.0)]
+    assert group["irr"] == pytest.approx(xirr(pooled)[0], abs=1e-6)
+
+def test_performance_endpoint(client, db):
+    response = client.get("/api/performance", params={"report_date": REPORT_DATE})
+    assert response.status_code == 200
+    assert response.json() == performance_report(db, REPORT_DATE)
+    assert client.get("/api/performance", params={"report_date": "Q4 2024"}).status_code == 400
@@ -0,0 +1,43 @@
+import os
+import time
+
+import pytest
+
+from backend.services import profiling
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+def profiles(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".pstats"))
+
+def test_requests_with_the_token_are_profiled(client, profile_dir):
+    lp = client.get("/api/lps").json()[0]["short_name"]
+    params = {"report_date": "2023-12-31"}
+    response = client.get(f"/api/lp/{lp}", params=params, headers={"X-Profile": "wrong"})
+    assert "X-Profile-Files" not in response.headers
+    assert profiles(profile_dir) == []
+
+    response = client.get(f"/api/lp/{lp}", params=params, headers={"X-Profile": "secret"})
+    files = response.headers["X-Profile-Files"].split(",")
+    assert files == profiles(profile_dir)
+    assert "_lp_details_" in files[0]
+
+def test_jobs_submitted_with_the_token_are_profiled(client, profile_dir):
+    job = client.post("/api/jobs/export/lplookup", headers={"X-Profile": "secret"}).json()
+    deadline = time.monotonic() + 30
+    while client.get(f"/api/jobs/{job['id']}").json()["status"] != "succeeded":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    files = profiles(profile_dir)
+    assert len(files) == 1
+    assert "_export_" in files[0]
+
+    # Without the header the job runs unprofiled
+    job = client.post("/api/jobs/export/lplookup").json()
+    while client.get(f"/api/jobs/{job['id']}").json()["status"] != "succeeded":
+        time.sleep(0.05)
+    assert profiles(profile_dir) == files
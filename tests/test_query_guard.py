@@ -0,0 +1,43 @@
+import pytest
+
+from backend.models import tbLedger
+from backend.query_guard import FULL_SCAN_CHECKS, guard_context, measure_checks
+from backend.services import analytics_snapshot, irr_calculator
+from backend.services.data_version import bump_data_version
+
+@pytest.fixture(scope="module")
+def report():
+    from fastapi.testclient import TestClient
+    from backend.db import SessionLocal, engine
+    from backend.main import app
+
+    # As in python -m backend.query_guard: budget the SQL read paths rather than the snapshot,
+    # and solve IRRs inline
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setattr(analytics_snapshot, "ANALYTICS_SNAPSHOT_ENABLED", False)
+    monkeypatch.setattr(irr_calculator, "IRR_PROCESS_WORKERS", 0)
+    db = SessionLocal()
+    try:
+        yield measure_checks(guard_context(TestClient(app), db), engine)
+    finally:
+        monkeypatch.undo()
+        # Remove the ledger entries the write checks created
+        db.query(tbLedger).filter(tbLedger.sub_activity == "Query Guard").delete()
+        bump_data_version(db)
+        db.commit()
+        db.close()
+
+def test_query_budgets(report):
+    over_budget = {
+        name: result["shapes"] for name, result in report["checks"].items()
+        if any(counts["queries"] > counts["budget"] for counts in result["shapes"].values())
+    }
+    assert over_budget == {}
+
+def test_no_full_table_scans(report):
+    full_scans = {
+        statement[:120]: plan["checks"] for statement, plan in report["plans"].items()
+        if plan["full_scan"] and not set(plan["checks"]) <= FULL_SCAN_CHECKS
+    }
+    assert full_scans == {}
+    assert all(result["passed"] for result in report["checks"].values())
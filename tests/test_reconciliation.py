@@ -0,0 +1,118 @@
+from datetime import date
+
+import pytest
+
+from backend.models import tbLedger, tbLPFund, tbLPLookup, tbPCAP
+from backend.services.pcap_validation import validate_pcap
+from backend.services.reconciliation import reconcile
+
+LP = "Test Reconcile LP"
+FUND = "Test Reconcile Fund"
+
+def ledger(effective_date, activity, sub_activity, amount, entity_from=LP, fund=FUND):
+    return tbLedger(entry_date=effective_date, activity_date=effective_date,
+                    effective_date=effective_date, activity=activity, sub_activity=sub_activity,
+                    amount=amount, entity_from=entity_from, entity_to=fund, related_entity=LP,
+                    related_fund=fund)
+
+def pcap(pcap_date, field, amount):
+    return tbPCAP(lp_short_name=LP, pcap_date=pcap_date, field_num=0, field=field, amount=amount)
+
+@pytest.fixture
+def test_lp(add_rows):
+    """
+    An LP whose ledger and PCAP agree on the Q1 2021 capital call, disagree on its distribution,
+    and have a Q2 call the PCAP doesn't report. Its statements don't chain from Q1 to Q2 and skip
+    Q3.
+    """
+    q1, q2, q4 = date(2021, 3, 31), date(2021, 6, 30), date(2021, 12, 31)
+    add_rows(
+        tbLPLookup(short_name=LP, active="Y"),
+        tbLPFund(lp_short_name=LP, fund_name=FUND),
+        ledger(date(2021, 2, 15), "Capital Call", None, 1000.0),
+        ledger(date(2021, 3, 20), "LP Distribution", "Capital Distribution", 500.0, FUND),
+        ledger(date(2021, 5, 10), "Capital Call", None, 300.0),
+        pcap(q1, "Beginning Capital Balance", 0.0),
+        pcap(q1, "Capital Calls", 1000.0),
+        pcap(q1, "Distributions (Principal)", -480.0),
+        pcap(q1, "Ending Capital Balance", 520.0),
+        pcap(q2, "Beginning Capital Balance", 600.0),
+        pcap(q2, "Ending Capital Balance", 600.0),
+        pcap(q4, "Beginning Capital Balance", 600.0),
+        pcap(q4, "Ending Capital Balance", 600.0),
+    )
+    return LP
+
+def test_reconcile(db, test_lp):
+    report = reconcile(db, [test_lp], tolerance=1.0, rounding=0.5, include_matched=True)
+    rows = [(row["quarter"], row["check"], row["ledger"], row["pcap"], row["difference"],
+             row["allowed_difference"], row["status"]) for row in report["discrepancies"]]
+    assert rows == [
+        ("2021-03-31", "capital_called", 1000.0, 1000.0, 0.0, 1.5, "matched"),
+        ("2021-03-31", "capital_distribution", 500.0, 480.0, 20.0, 1.5, "mismatch"),
+        ("2021-03-31", "distribution", 500.0, 480.0, 20.0, 1.5, "mismatch"),
+        ("2021-06-30", "capital_called", 300.0, None, 300.0, 1.0, "missing_pcap"),
+    ]
+    summary = report["summary"]
+    assert (summary["lps"], summary["lp_quarters"], summary["discrepancies"]) == (1, 2, 3)
+    assert summary["by_check"]["distribution"] == {"matched": 0, "mismatch": 1, "missing_pcap": 0}
+
+def test_reconcile_tolerance(db, test_lp):
+    report = reconcile(db, [test_lp], tolerance=25.0, rounding=0.0)
+    assert [(row["check"], row["status"]) for row in report["discrepancies"]] == [
+        ("capital_called", "missing_pcap")
+    ]
+    assert report["summary"]["matched"] == 3
+
+def test_reconcile_allows_rounding_per_fund(db, add_rows, test_lp):
+    # The PCAP rounds each fund's call, so two funds' calls may be off by a rounding each
+    add_rows(ledger(date(2021, 1, 5), "Capital Call", None, 200.0, fund="Test Reconcile Fund 2"),
+             pcap(date(2021, 3, 31), "Capital Calls", 201.4))
+    report = reconcile(db, [test_lp], tolerance=1.0, rounding=0.5, include_matched=True)
+    called = report["discrepancies"][0]
+    assert (called["check"], called["ledger"], called["pcap"]) == ("capital_called", 1200.0, 1201.4)
+    assert (called["allowed_difference"], called["status"]) == (2.0, "matched")
+    report = reconcile(db, [test_lp], tolerance=1.0, rounding=0.0)
+    assert report["discrepancies"][0]["check"] == "capital_called"
+
+def test_reconcile_counts_calls_for_the_paying_lp(db, add_rows, test_lp):
+    other = "Test Reconcile Payer"
+    add_rows(tbLPLookup(short_name=other, active="Y"),
+             ledger(date(2021, 2, 20), "Capital Call", None, 75.0, entity_from=other))
+    rows = reconcile(db, [other])["discrepancies"]
+    assert [(row["quarter"], row["check"], row["ledger"], row["status"]) for row in rows] == [
+        ("2021-03-31", "capital_called", 75.0, "missing_pcap")
+    ]
+
+def test_reconciliation_endpoint(client, db, test_lp):
+    response = client.get("/api/reconciliation", params={"lp": test_lp, "tolerance": 25.0})
+    assert response.status_code == 200
+    assert response.json() == reconcile(db, [test_lp], tolerance=25.0)
+
+def test_validate_pcap(db, test_lp):
+    # Skipped statements are found against the PCAP dates of every LP, so check them all
+    report = validate_pcap(db, tolerance=5.0)
+    breaks = [(row["pcap_date"], row["check"], row["expected"], row["actual"], row["difference"])
+              for row in report["breaks"] if row["lp_short_name"] == test_lp]
+    assert breaks == [
+        ("2021-06-30", "continuity", 520.0, 600.0, 80.0),
+        ("2021-12-31", "missing_statement", None, None, None),
+    ]
+    missing = [row for row in report["breaks"]
+               if row["lp_short_name"] == test_lp and row["check"] == "missing_statement"]
+    assert missing[0]["detail"] == "previous statement 2021-06-30, 1 PCAP date(s) skipped"
+
+def test_validate_pcap_roll_forward(db, add_rows, test_lp):
+    add_rows(pcap(date(2021, 3, 31), "Capital Calls", 50.0),
+             pcap(date(2021, 12, 31), "Beginning Capital Balance", 0.0))
+    report = validate_pcap(db, [test_lp])
+    checks = {(row["pcap_date"], row["check"]): row for row in report["breaks"]}
+    roll_forward = checks[("2021-03-31", "roll_forward")]
+    assert (roll_forward["expected"], roll_forward["actual"]) == (570.0, 520.0)
+    assert checks[("2021-12-31", "duplicate_field")]["detail"] == "Beginning Capital Balance x2"
+
+def test_pcap_rollforward_endpoint(client, db, test_lp):
+    response = client.get("/api/reconciliation/pcap-rollforward",
+                          params={"lp": test_lp, "tolerance": 5.0})
+    assert response.status_code == 200
+    assert response.json() == validate_pcap(db, [test_lp], tolerance=5.0)
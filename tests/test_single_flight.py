@@ -0,0 +1,77 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.routes import lp_routes
+from backend.services.lp_details import lp_details_flight
+from backend.services.single_flight import SingleFlight
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(10)
+        return {"value": 1}
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(flight.do, "key", compute) for _ in range(4)]
+        wait_until(lambda: flight.stats()["hits"] == 3)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"leaders": 1, "hits": 3, "in_flight": 0}
+    # Nothing is kept once the leader finishes
+    assert flight.do("key", lambda: {"value": 2}) == {"value": 2}
+
+def test_followers_get_the_leaders_error():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(10)
+        raise ValueError("failed")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(flight.do, "key", fail) for _ in range(2)]
+        wait_until(lambda: flight.stats()["hits"] == 1)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+    assert flight.stats()["in_flight"] == 0
+
+def test_identical_lp_details_requests_are_coalesced(client, monkeypatch):
+    lp = client.get("/api/lps").json()[0]["short_name"]
+    load_metrics_dataset = lp_routes.load_metrics_dataset
+    hits = lp_details_flight.stats()["hits"]
+    loads = []
+
+    def load_after_followers_arrive(*args, **kwargs):
+        loads.append(1)
+        wait_until(lambda: lp_details_flight.stats()["hits"] == hits + 3)
+        return load_metrics_dataset(*args, **kwargs)
+
+    monkeypatch.setattr(lp_routes, "load_metrics_dataset", load_after_followers_arrive)
+    params = {"report_date": "2021-09-30"}
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(executor.map(lambda _: client.get(f"/api/lp/{lp}", params=params),
+                                      range(4)))
+
+    assert len(loads) == 1
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json() == responses[0].json() for response in responses)
+    stats = client.get("/api/lps/coalescing").json()
+    assert stats["hits"] == hits + 3
+    assert stats["in_flight"] == 0
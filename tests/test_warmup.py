@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+from backend.models import tbLPLookup
+from backend.services import warmup
+from backend.services.data_version import get_data_version
+from backend.services.lp_details import lp_details_cache, lp_details_key
+
+@pytest.fixture
+def warmup_pool(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(warmup, "_executor", executor)
+    yield
+    executor.shutdown()
+
+def test_report_dates_are_the_latest_date_of_recent_quarters():
+    pcap_dates = [date(2023, 3, 31), date(2023, 6, 30), date(2023, 5, 31), date(2023, 12, 31),
+                  date(2022, 12, 31)]
+    assert warmup.warmup_report_dates(pcap_dates, quarters=2, include_today=False) == [
+        "2023-12-31", "2023-06-30", "2023-03-31"
+    ]
+    today = date.today().strftime('%Y-%m-%d')
+    assert warmup.warmup_report_dates(pcap_dates, quarters=0) == [today, "2023-12-31"]
+
+def test_tasks_warm_the_most_requested_dates_last():
+    report_dates = ["2024-10-19", "2024-06-30", "2024-03-31"]
+    tasks = warmup.warmup_tasks(report_dates, ["B", "A"], capacity=100)
+    assert [report_date for _, report_date in tasks] == (
+        ["2024-03-31"] * 2 + ["2024-06-30"] * 2 + ["2024-10-19"] * 2
+    )
+    assert tasks[-2:] == [("A", "2024-10-19"), ("B", "2024-10-19")]
+
+    # Beyond the cache capacity, the oldest dates are the ones dropped
+    assert warmup.warmup_tasks(report_dates, ["B", "A"], capacity=3) == [
+        ("B", "2024-06-30"), ("A", "2024-10-19"), ("B", "2024-10-19")
+    ]
+
+def test_warmup_fills_the_keys_the_dashboard_requests(client, db, warmup_pool):
+    version = get_data_version(db).version
+    lp_details_cache.clear()
+
+    run = warmup._run_warmup(version)
+    assert run.status == warmup.WARMUP_STATUS_COMPLETED
+    assert run.computed == run.total > 0
+
+    lps = [lp["short_name"] for lp in client.get("/api/lps").json()]
+    for report_date in run.report_dates:
+        assert lp_details_key(lps[0], report_date, version, False) in lp_details_cache
+        assert lp_details_key(lps[0], report_date, version, True) not in lp_details_cache
+
+    # A dashboard request is answered from the cache
+    hits = lp_details_cache.stats()["hits"]
+    response = client.get(f"/api/lp/{lps[0]}", params={"report_date": run.report_dates[0]})
+    assert response.status_code == 200
+    assert lp_details_cache.stats()["hits"] == hits + 1
+
+def test_warmup_stops_at_the_cache_capacity(db, monkeypatch, warmup_pool):
+    monkeypatch.setattr(lp_details_cache, "max_size", 10)
+    version = get_data_version(db).version
+    lp_details_cache.clear()
+
+    run = warmup._run_warmup(version)
+    assert run.total == run.computed == 10
+    assert run.skipped > 0
+    # Everything warmed is still cached, including every LP at today's date
+    assert lp_details_cache.stats()["size"] == 10
+    today = date.today().strftime('%Y-%m-%d')
+    for (short_name,) in db.query(tbLPLookup.short_name):
+        assert lp_details_key(short_name, today, version, False) in lp_details_cache